@@ -1,27 +1,71 @@
-import io
+import json
 import logging
 import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
 from datetime import datetime
 import os
 from pathlib import Path
-import re
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, jsonify, send_file, request, stream_with_context
 from flask_cors import CORS
 
+from services.actionCache.actionCache import (
+    action_cache_stats,
+    clear_actions,
+    lookup_action,
+    record_replay,
+    remember_action,
+    screen_fingerprint,
+)
 from services.aiService.aiService import (
     build_main_input,
     load_main_system_prompt,
     parse_main_output,
     run_main_llm,
+    run_main_llm_stream,
+    stream_main_output,
+)
+from services.aiService.promptBuilder import prompt_stats
+from services.intentRouter.defaultIntents import register_default_intents
+from services.intentRouter.intentRouter import intent_phrases, intent_replies, match_intent, render_intent
+from services.requestContext.requestContext import (
+    RequestContext,
+    cancel_requests,
+    release_request,
+    track_request,
+)
+from services.scriptClient.scriptPool import (
+    execute_script,
+    script_pool_stats,
+    shutdown_script_workers,
+    start_script_workers,
+)
+from services.sessionMemory.sessionMemory import memory_stats, reset_session
+from services.TTS.ttsClient import (
+    SpeechStream,
+    is_playback_active,
+    speak_text,
+    speak_text_streaming,
+    stop_playback,
+    tts_cache_stats,
+    warm_phrases,
 )
-from services.scriptClient.scriptClient import run_script, set_screen_origin
-from services.TTS.ttsClient import speak_text, stop_playback, is_playback_active
 from utils.audioFeedback.audioFeedback import play_image_error_sound
 from utils.audioFeedback.audioFeedback import play_warning_sound
-from utils.imageProcessor.imageProcessor import image_processor
-from utils.llmclassifer.llmClassifier import llmclassifier
+from utils.audioFeedback.audioFeedback import preload_sounds
+from utils.cancellation import Cancelled
+from utils.captureEngine.captureEngine import capture_stats, get_capture_engine
+from utils.eventBus import event_stats, subscribe
+from utils.tracing import count, render_prometheus, trace, traced
+from utils.frameCache.frameCache import frame_cache_stats
+from utils.frameCache.frameCache import lookup as frame_cache_lookup
+from utils.frameCache.frameCache import store as frame_cache_store
+from utils.imageEncoder.imageEncoder import encode_image, to_data_url
+from utils.imageProcessor.imageProcessor import image_processor, resolve_capture_mode, resolve_vision_preset
+from utils.llmclassifer.llmClassifier import classifier_stats, llmclassifier, register_local_commands
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -32,36 +76,49 @@ load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 app = Flask(__name__)
 CORS(app)
 
-# single-session memory: last 6 turns. resets every run.
-SESSION_MEMORY: list[dict] = []
-MAX_MEMORY_TURNS = 12  # 6 turns = 6 user + 6 assistant messages combined together
-
-
-def _is_datetime_query(user_input: str) -> bool:
-    text = (user_input or "").strip().lower()
-    patterns = (
-        "what time",
-        "current time",
-        "time is it",
-        "what date",
-        "current date",
-        "what day",
-        "day is it",
-        "day of the week",
-        "today's date",
-        "todays date",
-    )
-    return any(p in text for p in patterns)
+# local intents (date/time fast path, shortcut actions) are compiled into one index up front;
+# their shortcut phrases, said on their own, are also classified as AGENT without a Groq call
+register_default_intents()
+register_local_commands(intent_phrases(kinds=("agent",)))
+
+EVENTS_KEEPALIVE_S = 15.0  # idle /events connections get a comment line this often
+
+_GENERIC_FAILURE_MSG = "Something went wrong. Please try again."
+_PARSE_FAILURE_MSG = "I had trouble understanding the response. Please try again."
+# spoken when the model's script ran but its reply below the delimiter was missing or unusable
+_SCRIPT_ONLY_REPLY = "Done."
+
+
+def _build_date_sentence(now: datetime) -> str:
+    return f"Today is {now.strftime('%A')}, {now.strftime('%B %d, %Y')}."
 
 
 def _build_datetime_response() -> str:
     now = datetime.now()
     return (
-        f"Today is {now.strftime('%A')}, {now.strftime('%B %d, %Y')}. "
+        f"{_build_date_sentence(now)} "
         f"The current time is {now.strftime('%I:%M %p').lstrip('0')}."
     )
 
 
+def _static_tts_phrases() -> list[str]:
+    """Everything Theo says verbatim, plus today's date sentence of the datetime reply."""
+    return [
+        *intent_replies(),
+        _GENERIC_FAILURE_MSG,
+        _PARSE_FAILURE_MSG,
+        _SCRIPT_ONLY_REPLY,
+        _build_date_sentence(datetime.now()),
+    ]
+
+
+def _warm_tts_cache() -> None:
+    try:
+        warm_phrases(_static_tts_phrases())
+    except Exception as e:
+        logger.warning("TTS cache warm-up failed: %s", e)
+
+
 def _normalize_classification(raw: str) -> str:
     """Extract classification from classifier output; tolerates extra text/whitespace."""
     s = (raw or "").strip().upper()
@@ -71,173 +128,118 @@ def _normalize_classification(raw: str) -> str:
     return raw.strip() if raw else "---CHAT---"
 
 
-def _trim_memory() -> None:
-    """Keep only the last MAX_MEMORY_TURNS messages."""
-    global SESSION_MEMORY
-    if len(SESSION_MEMORY) > MAX_MEMORY_TURNS:
-        SESSION_MEMORY[:] = SESSION_MEMORY[-MAX_MEMORY_TURNS:]
+def _screen_meta(result: dict) -> dict:
+    """Screenshot metadata passed to the model and used to map its coordinates back to the screen."""
+    return {
+        "width": result["width"],
+        "height": result["height"],
+        "grid": result["grid"],
+        "origin_left": result.get("origin_left", 0),
+        "origin_top": result.get("origin_top", 0),
+        "capture_mode": result.get("capture_mode", "primary_monitor"),
+        "scale": result["scale"],
+        "scale_x": result.get("scale_x", result["scale"]),
+        "scale_y": result.get("scale_y", result["scale"]),
+    }
 
 
-def _build_deterministic_agent_action(user_input: str, meta: dict) -> tuple[str, str] | None:
+def _encode_screenshot(result: dict) -> str:
     """
-    Deterministic handler for common shortcut-friendly actions.
-    Returns (script_text, theo_response_text) or None if no rule matched.
+    Encode a capture with the configured encoder and return it as a data URL for the main LLM.
+    An unchanged screen reuses the data URL encoded for it last time.
     """
-    text = (user_input or "").strip().lower()
-    width = int(meta.get("width", 1920) or 1920)
-    height = int(meta.get("height", 1080) or 1080)
-    center_x = max(0, width // 2)
-    center_y = max(0, height // 2)
-
-    close_tab_phrases = (
-        "close tab",
-        "close this tab",
-        "close current tab",
-    )
-    reopen_tab_phrases = (
-        "reopen tab",
-        "reopen last tab",
-        "reopen closed tab",
-        "open last closed tab",
-        "restore tab",
-    )
-    new_tab_phrases = (
-        "new tab",
-        "open tab",
-        "open a new tab",
+    img = result["image"]
+    params = (img.size, img.mode, result["grid"] is not None)
+    cached, key, saved_ms = frame_cache_lookup(result["frame"], params)
+    if cached is not None:
+        stats = frame_cache_stats()
+        logger.info(
+            "Screenshot unchanged, reusing encoded frame: saved %.1f ms (hit rate %.0f%%, %.0f ms saved total)",
+            saved_ms,
+            stats["hit_rate"] * 100,
+            stats["saved_ms"],
+        )
+        return cached
+
+    started = time.perf_counter()
+    encoded = encode_image(img)
+    data_url = to_data_url(encoded)
+    cost_ms = (time.perf_counter() - started) * 1000.0
+    frame_cache_store(result["frame"], key, data_url, cost_ms)
+    logger.info(
+        "Screenshot encoded as %s: %d bytes in %.1f ms (%.1f ms with base64; frame cache hit rate %.0f%%)",
+        encoded["format"],
+        encoded["bytes"],
+        encoded["encode_ms"],
+        cost_ms,
+        frame_cache_stats()["hit_rate"] * 100,
     )
+    return data_url
 
-    if any(p in text for p in close_tab_phrases):
-        x1 = max(0, width - 40)
-        x2 = max(0, width - 90)
-        x3 = max(0, width - 140)
-        script = (
-            "result = hotkey_and_verify(\n"
-            "    keys=(\"ctrl\", \"w\"),\n"
-            "    label=\"close current tab\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=1.2,\n"
-            f"    fallback=lambda: click_candidates([({x1}, 18), ({x2}, 18), ({x3}, 18)], label=\"tab close button\")\n"
-            ")\n"
-        )
-        return script, "I can close the current tab with a shortcut and verify it worked."
-
-    if any(p in text for p in reopen_tab_phrases):
-        script = (
-            "result = hotkey_and_verify(\n"
-            "    keys=(\"ctrl\", \"shift\", \"t\"),\n"
-            "    label=\"reopen closed tab\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=1.2\n"
-            ")\n"
-        )
-        return script, "I can reopen your last closed tab using a shortcut and verify the change."
-
-    if any(p in text for p in new_tab_phrases) and "close" not in text:
-        script = (
-            "result = hotkey_and_verify(\n"
-            "    keys=(\"ctrl\", \"t\"),\n"
-            "    label=\"open new tab\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=1.2\n"
-            ")\n"
-        )
-        return script, "I can open a new tab with a shortcut and verify it opened."
-
-    if re.search(r"\b(go back|back page|previous page|navigate back)\b", text):
-        script = (
-            "result = hotkey_and_verify(\n"
-            "    keys=(\"alt\", \"left\"),\n"
-            "    label=\"navigate back\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=1.2\n"
-            ")\n"
-        )
-        return script, "I can move back using a navigation shortcut and verify it worked."
-
-    if re.search(r"\b(go forward|forward page|next page|navigate forward)\b", text):
-        script = (
-            "result = hotkey_and_verify(\n"
-            "    keys=(\"alt\", \"right\"),\n"
-            "    label=\"navigate forward\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=1.2\n"
-            ")\n"
-        )
-        return script, "I can move forward using a navigation shortcut and verify it worked."
-
-    if re.search(r"\b(bold|make.*bold)\b", text):
-        script = (
-            "result = ensure_focus_and_hotkey(\n"
-            f"    x={center_x},\n"
-            f"    y={center_y},\n"
-            "    keys=(\"ctrl\", \"b\"),\n"
-            "    label=\"apply bold\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=0.8\n"
-            ")\n"
-        )
-        return script, "I can apply bold formatting with a verified shortcut."
-
-    if re.search(r"\b(italic|make.*italic)\b", text):
-        script = (
-            "result = ensure_focus_and_hotkey(\n"
-            f"    x={center_x},\n"
-            f"    y={center_y},\n"
-            "    keys=(\"ctrl\", \"i\"),\n"
-            "    label=\"apply italic\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=0.8\n"
-            ")\n"
-        )
-        return script, "I can apply italic formatting with a verified shortcut."
-
-    if re.search(r"\b(underline|make.*underline)\b", text):
-        script = (
-            "result = ensure_focus_and_hotkey(\n"
-            f"    x={center_x},\n"
-            f"    y={center_y},\n"
-            "    keys=(\"ctrl\", \"u\"),\n"
-            "    label=\"apply underline\",\n"
-            "    retries=1,\n"
-            "    post_delay=0.35,\n"
-            "    min_change=0.8\n"
-            ")\n"
-        )
-        return script, "I can apply underline formatting with a verified shortcut."
 
-    return None
+def _resolve_vision() -> dict:
+    """
+    image_processor kwargs from the request: ?vision=full|balanced|fast|<long edge px> for scaling,
+    ?capture=all_monitors|primary_monitor|cursor_monitor|foreground_window|region and
+    ?region=left,top,width,height for what part of the desktop is sent. Raises ValueError.
+    """
+    return {
+        **resolve_vision_preset(request.args.get("vision")),
+        **resolve_capture_mode(request.args.get("capture"), request.args.get("region")),
+    }
 
 
-def _run_agent_replan(user_input: str, script_error: str) -> tuple[str, str]:
+# Screen capture + encode runs here so it can overlap the classifier round trip.
+_capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-capture")
+# Model-written scripts run here so the reply can keep streaming while the script acts.
+_script_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-script")
+
+
+def _stop_speech_if_failed(script_future: Future) -> None:
+    """Cut the streamed reply off as soon as the script it describes fails."""
+    if script_future.exception() is not None or not script_future.result().get("ok"):
+        stop_playback()
+
+
+def _capture_screen(vision: dict | None = None) -> dict:
+    """Capture and encode the screen for the main LLM. Returns {"result", "image_data_url", "meta"}."""
+    result = image_processor(with_grid=False, capture_all_monitors=True, **(vision or {}))
+    return {"result": result, "image_data_url": _encode_screenshot(result), "meta": _screen_meta(result)}
+
+
+def _start_capture(vision: dict | None = None) -> Future:
+    # copy_context carries the trace id onto the pool thread
+    return _capture_pool.submit(copy_context().run, _capture_screen, vision)
+
+
+def _discard_capture(capture: Future | None) -> None:
+    """Drop a speculative capture (e.g. the request turned out UNSAFE); nothing is uploaded."""
+    if capture is not None and not capture.cancel():
+        logger.debug("Discarding speculative screen capture")
+
+
+def _recapture(ctx: RequestContext) -> None:
+    """
+    Replace ctx's capture with a fresh screenshot. A script planned from here on is planned on this
+    screen, so a learned action must be saved under its fingerprint, not the first capture's.
+    """
+    ctx.use_capture(_capture_screen(ctx.vision))
+    if ctx.fingerprint is not None:
+        ctx.fingerprint = screen_fingerprint(ctx.frame, ctx.meta)
+
+
+@traced("replan")
+def _run_agent_replan(ctx: RequestContext, script_error: str) -> tuple[str, str]:
     """
     One automatic replan pass with a fresh screenshot after script failure.
+    The fresh capture replaces ctx's screen mapping, so the repaired script maps against it.
     """
-    fresh = image_processor(with_grid=False, capture_all_monitors=True)
-    fresh_buf = io.BytesIO()
-    fresh["image"].save(fresh_buf, format="PNG", optimize=True)
-    fresh_bytes = fresh_buf.getvalue()
-
-    fresh_meta = {
-        "width": fresh["width"],
-        "height": fresh["height"],
-        "grid": fresh["grid"],
-        "origin_left": fresh.get("origin_left", 0),
-        "origin_top": fresh.get("origin_top", 0),
-        "capture_mode": fresh.get("capture_mode", "primary_monitor"),
-        "scale": fresh["scale"],
-    }
-    set_screen_origin(fresh_meta["origin_left"], fresh_meta["origin_top"])
+    ctx.cancel.raise_if_cancelled()
+    _recapture(ctx)
+    ctx.cancel.raise_if_cancelled()
 
     replan_text = (
-        f"{user_input}\n\n"
+        f"{ctx.user_input}\n\n"
         "Previous automation attempt failed.\n"
         f"Runtime error: {script_error}\n"
         "Use the new screenshot state and generate a corrected script. "
@@ -247,50 +249,67 @@ def _run_agent_replan(user_input: str, script_error: str) -> tuple[str, str]:
     input_items = build_main_input(
         classification="---AGENT---",
         user_text=replan_text,
-        image_bytes=fresh_bytes,
-        meta=fresh_meta,
-        memory_messages=SESSION_MEMORY,
+        image_data_url=ctx.image_data_url,
+        meta=ctx.meta,
+        memory_messages=ctx.history,
     )
-    replan_raw = run_main_llm(instructions=instructions, input_items=input_items)
+    replan_raw = run_main_llm(instructions=instructions, input_items=input_items, cancel=ctx.cancel)
     return parse_main_output(replan_raw, "---AGENT---")
 
 
-def aiGO(user_input: str, classification: str) -> dict:
+def _replay_learned_action(ctx: RequestContext) -> tuple[str, str, dict] | None:
+    """
+    Replay the script learned for this command on this screen. Returns (script, reply, result) when
+    it verified; None on a miss, or after a failed replay (with a fresh capture for the model to plan on).
+    """
+    learned = lookup_action(ctx.user_input, ctx.fingerprint)
+    if learned is None:
+        return None
+    result = execute_script(learned["script"], ctx.screen, ctx.cancel)
+    ctx.mark("replay")
+    ctx.cancel.raise_if_cancelled()
+    record_replay(learned, bool(result.get("ok")))
+    if result.get("ok"):
+        logger.info("Replayed learned action for %r (saved ~%.0f ms of model time)", ctx.user_input, learned["llm_ms"])
+        return learned["script"], learned["reply"], result
+    logger.info("Learned action for %r failed (%s); asking the model", ctx.user_input, result.get("error"))
+    # the failed replay may already have changed the screen
+    _recapture(ctx)
+    ctx.mark("capture")
+    return None
+
+
+def _cancelled_result(ctx: RequestContext) -> dict:
+    logger.info("Request %s cancelled during %s", ctx.request_id, ", ".join(ctx.timings) or "start")
+    return {"ok": False, "cancelled": True, "error": "Cancelled"}
+
+
+def aiGO(ctx: RequestContext) -> dict:
     """
     Orchestrate the full AI workflow: screenshot -> LLM -> parse -> script (if AGENT) -> TTS.
+    ctx carries the input, classification, session, capture kwargs (ctx.vision, see _resolve_vision)
+    and optionally an already-started _start_capture() future in ctx.capture.
     Returns structured result dict for route response.
     """
+    user_input = ctx.user_input
+    classification = ctx.classification
     if classification not in ("---CHAT---", "---AGENT---"):
+        _discard_capture(ctx.capture)
         return {"ok": False, "error": f"Invalid classification: {classification}"}
 
-    # screenshot
+    # screenshot, encoded straight into a data URL
     try:
-        result = image_processor(with_grid=False, capture_all_monitors=True)
+        ctx.use_capture(ctx.capture.result() if ctx.capture is not None else _capture_screen(ctx.vision))
     except Exception as e:
         logger.exception("Screenshot capture failed")
         play_image_error_sound()
         return {"ok": False, "error": "Screenshot failed", "detail": str(e)}
+    ctx.mark("capture")
+    if ctx.cancel.cancelled:
+        return _cancelled_result(ctx)
 
-    # convert PIL image to bytes
-    img = result["image"]
-    buf = io.BytesIO()
-    img.save(buf, format="PNG", optimize=True)
-    image_bytes = buf.getvalue()
-
-    meta = {
-        "width": result["width"],
-        "height": result["height"],
-        "grid": result["grid"],
-        "origin_left": result.get("origin_left", 0),
-        "origin_top": result.get("origin_top", 0),
-        "capture_mode": result.get("capture_mode", "primary_monitor"),
-        "scale": result["scale"],
-    }
-    set_screen_origin(meta["origin_left"], meta["origin_top"])
-
-
-    SESSION_MEMORY.append({"role": "user", "content": user_input})
-    _trim_memory()
+    # snapshot of earlier turns; this turn is only recorded once it succeeds
+    ctx.snapshot_history()
 
     try:
         # Determine script path (deterministic first for common intents, then LLM).
@@ -298,34 +317,92 @@ def aiGO(user_input: str, classification: str) -> dict:
         theo_response_text = ""
         used_deterministic = False
         deterministic = None
+        learned = None
+        script_result = None
+        script_future: Future | None = None
+        speech: SpeechStream | None = None
         if classification == "---AGENT---":
-            deterministic = _build_deterministic_agent_action(user_input, meta)
+            deterministic = match_intent(user_input, kinds=("agent",))
+            if not deterministic and ctx.frame is not None:
+                # fingerprint of the screen the command was given on; _recapture keeps it in step
+                # with the screen a new script is planned on, and a verified script is learned under it
+                ctx.fingerprint = screen_fingerprint(ctx.frame, ctx.meta)
+                learned = _replay_learned_action(ctx)
         if deterministic:
-            script_text, theo_response_text = deterministic
+            script_text, theo_response_text = render_intent(deterministic, ctx.meta)
             used_deterministic = True
-            logger.info("Using deterministic agent handler for prompt: %s", user_input)
+            logger.info("Using local intent %s for prompt: %s", deterministic["name"], user_input)
+        elif learned is not None:
+            script_text, theo_response_text, script_result = learned
         else:
             instructions = load_main_system_prompt()
             input_items = build_main_input(
                 classification=classification,
                 user_text=user_input,
-                image_bytes=image_bytes,
-                meta=meta,
-                memory_messages=SESSION_MEMORY[:-1],
+                image_data_url=ctx.image_data_url,
+                meta=ctx.meta,
+                memory_messages=ctx.history,
             )
-            raw_text = run_main_llm(instructions=instructions, input_items=input_items)
-            script_text, theo_response_text = parse_main_output(raw_text, classification)
-
-        # 7. If AGENT, run script
-        script_result = None
-        if classification == "---AGENT---" and script_text.strip():
-            script_result = run_script(script_text)
+            # Act while the model is still talking: the script starts the moment the delimiter
+            # arrives and the reply is spoken sentence by sentence as it streams in.
+            speech = SpeechStream(ctx.cancel)
+            reply_parts: list[str] = []
+            try:
+                deltas = run_main_llm_stream(instructions=instructions, input_items=input_items, cancel=ctx.cancel)
+                for event in stream_main_output(deltas, classification):
+                    if event["type"] == "script":
+                        ctx.mark("llm_script")
+                        script_text = event["text"]
+                        if classification == "---AGENT---" and script_text.strip():
+                            script_future = _script_pool.submit(
+                                copy_context().run, execute_script, script_text, ctx.screen, ctx.cancel
+                            )
+                            script_future.add_done_callback(_stop_speech_if_failed)
+                    else:
+                        reply_parts.append(event["text"])
+                        speech.write(event["text"])
+            except ValueError as e:
+                if script_future is None:
+                    stop_playback()
+                    speech.close()
+                    raise
+                # the script is already acting on the desktop, so its result decides the turn, not the reply
+                logger.warning("Model reply unusable after its script started (%s); using a fallback reply", e)
+            except Exception:
+                stop_playback()
+                speech.close()
+                if script_future is not None:
+                    script_future.result()
+                raise
+            theo_response_text = "".join(reply_parts).strip()
+            if not theo_response_text:
+                speech.close()
+                speech = None
+                theo_response_text = _SCRIPT_ONLY_REPLY
+            ctx.mark("llm")
+
+        # 7. If AGENT, run script (already running if it came from the streamed model output,
+        # already verified if it was a learned replay)
+        if classification == "---AGENT---" and script_text.strip() and learned is None:
+            if script_future is not None:
+                script_result = script_future.result()
+            else:
+                script_result = execute_script(script_text, ctx.screen, ctx.cancel)
+            ctx.mark("script")
+            ctx.cancel.raise_if_cancelled()
             if not script_result.get("ok"):
                 first_error = script_result.get("error", "unknown")
                 logger.warning("Initial agent script failed (deterministic=%s): %s", used_deterministic, first_error)
+                # the streamed reply described the failed attempt; cut it off before replanning
+                if speech is not None:
+                    stop_playback()
+                    speech.close()
+                    speech = None
                 try:
-                    repaired_script, repaired_response = _run_agent_replan(user_input, first_error)
-                    repaired_result = run_script(repaired_script)
+                    repaired_script, repaired_response = _run_agent_replan(ctx, first_error)
+                    repaired_result = execute_script(repaired_script, ctx.screen, ctx.cancel)
+                    ctx.mark("replan")
+                    ctx.cancel.raise_if_cancelled()
                     if repaired_result.get("ok"):
                         script_text = repaired_script
                         theo_response_text = repaired_response
@@ -334,7 +411,8 @@ def aiGO(user_input: str, classification: str) -> dict:
                     else:
                         second_error = repaired_result.get("error", "unknown")
                         fallback_msg = f"Script failed after automatic retry: {second_error}"
-                        speak_text(fallback_msg, async_play=True)
+                        ctx.memory.add_turn(user_input, fallback_msg)
+                        speak_text(fallback_msg, async_play=True, cancel=ctx.cancel)
                         return {
                             "ok": True,
                             "classification": classification,
@@ -342,9 +420,12 @@ def aiGO(user_input: str, classification: str) -> dict:
                             "script_error": second_error,
                             "theo_response": theo_response_text,
                         }
+                except Cancelled:
+                    raise
                 except Exception as retry_error:
                     fallback_msg = f"Script failed and retry planning also failed: {retry_error}"
-                    speak_text(fallback_msg, async_play=True)
+                    ctx.memory.add_turn(user_input, fallback_msg)
+                    speak_text(fallback_msg, async_play=True, cancel=ctx.cancel)
                     return {
                         "ok": True,
                         "classification": classification,
@@ -355,16 +436,22 @@ def aiGO(user_input: str, classification: str) -> dict:
         elif classification == "---AGENT---" and not script_text.strip():
             logger.warning("AGENT classification but empty script from model")
 
-        # add assistant response to memory after final response is determined
-        SESSION_MEMORY.append({"role": "assistant", "content": theo_response_text})
-        _trim_memory()
+        # add the exchange to memory after final response is determined
+        ctx.cancel.raise_if_cancelled()
+        ctx.memory.add_turn(user_input, theo_response_text)
+
+        if ctx.fingerprint is not None and learned is None and script_result and script_result.get("ok"):
+            model_ms = sum(ctx.timings.get(stage, 0.0) for stage in ("llm_script", "llm", "replan"))
+            if remember_action(user_input, ctx.fingerprint, script_text, theo_response_text, model_ms):
+                logger.info("Learned action for %r", user_input)
 
         # 8. Speak Theo response in background so we return immediately after script.
         # Frontend gets response, disables click-through right away; TTS plays in background.
-        def _speak_in_background():
-            speak_text(theo_response_text, async_play=False)
-
-        threading.Thread(target=_speak_in_background, daemon=True).start()
+        # Model replies are already being spoken from the stream; replans and local intents start here.
+        if speech is not None:
+            speech.close()
+        else:
+            speak_text_streaming(theo_response_text, async_play=True, cancel=ctx.cancel)
 
         return {
             "ok": True,
@@ -373,19 +460,26 @@ def aiGO(user_input: str, classification: str) -> dict:
             "theo_response": theo_response_text,
         }
 
+    except Cancelled:
+        return _cancelled_result(ctx)
+
     except ValueError as e:
+        if ctx.cancel.cancelled:
+            return _cancelled_result(ctx)
         # Parse error
         logger.warning("Parse error: %s", e)
-        SESSION_MEMORY.pop()  # remove the user entry we just added
-        fallback_msg = f"I had trouble understanding the response. Please try again. {e}"
-        speak_text(fallback_msg, async_play=True)
+        # Fixed part and error detail are fed separately so the fixed part hits the TTS cache.
+        stream = SpeechStream(ctx.cancel)
+        stream.feed(_PARSE_FAILURE_MSG)
+        stream.feed(str(e))
+        stream.close()
         return {"ok": False, "error": "Parse failed", "detail": str(e)}
 
     except Exception as e:
+        if ctx.cancel.cancelled:
+            return _cancelled_result(ctx)
         logger.exception("aiGO failed")
-        SESSION_MEMORY.pop()  # remove the user entry we just added
-        fallback_msg = "Something went wrong. Please try again."
-        speak_text(fallback_msg, async_play=True)
+        speak_text(_GENERIC_FAILURE_MSG, async_play=True)
         return {"ok": False, "error": "AI workflow failed", "detail": str(e)}
 
 
@@ -398,17 +492,9 @@ def ping():
 def screenshot():
     """Capture screen with grid overlay; return PIL Image + metadata in-process (no base64)."""
     try:
-        result = image_processor(with_grid=True, capture_all_monitors=True)
-        metadata = {
-            "width": result["width"],
-            "height": result["height"],
-            "grid": result["grid"],
-            "origin_left": result.get("origin_left", 0),
-            "origin_top": result.get("origin_top", 0),
-            "capture_mode": result.get("capture_mode", "primary_monitor"),
-            "scale": result["scale"],
-        }
-        return jsonify(metadata)
+        vision = _resolve_vision()
+        result = image_processor(with_grid=True, capture_all_monitors=True, **vision)
+        return jsonify(_screen_meta(result))
     except Exception as e:
         logger.exception("Screenshot capture failed")
         play_image_error_sound()
@@ -419,17 +505,24 @@ def screenshot():
 def screenshot_preview():
     """Return the screenshot image as PNG for testing (view in browser)."""
     try:
-        result = image_processor(with_grid=True, capture_all_monitors=True)
-        buf = io.BytesIO()
-        result["image"].save(buf, format="PNG", optimize=True)
+        vision = _resolve_vision()
+        result = image_processor(with_grid=True, capture_all_monitors=True, **vision)
+        encoded = encode_image(result["image"], fmt="png")
+        buf = encoded["buffer"]
         buf.seek(0)
-        return send_file(buf, mimetype="image/png")
+        return send_file(buf, mimetype=encoded["mime"])
     except Exception as e:
         logger.exception("Screenshot preview failed")
         play_image_error_sound()
         return jsonify({"error": "Failed to capture screenshot", "detail": str(e)}), 500
 
 
+@app.route("/capture/stats", methods=["GET"])
+def capture_engine_stats():
+    """Return capture counts, mean grab/convert latency, bytes per capture and encoded-frame cache hits."""
+    return jsonify({"ok": True, **capture_stats(), "frame_cache": frame_cache_stats()}), 200
+
+
 @app.route("/ai/classify", methods=["GET"])
 def ai_classify():
     """Lightweight classification only; used by frontend to decide click-through."""
@@ -442,55 +535,193 @@ def ai_classify():
     return jsonify({"ok": True, "classification": classification}), 200
 
 
-@app.route("/ai", methods=["GET"])
-def ai():
-    user_input = request.args.get("user_input")
-    if not user_input or not str(user_input).strip():
-        return jsonify({"ok": False, "error": "user_input is required and must be non-empty"}), 400
+@app.route("/ai/classify/stats", methods=["GET"])
+def ai_classify_stats():
+    """Return local/cache/remote classifier hit counts and rates."""
+    return jsonify({"ok": True, **classifier_stats()}), 200
 
-    user_input = str(user_input).strip()
 
-    # Fast path for day/date/time requests (no classifier/main model round-trip).
-    if _is_datetime_query(user_input):
-        theo_response = _build_datetime_response()
-        speak_text(theo_response, async_play=False)
-        return jsonify({
-            "ok": True,
-            "classification": "---CHAT---",
-            "script_ok": None,
-            "theo_response": theo_response,
-        }), 200
+def _datetime_reply() -> dict:
+    """Fast path for day/date/time requests (no classifier/main model round-trip)."""
+    theo_response = _build_datetime_response()
+    speak_text_streaming(theo_response, async_play=False)
+    return {
+        "ok": True,
+        "classification": "---CHAT---",
+        "script_ok": None,
+        "theo_response": theo_response,
+    }
+
 
-    classification_param = request.args.get("classification")
+def _classify(ctx: RequestContext, classification_param: str | None = None) -> str:
     if classification_param and classification_param.strip() in ("---CHAT---", "---AGENT---", "---UNSAFE---"):
-        classification = classification_param.strip()
+        ctx.classification = classification_param.strip()
     else:
-        raw_classification = llmclassifier(user_input)
-        classification = _normalize_classification(raw_classification)
+        ctx.classification = _normalize_classification(llmclassifier(ctx.user_input))
+        ctx.mark("classify")
+    return ctx.classification
+
+
+def _session_id() -> str | None:
+    """Conversation key for the current request: ?session= or the X-Theo-Session header."""
+    return request.args.get("session") or request.headers.get("X-Theo-Session")
+
+
+def _run_classified(ctx: RequestContext) -> tuple[dict, int]:
+    """Finish a request once its classification is known. Returns (response body, HTTP status)."""
+    body, status = _finish_classified(ctx)
+    outcome = "cancelled" if body.get("cancelled") else ("ok" if status == 200 else "error")
+    count("requests", classification=(ctx.classification or "unknown").strip("-").lower(), outcome=outcome)
+    return body, status
+
+
+def _finish_classified(ctx: RequestContext) -> tuple[dict, int]:
+    classification = ctx.classification
+    if ctx.cancel.cancelled:
+        _discard_capture(ctx.capture)
+        return {"ok": False, "cancelled": True, "classification": classification, "error": "Cancelled"}, 409
 
     if classification == "---UNSAFE---":
-        play_warning_sound(blocking=True)
-        return jsonify({"ok": False, "classification": classification}), 400
+        _discard_capture(ctx.capture)
+        # the audio engine starts the warning within a block, no need to hold the response for it
+        play_warning_sound()
+        return {"ok": False, "classification": classification}, 400
 
     if classification in ("---CHAT---", "---AGENT---"):
-        result = aiGO(user_input, classification)
+        result = aiGO(ctx)
+        ctx.log_summary()
+        if result.get("cancelled"):
+            return {"ok": False, "cancelled": True, "classification": classification, "error": "Cancelled"}, 409
         if result.get("ok"):
-            return jsonify({
+            return {
                 "ok": True,
                 "classification": result.get("classification", classification),
                 "script_ok": result.get("script_ok"),
                 "theo_response": result.get("theo_response"),
-            }), 200
-        else:
-            return jsonify({
-                "ok": False,
-                "classification": classification,
-                "error": result.get("error"),
-                "detail": result.get("detail"),
-            }), 500
+            }, 200
+        return {
+            "ok": False,
+            "classification": classification,
+            "error": result.get("error"),
+            "detail": result.get("detail"),
+        }, 500
 
     # Fallback: unknown classification
-    return jsonify({"ok": False, "error": "Unknown classification", "classification": classification}), 400
+    _discard_capture(ctx.capture)
+    return {"ok": False, "error": "Unknown classification", "classification": classification}, 400
+
+
+@app.route("/ai/prompt/stats", methods=["GET"])
+def ai_prompt_stats():
+    """Return mean main-LLM prompt part sizes and the prompt-prefix reuse rate."""
+    return jsonify({"ok": True, **prompt_stats()}), 200
+
+
+@app.route("/ai", methods=["GET"])
+def ai():
+    user_input = request.args.get("user_input")
+    if not user_input or not str(user_input).strip():
+        return jsonify({"ok": False, "error": "user_input is required and must be non-empty"}), 400
+
+    user_input = str(user_input).strip()
+
+    if match_intent(user_input, kinds=("datetime",)):
+        return jsonify(_datetime_reply()), 200
+
+    # ?vision= trades click precision for upload size and latency; ?capture= limits the area sent
+    try:
+        vision = _resolve_vision()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    ctx = track_request(RequestContext(user_input, session_id=_session_id(), vision=vision))
+    try:
+        with trace(ctx.request_id):
+            classification_param = request.args.get("classification")
+            # when we still have to classify, grab and encode the screen meanwhile
+            if not classification_param:
+                ctx.capture = _start_capture(vision)
+            _classify(ctx, classification_param)
+            body, status = _run_classified(ctx)
+    finally:
+        release_request(ctx)
+    return jsonify(body), status
+
+
+def _request_events(ctx: RequestContext, datetime_query: bool):
+    """NDJSON lines of one /ai/stream request: classification, then result."""
+    if datetime_query:
+        yield json.dumps({"event": "classification", "classification": "---CHAT---"}) + "\n"
+        body, status = _datetime_reply(), 200
+    else:
+        try:
+            classification = _classify(ctx)
+        except Exception as e:
+            _discard_capture(ctx.capture)
+            logger.exception("Classification failed")
+            yield json.dumps({"event": "result", "status": 500, "ok": False,
+                              "error": "Classification failed", "detail": str(e)}) + "\n"
+            return
+        yield json.dumps({"event": "classification", "classification": classification,
+                          "request_id": ctx.request_id}) + "\n"
+        body, status = _run_classified(ctx)
+    yield json.dumps({"event": "result", "status": status, **body}) + "\n"
+
+
+@app.route("/ai/stream", methods=["GET"])
+def ai_stream():
+    """
+    Classify and run a request in one round trip, streamed as NDJSON.
+    The screen is captured and encoded while the classifier runs. The first line is
+    {"event": "classification"} so the frontend can toggle click-through right away;
+    the last is {"event": "result"} with the same body /ai returns.
+    """
+    user_input = request.args.get("user_input")
+    if not user_input or not str(user_input).strip():
+        return jsonify({"ok": False, "error": "user_input is required and must be non-empty"}), 400
+    user_input = str(user_input).strip()
+    try:
+        vision = _resolve_vision()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    ctx = track_request(RequestContext(user_input, session_id=_session_id(), vision=vision))
+    datetime_query = match_intent(user_input, kinds=("datetime",)) is not None
+    if not datetime_query:
+        with trace(ctx.request_id):
+            ctx.capture = _start_capture(vision)
+
+    started = False
+
+    def events():
+        nonlocal started
+        started = True
+        try:
+            with trace(ctx.request_id):
+                yield from _request_events(ctx, datetime_query)
+        finally:
+            release_request(ctx)
+
+    def on_close():
+        # a client that disconnects before the first line never runs events(); its finally can't release
+        if not started:
+            _discard_capture(ctx.capture)
+        release_request(ctx)
+
+    response = Response(stream_with_context(events()), mimetype="application/x-ndjson")
+    response.call_on_close(on_close)
+    return response
+
+
+@app.route("/ai/cancel", methods=["POST"])
+def ai_cancel():
+    """
+    Cancel the in-flight /ai request(s) (?request_id= for one) and stop speech.
+    Cancelled requests close their LLM stream, stop their script at the next line and skip speaking.
+    """
+    cancelled = cancel_requests(request.args.get("request_id") or None, reason="cancelled by user")
+    stop_playback()
+    return jsonify({"ok": True, "cancelled": cancelled}), 200
 
 
 @app.route("/stop-tts", methods=["POST"])
@@ -506,12 +737,95 @@ def tts_status():
     return jsonify({"ok": True, "playing": is_playback_active()}), 200
 
 
+@app.route("/events", methods=["GET"])
+def events_stream():
+    """
+    Server-Sent Events with TTS playback changes ("tts": started / chunk / finished / stopped)
+    and pipeline progress ("stage", "request"). The first event is the current playback state.
+    """
+    def stream():
+        with subscribe() as subscription:
+            snapshot = {"type": "tts", "state": "snapshot", "playing": is_playback_active()}
+            yield f"event: tts\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                event = subscription.get(timeout=EVENTS_KEEPALIVE_S)
+                if event is None:
+                    # comment line; keeps proxies from timing out and surfaces a dead client as a write error
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Stage latency histograms and counters in the Prometheus text format (empty with THEO_TRACING=0)."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/events/stats", methods=["GET"])
+def events_stats():
+    """Return event bus subscriber count and published/dropped event totals."""
+    return jsonify({"ok": True, **event_stats()}), 200
+
+
+@app.route("/script/stats", methods=["GET"])
+def script_stats():
+    """Return script worker pool size, idle workers and run/timeout/crash counts."""
+    return jsonify({"ok": True, **script_pool_stats()}), 200
+
+
+@app.route("/ai/actions", methods=["GET"])
+def ai_actions():
+    """Return learned action cache size, hit rate and model time saved by replays."""
+    return jsonify({"ok": True, **action_cache_stats()}), 200
+
+
+@app.route("/ai/actions/reset", methods=["POST"])
+def ai_actions_reset():
+    """Forget every learned action."""
+    return jsonify({"ok": True, "cleared": clear_actions()}), 200
+
+
+@app.route("/tts/cache", methods=["GET"])
+def tts_cache():
+    """Return TTS cache hit/miss counts and size."""
+    return jsonify({"ok": True, **tts_cache_stats()}), 200
+
+
+@app.route("/memory", methods=["GET"])
+def memory_info():
+    """Return per-session memory size (turns, estimated tokens, summary)."""
+    return jsonify({"ok": True, **memory_stats()}), 200
+
+
+@app.route("/memory/reset", methods=["POST"])
+def memory_reset():
+    """Forget the conversation of the requesting session."""
+    reset_session(_session_id())
+    return jsonify({"ok": True}), 200
+
+
 @app.route("/shutdown", methods=["POST"])
 def shutdown():
     """Shutdown the Flask server (called by Electron on quit)."""
     logger.info("Shutdown requested by Electron")
+    shutdown_script_workers()
     os._exit(0)
 
 
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    get_capture_engine()  # open the grabber now so the first /ai request doesn't pay for it
+    start_script_workers()  # likewise the script workers' interpreter start-up and imports
+    threading.Thread(target=preload_sounds, daemon=True).start()
+    threading.Thread(target=_warm_tts_cache, daemon=True).start()
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning("waitress not installed; falling back to the Flask development server")
+        app.run(host="127.0.0.1", port=5000, threaded=True)
+    else:
+        # worker threads serve requests while waitress handles socket I/O asynchronously,
+        # so /stop-tts and status polls are not queued behind a running /ai request
+        serve(app, host="127.0.0.1", port=5000, threads=int(os.getenv("THEO_SERVER_THREADS", "8")))
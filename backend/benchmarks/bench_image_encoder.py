@@ -0,0 +1,88 @@
+# Screenshot encoder benchmark: encode time and payload size per format on synthetic desktop frames.
+# Run from backend/:  python -m benchmarks.bench_image_encoder [--repeat N]
+
+import argparse
+import io
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.imageEncoder.imageEncoder import encode_image, to_data_url
+
+FRAME_SIZES = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4K": (3840, 2160),
+    "triple-1080p": (5760, 1080),
+}
+
+# (label, encode_image kwargs); None marks the old PNG optimize=True path
+CONFIGS = [
+    ("png optimize (old)", None),
+    ("png level 1", {"fmt": "png", "compress_level": 1, "parallel": False}),
+    ("png level 6", {"fmt": "png", "compress_level": 6, "parallel": False}),
+    ("png level 1 parallel", {"fmt": "png", "compress_level": 1, "parallel": True}),
+    ("png quantized", {"fmt": "png", "compress_level": 1, "quantize": True}),
+    ("jpeg q85", {"fmt": "jpeg", "quality": 85}),
+    ("webp q80", {"fmt": "webp", "quality": 80}),
+]
+
+
+def synthetic_desktop(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Flat windows, a gradient wallpaper, title bars and dense text-like noise, roughly like a real desktop."""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(40, 120, width, dtype=np.uint8)[None, :, None]
+    for _ in range(max(4, width * height // 400_000)):
+        w = int(rng.integers(width // 6, width // 2))
+        h = int(rng.integers(height // 6, height // 2))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        frame[y:y + h, x:x + w] = rng.integers(200, 256, 3, dtype=np.uint8)
+        frame[y:y + 28, x:x + w] = rng.integers(20, 80, 3, dtype=np.uint8)
+        # text-like rows: short dark runs on the window background
+        for row in range(y + 40, y + h - 12, 18):
+            glyphs = rng.random((10, w)) < 0.18
+            frame[row:row + 10, x:x + w][glyphs] = 30
+    return Image.fromarray(frame, "RGB")
+
+
+def _encode_old_png(img: Image.Image) -> tuple[int, float]:
+    started = time.perf_counter()
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return len(buf.getvalue()), (time.perf_counter() - started) * 1000.0
+
+
+def run(repeat: int) -> None:
+    print(f"{'frame':<14}{'config':<24}{'encode ms':>11}{'data url ms':>13}{'KiB':>10}")
+    for frame_name, (width, height) in FRAME_SIZES.items():
+        img = synthetic_desktop(width, height)
+        for label, kwargs in CONFIGS:
+            encode_times: list[float] = []
+            url_times: list[float] = []
+            size = 0
+            for _ in range(repeat):
+                if kwargs is None:
+                    size, encode_ms = _encode_old_png(img)
+                    encode_times.append(encode_ms)
+                    continue
+                encoded = encode_image(img, **kwargs)
+                encode_times.append(encoded["encode_ms"])
+                started = time.perf_counter()
+                to_data_url(encoded)
+                url_times.append((time.perf_counter() - started) * 1000.0)
+                size = encoded["bytes"]
+            url_ms = f"{statistics.median(url_times):.1f}" if url_times else "-"
+            print(
+                f"{frame_name:<14}{label:<24}{statistics.median(encode_times):>11.1f}"
+                f"{url_ms:>13}{size / 1024:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screenshot encoder benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args().repeat)
@@ -0,0 +1,109 @@
+# Intent router benchmark: match latency vs. number of registered intents on a synthetic utterance corpus,
+# compared with the old sequential `any(p in text)` scan.
+# Run from backend/:  python -m benchmarks.bench_intent_router [--utterances N]
+
+import argparse
+import random
+import statistics
+import time
+
+from services.intentRouter.defaultIntents import register_default_intents
+from services.intentRouter.intentRouter import match_intent, register_intents, unregister_intent
+
+INTENT_COUNTS = (10, 100, 1000)
+VERBS = ["open", "close", "show", "hide", "toggle", "start", "stop", "mute", "pin", "switch"]
+FILLER = (
+    "please could you can the a my this that now quickly for me on screen window app "
+    "hey theo I want to would like just"
+).split()
+# 1 in 10 synthetic intents is regex-based with a slot
+SLOT_PATTERN = r"\b{verb} (?:the )?{noun} (?P<index>\d+)\b"
+
+
+def _make_intents(count: int, rng: random.Random) -> list[dict]:
+    specs = []
+    for i in range(count):
+        verb = rng.choice(VERBS)
+        noun = f"thing{i}"
+        if i % 10 == 9:
+            specs.append({
+                "name": f"bench_{i}",
+                "patterns": (SLOT_PATTERN.format(verb=verb, noun=noun),),
+                "keywords": (noun,),
+                "script": "pass\n",
+                "example": f"{verb} the {noun} {rng.randint(1, 9)}",
+            })
+        else:
+            phrases = (f"{verb} {noun}", f"{verb} the {noun}", f"{noun} {verb}")
+            specs.append({
+                "name": f"bench_{i}",
+                "phrases": phrases,
+                "script": "pass\n",
+                "example": rng.choice(phrases),
+            })
+    return specs
+
+
+def _make_corpus(specs: list[dict], size: int, rng: random.Random) -> list[str]:
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER, k=rng.randint(3, 14))
+        # roughly a third of requests hit a local intent; the rest go to the LLM
+        if rng.random() < 0.33:
+            words.insert(rng.randint(0, len(words)), rng.choice(specs)["example"])
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def _linear_matcher(specs: list[dict]):
+    """The old approach: every rule checked in order with substring tests / re.search."""
+    import re
+    rules = []
+    for spec in specs:
+        if "patterns" in spec:
+            rules.append((spec["name"], None, [re.compile(p) for p in spec["patterns"]]))
+        else:
+            rules.append((spec["name"], spec["phrases"], None))
+
+    def match(text: str):
+        text = text.strip().lower()
+        for name, phrases, patterns in rules:
+            if phrases is not None:
+                if any(p in text for p in phrases):
+                    return name
+            elif any(p.search(text) for p in patterns):
+                return name
+        return None
+
+    return match
+
+
+def _time_us(fn, corpus: list[str]) -> float:
+    started = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return (time.perf_counter() - started) / len(corpus) * 1e6
+
+
+def run(utterances: int) -> None:
+    register_default_intents()
+    rng = random.Random(0)
+    print(f"{'intents':>8}{'router us/match':>18}{'linear us/match':>18}{'hit rate':>10}")
+    for count in INTENT_COUNTS:
+        specs = _make_intents(count, rng)
+        register_intents({k: v for k, v in spec.items() if k != "example"} for spec in specs)
+        corpus = _make_corpus(specs, utterances, rng)
+
+        hits = sum(1 for text in corpus if match_intent(text) is not None)
+        router_us = statistics.median(_time_us(match_intent, corpus) for _ in range(3))
+        linear_us = statistics.median(_time_us(_linear_matcher(specs), corpus) for _ in range(3))
+        print(f"{count:>8}{router_us:>18.2f}{linear_us:>18.2f}{hits / len(corpus):>10.0%}")
+
+        for spec in specs:
+            unregister_intent(spec["name"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intent router match-latency benchmark")
+    parser.add_argument("--utterances", type=int, default=20000)
+    run(parser.parse_args().utterances)
@@ -0,0 +1,196 @@
+# End-to-end pipeline benchmark that runs offline on a headless box.
+# /ai/stream is driven through the Flask app against local stand-ins: fake OpenAI/Groq HTTP servers
+# (benchmarks.fake_services), a synthetic screen, null input and a null audio sink (benchmarks.fake_devices).
+# Reports p50/p95/p99 per stage for the CHAT, AGENT, deterministic-intent, replan and learned-action paths.
+# Run from backend/:  python -m benchmarks.bench_pipeline [--iterations N] [--llm-ttft-ms MS] ...
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+from benchmarks import fake_devices
+from benchmarks.fake_services import FakeGroq, FakeOpenAI, Latency, last_user_text
+
+# (scenario, utterance); the fake model answers by utterance, see _respond
+SCENARIOS = [
+    ("chat", "what is the tallest mountain in the world"),
+    ("agent", "open the settings panel"),
+    ("deterministic", "open a new tab"),
+    ("replan", "rename the selected layer to background"),
+    # the warm-up request teaches the action cache; measured requests replay without the model
+    ("learned", "open the settings panel"),
+]
+# classified/response/first_audio are measured by the client, the rest are RequestContext.mark stages
+STAGES = ("classified", "capture", "classify", "replay", "llm_script", "llm", "script", "replan", "response",
+          "first_audio", "request")
+
+_CHAT_REPLY = "Mount Everest is the tallest mountain above sea level, at about 8,849 meters."
+_AGENT_SCRIPT = 'click_and_verify(640, 360, label="settings", retries=1, post_delay=0.2)'
+_FAILING_SCRIPT = 'click_and_verify(900, 500, label="layers", retries=0, post_delay=0.2)\n' \
+                  'raise RuntimeError("Layer name field not found")'
+_REPAIRED_SCRIPT = 'hotkey_and_verify(["f2"], label="rename layer", post_delay=0.2)\n' \
+                   'pyautogui.write("background")'
+
+
+def _respond(body: dict) -> str:
+    text = last_user_text(body.get("input"))
+    if "Previous automation attempt failed" in text:
+        return f"{_REPAIRED_SCRIPT}\n---DELIMITER---\nI renamed the layer with the rename shortcut instead."
+    if "Classification: ---CHAT---" in text:
+        return _CHAT_REPLY
+    if "rename the selected layer" in text:
+        return f"{_FAILING_SCRIPT}\n---DELIMITER---\nRenaming the selected layer now."
+    return f"{_AGENT_SCRIPT}\n---DELIMITER---\nOpening the settings panel for you."
+
+
+def _classify(text: str) -> str:
+    return "---CHAT---" if text.rstrip().endswith("?") or text.lower().startswith("what") else "---AGENT---"
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def _run_once(app_module, client, subscription, scenario: str, utterance: str) -> dict:
+    """One /ai/stream request; returns {stage: ms}."""
+    app_module.stop_playback()
+    while subscription.get(timeout=0) is not None:
+        pass
+
+    timings: dict[str, float] = {}
+    request_id = None
+    started_wall = time.time()
+    started = time.perf_counter()
+    response = client.get(
+        f"/ai/stream?user_input={quote(utterance)}&session=bench-{scenario}", buffered=False
+    )
+    buffered = b""
+    for chunk in response.response:
+        buffered += chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+        while b"\n" in buffered:
+            line, buffered = buffered.split(b"\n", 1)
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event["event"] == "classification":
+                timings["classified"] = (time.perf_counter() - started) * 1000.0
+                request_id = event.get("request_id")
+            elif event["event"] == "result" and not event.get("ok"):
+                raise RuntimeError(f"{scenario} request failed: {event}")
+    response.close()
+    timings["response"] = (time.perf_counter() - started) * 1000.0
+
+    # stage events were published before the response finished; first audio may still be on its way
+    deadline = time.monotonic() + 5.0
+    while time.monotonic() < deadline:
+        event = subscription.get(timeout=max(0.0, deadline - time.monotonic()))
+        if event is None:
+            break
+        if event["type"] == "stage" and event["request_id"] == request_id:
+            timings[event["stage"]] = timings.get(event["stage"], 0.0) + event["ms"]
+        elif event["type"] == "request" and event["request_id"] == request_id:
+            timings["request"] = event["ms"]
+        elif event["type"] == "tts" and event["state"] == "started" and event["ts"] >= started_wall:
+            timings["first_audio"] = (event["ts"] - started_wall) * 1000.0
+        if "first_audio" in timings and "request" in timings:
+            break
+    return timings
+
+
+def run(args: argparse.Namespace) -> None:
+    screen = fake_devices.install()
+    openai_server = FakeOpenAI(
+        _respond, Latency(args.llm_ttft_ms, args.llm_chars_per_s, args.llm_chunk_chars)
+    ).start()
+    groq_server = FakeGroq(
+        _classify, Latency(args.classifier_ms), Latency(args.tts_ms), speech_ms_per_char=args.speech_ms_per_char
+    ).start()
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "GROQ_API_KEY": "bench",
+        "OPENAI_BASE_URL": openai_server.base_url,
+        "GROQ_BASE_URL": groq_server.base_url,
+        # script workers are separate processes; give them the same stand-in devices
+        "THEO_SCRIPT_WORKER_INIT": "benchmarks.fake_devices:install",
+    })
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+        os.environ["THEO_SCRIPT_WORKER_LOG_LEVEL"] = "CRITICAL"
+    import app as app_module
+    from services.actionCache import actionCache
+    from services.TTS import ttsCache
+    from utils.eventBus import subscribe
+
+    # keep synthesized benchmark speech out of the real TTS cache
+    ttsCache.CACHE_DIR = Path(tempfile.mkdtemp(prefix="theo_bench_tts_"))
+    actionCache.CACHE_PATH = Path(tempfile.mkdtemp(prefix="theo_bench_actions_")) / "actions.json"
+    app_module.get_capture_engine()
+    app_module.start_script_workers()
+    client = app_module.app.test_client()
+
+    print(
+        f"fake LLM: ttft {args.llm_ttft_ms:.0f} ms, {args.llm_chars_per_s:.0f} chars/s; "
+        f"classifier {args.classifier_ms:.0f} ms; TTS {args.tts_ms:.0f} ms; "
+        f"screen {screen.width}x{screen.height}; {args.iterations} iterations (+{args.warmup} warm-up)"
+    )
+    with subscribe() as subscription:
+        for scenario, utterance in SCENARIOS:
+            if args.scenarios and scenario not in args.scenarios:
+                continue
+            samples: dict[str, list[float]] = {}
+            for i in range(args.warmup + args.iterations):
+                if scenario != "learned":
+                    actionCache.clear_actions()
+                timings = _run_once(app_module, client, subscription, scenario, utterance)
+                if i < args.warmup:
+                    continue
+                for stage, ms in timings.items():
+                    samples.setdefault(stage, []).append(ms)
+
+            print(f"\n{scenario}: \"{utterance}\"")
+            print(f"  {'stage':<13}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for stage in STAGES:
+                values = samples.get(stage)
+                if not values:
+                    continue
+                print(
+                    f"  {stage:<13}{len(values):>5}{_percentile(values, 0.5):>10.1f}"
+                    f"{_percentile(values, 0.95):>10.1f}{_percentile(values, 0.99):>10.1f}"
+                )
+    app_module.stop_playback()
+    # input events land on each worker's own fake screen, so report script runs instead
+    script_stats = app_module.script_pool_stats()
+    actions = actionCache.action_cache_stats()
+    print(f"\nlearned actions: {actions['replays_ok']} replays, {actions['replays_failed']} failed, "
+          f"{actions['saved_ms']:.0f} ms of model time saved")
+    print(f"fake OpenAI requests: {openai_server.requests}, fake Groq requests: {groq_server.requests}, "
+          f"script runs: {script_stats.get('runs', 0)} in {script_stats['size']} workers")
+    openai_server.stop()
+    groq_server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline latency benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="*", choices=[name for name, _ in SCENARIOS])
+    parser.add_argument("--llm-ttft-ms", type=float, default=400.0)
+    parser.add_argument("--llm-chars-per-s", type=float, default=400.0)
+    parser.add_argument("--llm-chunk-chars", type=int, default=8)
+    parser.add_argument("--classifier-ms", type=float, default=150.0)
+    parser.add_argument("--tts-ms", type=float, default=200.0)
+    parser.add_argument("--speech-ms-per-char", type=float, default=8.0)
+    parser.add_argument("--verbose", action="store_true", help="keep backend logging enabled")
+    run(parser.parse_args())
@@ -0,0 +1,200 @@
+# Stand-ins for the desktop the pipeline drives: a synthetic screen served through an `mss` look-alike,
+# a null `pyautogui` whose input events repaint that screen (so click/hotkey verification sees a change),
+# and a null `sounddevice` whose output stream pulls audio in real time and discards it.
+# install() must run before the backend modules are imported.
+
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+SCREEN_SIZE = (1920, 1080)
+CHANGE_PATCH = 240  # side of the square repainted around the cursor on each input event
+
+
+class FakeScreen:
+    """A single-monitor desktop; every input event repaints a patch at the cursor."""
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.cursor = (width // 2, height // 2)
+        self.events = 0
+        self._lock = threading.Lock()
+        yy, xx = np.mgrid[0:height, 0:width]
+        pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        pixels[..., 0] = (xx * 255 // max(1, width - 1)).astype(np.uint8)
+        pixels[..., 1] = (yy * 255 // max(1, height - 1)).astype(np.uint8)
+        pixels[..., 2] = 96
+        pixels[..., 3] = 255
+        # a few flat "windows" so the frame compresses like a real desktop, not like noise
+        for i in range(6):
+            x0, y0 = 80 + i * 280, 60 + (i % 3) * 300
+            pixels[y0:y0 + 260, x0:x0 + 240, :3] = 230 - i * 20
+        self._pixels = pixels
+
+    def monitors(self) -> list[dict]:
+        desktop = {"left": 0, "top": 0, "width": self.width, "height": self.height}
+        return [dict(desktop), dict(desktop)]
+
+    def move(self, x, y) -> None:
+        self.cursor = (int(x), int(y))
+
+    def input_event(self) -> None:
+        with self._lock:
+            self.events += 1
+            shade = 40 if self.events % 2 else 210
+        half = CHANGE_PATCH // 2
+        self.paint(self.cursor[0] - half, self.cursor[1] - half, CHANGE_PATCH, CHANGE_PATCH, shade)
+
+    def paint(self, left: int, top: int, width: int, height: int, shade: int) -> None:
+        """Fill a box with a flat grey (e.g. a hover highlight or tooltip a test needs)."""
+        x0, y0 = max(0, int(left)), max(0, int(top))
+        with self._lock:
+            self._pixels[y0:max(y0, int(top) + int(height)), x0:max(x0, int(left) + int(width)), :3] = shade
+
+    def grab(self, region: dict):
+        left = max(0, int(region["left"]))
+        top = max(0, int(region["top"]))
+        width = min(int(region["width"]), self.width - left)
+        height = min(int(region["height"]), self.height - top)
+        with self._lock:
+            raw = self._pixels[top:top + height, left:left + width].tobytes()
+        return types.SimpleNamespace(raw=raw, width=width, height=height)
+
+
+def _fake_mss(screen: FakeScreen) -> types.ModuleType:
+    module = types.ModuleType("mss")
+
+    class MSS:
+        def __init__(self, **_kwargs) -> None:
+            self._monitors = []
+
+        @property
+        def monitors(self) -> list[dict]:
+            return screen.monitors()
+
+        def grab(self, region):
+            if not isinstance(region, dict):
+                region = {"left": region[0], "top": region[1],
+                          "width": region[2] - region[0], "height": region[3] - region[1]}
+            return screen.grab(region)
+
+        def close(self) -> None:
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc) -> None:
+            self.close()
+
+    module.mss = MSS
+    module.MSS = MSS
+    return module
+
+
+def _null_pyautogui(screen: FakeScreen) -> types.ModuleType:
+    module = types.ModuleType("pyautogui")
+    module.FAILSAFE = True
+    module.PAUSE = 0.0
+    module.calls = {}
+
+    def record(name: str) -> None:
+        module.calls[name] = module.calls.get(name, 0) + 1
+
+    def size():
+        return screen.width, screen.height
+
+    def position():
+        return screen.cursor
+
+    def moveTo(x=None, y=None, duration=0.0, **_kwargs):
+        record("moveTo")
+        if x is not None and y is not None:
+            screen.move(x, y)
+
+    def click(x=None, y=None, **_kwargs):
+        record("click")
+        if x is not None and y is not None:
+            screen.move(x, y)
+        screen.input_event()
+
+    def _input(name):
+        def action(*_args, **_kwargs):
+            record(name)
+            screen.input_event()
+        return action
+
+    def _noop(name):
+        def action(*_args, **_kwargs):
+            record(name)
+        return action
+
+    module.size = size
+    module.position = position
+    module.moveTo = moveTo
+    module.click = click
+    for name in ("doubleClick", "rightClick", "hotkey", "press", "write", "typewrite", "scroll"):
+        setattr(module, name, _input(name))
+    for name in ("keyDown", "keyUp", "mouseDown", "mouseUp", "moveRel", "dragTo"):
+        setattr(module, name, _noop(name))
+    module.sleep = time.sleep
+    return module
+
+
+def _null_sounddevice(sample_rate: int) -> types.ModuleType:
+    module = types.ModuleType("sounddevice")
+
+    def query_devices(kind=None):
+        return {"name": "null", "default_samplerate": float(sample_rate)}
+
+    class OutputStream:
+        """Calls the engine's callback at the pace a real device would and drops the samples."""
+
+        def __init__(self, samplerate, channels, dtype="float32", blocksize=512, callback=None, **_kwargs):
+            self.samplerate = int(samplerate)
+            self.channels = int(channels)
+            self.blocksize = int(blocksize)
+            self.callback = callback
+            self.active = False
+            self._thread = None
+
+        def _run(self) -> None:
+            period = self.blocksize / float(self.samplerate)
+            buffer = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+            next_at = time.perf_counter()
+            while self.active:
+                self.callback(buffer, self.blocksize, None, None)
+                next_at += period
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_at = time.perf_counter()
+
+        def start(self) -> None:
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="null-audio", daemon=True)
+            self._thread.start()
+
+        def stop(self) -> None:
+            self.active = False
+
+        def close(self) -> None:
+            self.active = False
+
+    module.query_devices = query_devices
+    module.OutputStream = OutputStream
+    return module
+
+
+def install(width: int = SCREEN_SIZE[0], height: int = SCREEN_SIZE[1], sample_rate: int = 48000) -> FakeScreen:
+    """Register the fake mss/pyautogui/sounddevice modules; returns the screen they share."""
+    screen = FakeScreen(width, height)
+    sys.modules["mss"] = _fake_mss(screen)
+    sys.modules["pyautogui"] = _null_pyautogui(screen)
+    sys.modules["sounddevice"] = _null_sounddevice(sample_rate)
+    return screen
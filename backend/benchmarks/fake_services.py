@@ -0,0 +1,256 @@
+# Local stand-ins for the hosted APIs the pipeline calls, served over real HTTP on 127.0.0.1 so the
+# OpenAI/Groq SDKs, their connection pools and the streaming parsers are exercised as in production.
+#   FakeOpenAI: POST /v1/responses (JSON or SSE stream), point OPENAI_BASE_URL at .base_url
+#   FakeGroq:   POST /openai/v1/chat/completions and /openai/v1/audio/speech, point GROQ_BASE_URL at .base_url
+# Latencies are configurable; outputs come from a responder callable so scenarios stay in the benchmark.
+
+import io
+import json
+import threading
+import time
+import uuid
+import wave
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import numpy as np
+
+
+@dataclass
+class Latency:
+    first_byte_ms: float = 0.0  # time to first token / response headers
+    chars_per_s: float = 0.0  # streamed output rate; 0 sends everything at once
+    chunk_chars: int = 8
+
+
+class _Server:
+    def __init__(self, handler_cls) -> None:
+        handler_cls.owner = self
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.daemon_threads = True
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    owner = None
+
+    def log_message(self, *_args) -> None:
+        pass
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status: int, content_type: str, payload: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, obj: dict, status: int = 200) -> None:
+        self._send(status, "application/json", json.dumps(obj).encode("utf-8"))
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def _sleep_ms(ms: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+def _pieces(text: str, latency: Latency):
+    step = max(1, latency.chunk_chars)
+    for i in range(0, len(text), step):
+        piece = text[i:i + step]
+        yield piece
+        if latency.chars_per_s > 0:
+            _sleep_ms(len(piece) / latency.chars_per_s * 1000.0)
+
+
+def last_user_text(input_items: list) -> str:
+    """Text of the final (current) user turn of a Responses API input list."""
+    for item in reversed(input_items or []):
+        content = item.get("content")
+        if isinstance(content, str):
+            return content
+        return "".join(part.get("text", "") for part in content or () if part.get("type") == "input_text")
+    return ""
+
+
+class FakeOpenAI(_Server):
+    """Responses API stand-in; responder(request_json) -> output text."""
+
+    def __init__(self, responder: Callable[[dict], str], latency: Latency) -> None:
+        self.responder = responder
+        self.latency = latency
+        super().__init__(_OpenAIHandler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+def _response_object(response_id: str, model: str, text: str, status: str) -> dict:
+    output = []
+    if status == "completed":
+        output.append({
+            "type": "message",
+            "id": f"msg_{response_id}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        })
+    return {
+        "id": f"resp_{response_id}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self) -> None:
+        if not self.path.rstrip("/").endswith("/responses"):
+            self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+            return
+        owner: FakeOpenAI = self.owner
+        owner.count()
+        body = self._body()
+        text = owner.responder(body)
+        response_id = uuid.uuid4().hex[:12]
+        model = body.get("model", "fake")
+        _sleep_ms(owner.latency.first_byte_ms)
+        if not body.get("stream"):
+            for _ in _pieces(text, owner.latency):
+                pass
+            self._send_json(_response_object(response_id, model, text, "completed"))
+            return
+
+        self._start_chunked("text/event-stream")
+        seq = 0
+
+        def event(payload: dict) -> None:
+            nonlocal seq
+            payload["sequence_number"] = seq
+            seq += 1
+            self._chunk(f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        try:
+            event({"type": "response.created", "response": _response_object(response_id, model, "", "in_progress")})
+            for piece in _pieces(text, owner.latency):
+                event({
+                    "type": "response.output_text.delta",
+                    "item_id": f"msg_{response_id}",
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": piece,
+                    "logprobs": [],
+                })
+            event({"type": "response.completed", "response": _response_object(response_id, model, text, "completed")})
+            self._end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client closed the stream (e.g. the request was cancelled)
+            self.close_connection = True
+
+
+class FakeGroq(_Server):
+    """Groq stand-in: chat completions via classify(text) -> label, speech as a WAV of plausible length."""
+
+    def __init__(
+        self,
+        classify: Callable[[str], str],
+        chat_latency: Latency,
+        speech_latency: Latency,
+        speech_ms_per_char: float = 8.0,
+        sample_rate: int = 24000,
+    ) -> None:
+        self.classify = classify
+        self.chat_latency = chat_latency
+        self.speech_latency = speech_latency
+        self.speech_ms_per_char = speech_ms_per_char
+        self.sample_rate = sample_rate
+        super().__init__(_GroqHandler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def wav_for(self, text: str) -> bytes:
+        seconds = max(0.05, len(text) * self.speech_ms_per_char / 1000.0)
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        samples = (np.sin(2 * np.pi * 220.0 * t) * 3000).astype("<i2")
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(samples.tobytes())
+        return buf.getvalue()
+
+
+class _GroqHandler(_Handler):
+    def do_POST(self) -> None:
+        owner: FakeGroq = self.owner
+        path = self.path.rstrip("/")
+        owner.count()
+        body = self._body()
+        if path.endswith("/chat/completions"):
+            messages = body.get("messages") or []
+            user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+            _sleep_ms(owner.chat_latency.first_byte_ms)
+            self._send_json({
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": owner.classify(user_text)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        elif path.endswith("/audio/speech"):
+            _sleep_ms(owner.speech_latency.first_byte_ms)
+            self._send(200, "audio/wav", owner.wav_for(body.get("input", "")))
+        else:
+            self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
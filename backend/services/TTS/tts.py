@@ -1,15 +1,26 @@
 #  user text reponse to generated verbal response file
 
+import logging
 import os
+import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 from dotenv import load_dotenv
 from groq import Groq
 
+from utils.tracing import traced
+
+from . import ttsCache
+
 # Load .env for groq key (create a .env file in the project root and paste your groq api key there)
 load_dotenv(Path(__file__).resolve().parents[3] / ".env")
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "canopylabs/orpheus-v1-english"
+DEFAULT_VOICE = "troy"
+
 _client: Optional[Groq] = None
 
 
@@ -26,18 +37,27 @@ def _get_client() -> Groq:
     return _client
 
 
+@traced("tts_synthesis")
 def synthesize_tts(
     text: str,
     out_path: Optional[Path] = None,
-    model: str = "canopylabs/orpheus-v1-english",
-    voice: str = "troy",
+    model: str = DEFAULT_MODEL,
+    voice: str = DEFAULT_VOICE,
+    use_cache: bool = True,
 ) -> Path:
     """
     Generate a TTS WAV file for the given text and return the file path.
+    On a cache hit the shared cache entry is returned and no network call is made.
     """
     if not text or not isinstance(text, str):
         raise ValueError("Text must be a non-empty string")
 
+    key = ttsCache.cache_key(text, model, voice) if use_cache else None
+    if key is not None:
+        cached = ttsCache.lookup(key)
+        if cached is not None:
+            return cached
+
     client = _get_client()
     if out_path is None:
         out_path = Path(__file__).parent / "theo_response.wav"
@@ -49,5 +69,31 @@ def synthesize_tts(
         input=text,
     )
     response.write_to_file(out_path)
+    if key is not None:
+        try:
+            ttsCache.store(key, Path(out_path))
+        except OSError as e:
+            logger.warning("Could not cache TTS audio: %s", e)
     return out_path
-      
+
+
+def presynthesize(
+    phrases: Iterable[str],
+    model: str = DEFAULT_MODEL,
+    voice: str = DEFAULT_VOICE,
+) -> int:
+    """Synthesize any phrases missing from the cache. Returns how many were generated."""
+    generated = 0
+    for phrase in phrases:
+        key = ttsCache.cache_key(phrase, model, voice) if phrase else None
+        if key is None or ttsCache.contains(key):
+            continue
+        try:
+            out_path = Path(tempfile.gettempdir()) / f"theo_presynth_{key[:16]}.wav"
+            synthesize_tts(phrase, out_path=out_path, model=model, voice=voice, use_cache=False)
+            ttsCache.store(key, out_path)
+            out_path.unlink(missing_ok=True)
+            generated += 1
+        except Exception as e:
+            logger.warning("Could not pre-synthesize %r: %s", phrase, e)
+    return generated
@@ -0,0 +1,126 @@
+# Content-addressed on-disk cache for synthesized speech.
+# Entries are keyed by (text, model, voice) and evicted least-recently-used once the size cap is hit.
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).resolve().parent / "cache"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+# key -> file size in bytes, least recently used first. Loaded lazily from disk.
+_index: Optional["OrderedDict[str, int]"] = None
+_total_bytes = 0
+_hits = 0
+_misses = 0
+
+
+def cache_key(text: str, model: str, voice: str) -> str:
+    normalized = " ".join((text or "").split())
+    digest = hashlib.sha256(f"{model}\0{voice}\0{normalized}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _path_for(key: str) -> Path:
+    return CACHE_DIR / f"{key}.wav"
+
+
+def _ensure_index() -> "OrderedDict[str, int]":
+    """Build the LRU index from the cache dir; file mtimes carry recency across restarts."""
+    global _index, _total_bytes
+    if _index is not None:
+        return _index
+    _index = OrderedDict()
+    _total_bytes = 0
+    if CACHE_DIR.is_dir():
+        entries = []
+        for path in CACHE_DIR.glob("*.wav"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _mtime, key, size in sorted(entries):
+            _index[key] = size
+            _total_bytes += size
+    return _index
+
+
+def _evict_locked() -> None:
+    global _total_bytes
+    index = _ensure_index()
+    while _total_bytes > MAX_CACHE_BYTES and len(index) > 1:
+        key, size = index.popitem(last=False)
+        _total_bytes -= size
+        try:
+            _path_for(key).unlink()
+        except OSError:
+            pass
+        logger.debug("Evicted TTS cache entry %s (%d bytes)", key, size)
+
+
+def contains(key: str) -> bool:
+    """Check for an entry without touching hit/miss counts or recency."""
+    with _lock:
+        return key in _ensure_index() and _path_for(key).is_file()
+
+
+def lookup(key: str) -> Optional[Path]:
+    """Return the cached WAV path for key (marking it recently used), or None on a miss."""
+    global _hits, _misses, _total_bytes
+    with _lock:
+        index = _ensure_index()
+        path = _path_for(key)
+        if key in index:
+            if path.is_file():
+                index.move_to_end(key)
+                _hits += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+            _total_bytes -= index.pop(key)
+        _misses += 1
+        return None
+
+
+def store(key: str, src_path: Path) -> Path:
+    """Copy a freshly synthesized WAV into the cache and return the cached path."""
+    global _total_bytes
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    dest = _path_for(key)
+    tmp = dest.with_name(f"{key}.{threading.get_ident()}.tmp")
+    shutil.copyfile(src_path, tmp)
+    os.replace(tmp, dest)
+    size = dest.stat().st_size
+    with _lock:
+        index = _ensure_index()
+        if key in index:
+            _total_bytes -= index.pop(key)
+        index[key] = size
+        _total_bytes += size
+        _evict_locked()
+    return dest
+
+
+def cache_stats() -> dict:
+    with _lock:
+        index = _ensure_index()
+        lookups = _hits + _misses
+        return {
+            "hits": _hits,
+            "misses": _misses,
+            "hit_rate": (_hits / lookups) if lookups else 0.0,
+            "entries": len(index),
+            "bytes": _total_bytes,
+            "max_bytes": MAX_CACHE_BYTES,
+        }
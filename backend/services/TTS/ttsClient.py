@@ -1,21 +1,47 @@
 #This is a thin TTS client that generates speech from text and plays it back.
 
 import logging
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 import threading
 
-from .tts import synthesize_tts
+from utils.audioEngine.audioEngine import PRIORITY_SPEECH, PlaybackHandle, get_engine
+from utils.cancellation import CancelToken
+from utils.eventBus import publish
+from utils.tracing import observe
+
+from .tts import presynthesize, synthesize_tts
+from .ttsCache import cache_stats
 
 logger = logging.getLogger(__name__)
 _playback_state_lock = threading.Lock()
 _playback_active = False
+# Bumped by stop_playback so chunk streams that are still synthesizing know to bail out.
+_playback_generation = 0
+
+# streaming speak: chunks are synthesized a few ahead of playback, in order.
+STREAM_MAX_WORKERS = 3
+STREAM_MIN_CHUNK_CHARS = 24
+STREAM_MAX_CHUNK_CHARS = 220
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_CLAUSE_END_RE = re.compile(r"(?<=[,;:])\s+")
+TTS_TAG = "tts"
+_synth_pool = ThreadPoolExecutor(max_workers=STREAM_MAX_WORKERS, thread_name_prefix="tts-synth")
 
 
-def _set_playback_active(active: bool) -> None:
+def _set_playback_active(active: bool, state: Optional[str] = None) -> None:
+    """Record playback state and publish a "tts" event (started / finished / stopped) when it changes."""
     global _playback_active
     with _playback_state_lock:
+        changed = _playback_active != bool(active)
         _playback_active = bool(active)
+    if changed:
+        publish("tts", state=state or ("started" if active else "finished"), playing=bool(active))
 
 
 def is_playback_active() -> bool:
@@ -23,50 +49,304 @@ def is_playback_active() -> bool:
         return _playback_active
 
 
-def _play_wav(path: Path, async_play: bool = False) -> None:
+def _current_generation() -> int:
+    with _playback_state_lock:
+        return _playback_generation
+
+
+def _play_wav(path: Path, async_play: bool = False, cancel: Optional[CancelToken] = None) -> None:
     path = path.resolve()
     if not path.is_file():
         logger.warning("TTS WAV not found at %s", path)
         return
 
-    def _do_play() -> None:
+    generation = _current_generation()
+    unregister = None
+
+    def _on_done(_handle: PlaybackHandle) -> None:
+        if unregister is not None:
+            unregister()
+        if generation == _current_generation():
+            _set_playback_active(False)
+
+    try:
+        engine = get_engine()
+        handle = engine.play(
+            engine.decode(path),
+            priority=PRIORITY_SPEECH,
+            tag=TTS_TAG,
+            on_start=lambda _handle: _set_playback_active(True),
+            on_done=_on_done,
+        )
+    except Exception as e:
+        logger.warning("Could not play TTS WAV %s: %s", path, e)
+        _set_playback_active(False)
+        return
+
+    if cancel is not None:
+        unregister = cancel.on_cancel(stop_playback)
+    if not async_play:
+        handle.wait()
+
+
+def split_into_chunks(text: str) -> list[str]:
+    """
+    Split text into sentence/clause sized chunks for streaming synthesis.
+    Tiny fragments are merged forward; over-long sentences are split on clauses, then words.
+    """
+    pieces: list[str] = []
+    for sentence in _SENTENCE_END_RE.split((text or "").strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= STREAM_MAX_CHUNK_CHARS:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_END_RE.split(sentence):
+            clause = clause.strip()
+            while len(clause) > STREAM_MAX_CHUNK_CHARS:
+                cut = clause.rfind(" ", 0, STREAM_MAX_CHUNK_CHARS)
+                if cut <= 0:
+                    cut = STREAM_MAX_CHUNK_CHARS
+                pieces.append(clause[:cut].strip())
+                clause = clause[cut:].strip()
+            if clause:
+                pieces.append(clause)
+
+    chunks: list[str] = []
+    pending = ""
+    for piece in pieces:
+        pending = f"{pending} {piece}".strip() if pending else piece
+        if len(pending) >= STREAM_MIN_CHUNK_CHARS:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) < STREAM_MAX_CHUNK_CHARS:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+class SpeechStream:
+    """
+    Speak text chunk by chunk: chunks are synthesized concurrently and queued on the audio engine in order,
+    so the first words play as soon as the first chunk is ready and later chunks follow gaplessly.
+    stop_playback() cancels every open stream; so does cancelling the stream's CancelToken.
+    """
+
+    def __init__(self, cancel: Optional[CancelToken] = None) -> None:
+        self._created = time.perf_counter()
+        self._generation = _current_generation()
+        self._cancel = cancel
+        self._lock = threading.Lock()
+        self._tmp_dir = Path(tempfile.mkdtemp(prefix="theo_tts_"))
+        self._futures: list[Future] = []
+        self._ready: dict[int, Future] = {}
+        self._next_to_queue = 0
+        self._playing = 0
+        self._started = False
+        self._chunks_started = 0
+        self._closed = False
+        self._finished = False
+        self._done = threading.Event()
+        # write() holds back text until a sentence is complete
+        self._pending = ""
+        self._unregister_cancel = None
+        if cancel is not None:
+            self._unregister_cancel = cancel.on_cancel(self._on_cancel)
+
+    @property
+    def cancelled(self) -> bool:
+        if self._cancel is not None and self._cancel.cancelled:
+            return True
+        return self._generation != _current_generation()
+
+    def _on_cancel(self) -> None:
+        # only silence the speaker if this stream is the one using it
+        if self._started or self._playing:
+            stop_playback()
+        self._maybe_finish()
+
+    def feed(self, text: str) -> None:
+        """Queue text for synthesis; it is split into chunks first."""
+        for chunk in split_into_chunks(text):
+            self.push_chunk(chunk)
+
+    def push_chunk(self, chunk: str) -> None:
+        """Queue a single pre-split chunk for synthesis."""
+        chunk = (chunk or "").strip()
+        if not chunk or self.cancelled:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            index = len(self._futures)
+            out_path = self._tmp_dir / f"chunk_{index:03d}.wav"
+            future = _synth_pool.submit(_synthesize_chunk, chunk, out_path)
+            self._futures.append(future)
+        future.add_done_callback(lambda f, i=index: self._on_chunk_ready(i, f))
+
+    def write(self, text: str) -> None:
+        """
+        Queue streamed text (e.g. LLM deltas) from a single producer. Whole sentences are
+        synthesized as soon as they are complete; the unfinished tail waits for more text or close().
+        """
+        self._pending += text or ""
+        boundary = None
+        for boundary in _SENTENCE_END_RE.finditer(self._pending):
+            pass
+        if boundary is not None and boundary.start() >= STREAM_MIN_CHUNK_CHARS:
+            cut = boundary.start()
+        elif len(self._pending) > STREAM_MAX_CHUNK_CHARS:
+            # no sentence end in sight; break on a word so a long run-on still starts speaking
+            cut = self._pending.rfind(" ", 0, STREAM_MAX_CHUNK_CHARS)
+            if cut <= 0:
+                return
+        else:
+            return
+        complete, self._pending = self._pending[:cut], self._pending[cut:]
+        self.feed(complete)
+
+    def close(self) -> None:
+        """Mark the end of input; playback finishes after the last queued chunk."""
+        if self._pending.strip():
+            pending, self._pending = self._pending, ""
+            self.feed(pending)
+        with self._lock:
+            self._closed = True
+        self._maybe_finish()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _on_chunk_ready(self, index: int, future: Future) -> None:
+        # keep playback order even though synthesis finishes out of order
+        with self._lock:
+            self._ready[index] = future
+            ready: list[Future] = []
+            while self._next_to_queue in self._ready:
+                ready.append(self._ready.pop(self._next_to_queue))
+                self._next_to_queue += 1
+        for fut in ready:
+            self._queue_chunk(fut)
+        self._maybe_finish()
+
+    def _queue_chunk(self, future: Future) -> None:
+        if self.cancelled or future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.warning("TTS chunk synthesis failed: %s", future.exception())
+            return
+        with self._lock:
+            self._playing += 1
         try:
-            import sounddevice as sd
-            import soundfile as sf
-            data, sample_rate = sf.read(path)
-            if data.dtype.kind == "i":
-                data = data.astype("float32") / (2 ** (data.dtype.itemsize * 8 - 1))
-            elif data.dtype != "float32":
-                data = data.astype("float32")
-            if data.ndim == 1:
-                data = data.reshape(-1, 1)
-            _set_playback_active(True)
-            sd.play(data, sample_rate)
-            sd.wait()
+            get_engine().play(
+                future.result(),
+                priority=PRIORITY_SPEECH,
+                tag=TTS_TAG,
+                on_start=self._on_chunk_start,
+                on_done=self._on_chunk_done,
+            )
         except Exception as e:
-            logger.warning("Could not play TTS WAV %s: %s", path, e)
-        finally:
+            logger.warning("Could not play TTS chunk: %s", e)
+            with self._lock:
+                self._playing -= 1
+
+    def _on_chunk_start(self, _handle: PlaybackHandle) -> None:
+        if self.cancelled:
+            return
+        if not self._started:
+            self._started = True
+            observe("tts_first_audio", time.perf_counter() - self._created)
+            _set_playback_active(True)
+        publish("tts", state="chunk", playing=True, index=self._chunks_started)
+        self._chunks_started += 1
+
+    def _on_chunk_done(self, _handle: PlaybackHandle) -> None:
+        with self._lock:
+            self._playing -= 1
+        self._maybe_finish()
+
+    def _maybe_finish(self) -> None:
+        with self._lock:
+            if self._finished or self._playing > 0:
+                return
+            all_queued = self._next_to_queue == len(self._futures)
+            if not self.cancelled and not (self._closed and all_queued):
+                return
+            self._finished = True
+        if self._unregister_cancel is not None:
+            self._unregister_cancel()
+        for future in self._futures:
+            future.cancel()
+        if self._started and not self.cancelled:
             _set_playback_active(False)
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        self._done.set()
+
 
-    if async_play:
-        import threading
-        threading.Thread(target=_do_play, daemon=True).start()
-    else:
-        _do_play()
+def _synthesize_chunk(chunk: str, out_path: Path):
+    """Synthesize and decode one chunk off the audio thread; returns an engine-ready buffer."""
+    path = synthesize_tts(chunk, out_path=out_path)
+    return get_engine().decode(Path(path))
 
 
 def stop_playback() -> None:
     """Stop any currently playing TTS audio."""
+    global _playback_generation
+    with _playback_state_lock:
+        _playback_generation += 1
     try:
-        import sounddevice as sd
-        sd.stop()
-        _set_playback_active(False)
+        get_engine().stop(tag=TTS_TAG)
     except Exception as e:
         logger.warning("Could not stop TTS playback: %s", e)
+    _set_playback_active(False, "stopped")
 
 
-def speak_text(text: str, out_path: Optional[Path] = None, async_play: bool = False) -> Path:
-    #Generate TTS for text and play it back.
+def speak_text(
+    text: str,
+    out_path: Optional[Path] = None,
+    async_play: bool = False,
+    cancel: Optional[CancelToken] = None,
+) -> Path:
+    #Generate TTS for text and play it back. Raises Cancelled if cancel fires before playback starts.
+    if cancel is not None:
+        cancel.raise_if_cancelled()
     audio_path = synthesize_tts(text, out_path=out_path)
-    _play_wav(audio_path, async_play=async_play)
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    _play_wav(audio_path, async_play=async_play, cancel=cancel)
     return audio_path
+
+
+def speak_text_streaming(
+    text: str,
+    async_play: bool = False,
+    cancel: Optional[CancelToken] = None,
+) -> SpeechStream:
+    """Speak text sentence by sentence; time-to-first-audio depends on the first chunk only."""
+    stream = SpeechStream(cancel)
+    stream.feed(text)
+    stream.close()
+    if not async_play:
+        stream.wait()
+    return stream
+
+
+def warm_phrases(phrases: list[str]) -> int:
+    """
+    Pre-synthesize fixed phrases into the TTS cache.
+    Phrases are split the same way speak_text_streaming splits them so streamed playback hits too.
+    """
+    chunks: list[str] = []
+    for phrase in phrases:
+        chunks.append(phrase)
+        chunks.extend(split_into_chunks(phrase))
+    generated = presynthesize(dict.fromkeys(chunks))
+    logger.info("TTS cache warm-up done: %d new phrase(s) synthesized", generated)
+    return generated
+
+
+def tts_cache_stats() -> dict:
+    return cache_stats()
@@ -0,0 +1 @@
+# Package marker for the learned action cache.
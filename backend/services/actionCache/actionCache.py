@@ -0,0 +1,259 @@
+# Learned action cache: AGENT commands whose model-written script verified on a given screen are
+# remembered and replayed the next time the same command is given on a screen that looks the same,
+# skipping the screenshot upload and the main LLM call.
+# Entries are keyed by (normalized utterance, foreground app, capture geometry); a coarse luma
+# thumbnail of the screen must also be close to the one the script was learned on. A replay that
+# fails verification evicts its entry (the caller then falls back to the model), as do age and the
+# size cap. Persisted as JSON so learned actions survive restarts.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.captureEngine.captureEngine import Frame
+from utils.llmclassifer.llmClassifier import normalize_utterance
+from utils.tracing import count
+
+if sys.platform == "win32":
+    from ctypes import byref, create_unicode_buffer, windll, wintypes
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("THEO_ACTION_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+CACHE_PATH = Path(__file__).resolve().parent / "cache" / "actions.json"
+MAX_ENTRIES = 256
+MAX_AGE_S = 14 * 24 * 3600.0  # entries not replayed successfully for this long are dropped
+LAYOUT_SIZE = (32, 18)  # thumbnail the layout is compared on (width, height)
+# mean absolute luma difference (0-255) up to which two thumbnails count as the same screen;
+# a clock or cursor barely moves it, another window or page moves it well past this
+LAYOUT_DELTA = 8.0
+_FORMAT_VERSION = 1
+
+# only scripts that check their own effect are worth replaying; anything else could fail silently
+_VERIFIED_CALL_RE = re.compile(r"\b(click_and_verify|click_candidates|hotkey_and_verify|ensure_focus_and_hotkey)\s*\(")
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+_lock = threading.Lock()
+# key -> {"utterance", "app", "geometry", "layout", "script", "reply", "llm_ms", "uses", "created", "last_used"}
+_entries: Optional[dict[str, dict]] = None
+_stats = {"lookups": 0, "hits": 0, "replays_ok": 0, "replays_failed": 0, "stored": 0, "evicted": 0, "saved_ms": 0.0}
+
+
+def _foreground_app_windows() -> str:
+    """Executable name of the foreground window's process (e.g. "spotify.exe"), or "" if unknown."""
+    user32 = windll.user32
+    kernel32 = windll.kernel32
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return ""
+    pid = wintypes.DWORD()
+    user32.GetWindowThreadProcessId(hwnd, byref(pid))
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+    if not handle:
+        return ""
+    try:
+        buf = create_unicode_buffer(1024)
+        size = wintypes.DWORD(len(buf))
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buf, byref(size)):
+            return ""
+        return Path(buf.value).name.lower()
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def foreground_app() -> str:
+    if sys.platform != "win32":
+        return ""
+    try:
+        return _foreground_app_windows()
+    except OSError as e:
+        logger.debug("Could not resolve foreground app: %s", e)
+        return ""
+
+
+def screen_fingerprint(frame: Frame, meta: dict) -> dict:
+    """
+    What a learned script depends on: the foreground app, the capture geometry its coordinates are
+    relative to, and a coarse thumbnail of what was on screen.
+    """
+    layout = Image.fromarray(frame.gray(4)).resize(LAYOUT_SIZE, Image.Resampling.BOX)
+    return {
+        "app": foreground_app(),
+        "geometry": [
+            meta.get("capture_mode", ""),
+            int(meta.get("width", 0)),
+            int(meta.get("height", 0)),
+            int(meta.get("origin_left", 0)),
+            int(meta.get("origin_top", 0)),
+            round(float(meta.get("scale_x", 1.0)), 4),
+            round(float(meta.get("scale_y", 1.0)), 4),
+        ],
+        "layout": np.asarray(layout, dtype=np.uint8),
+    }
+
+
+def _key(utterance: str, fingerprint: dict) -> str:
+    raw = json.dumps([normalize_utterance(utterance), fingerprint["app"], fingerprint["geometry"]])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _layout_delta(a: np.ndarray, b: np.ndarray) -> float:
+    if a.shape != b.shape:
+        return float("inf")
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+def _load_locked() -> dict[str, dict]:
+    global _entries
+    if _entries is not None:
+        return _entries
+    _entries = {}
+    try:
+        payload = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return _entries
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable action cache %s: %s", CACHE_PATH, e)
+        return _entries
+    if payload.get("version") != _FORMAT_VERSION:
+        return _entries
+    for key, entry in (payload.get("entries") or {}).items():
+        try:
+            entry["layout"] = np.frombuffer(bytes.fromhex(entry["layout"]), dtype=np.uint8).reshape(
+                LAYOUT_SIZE[1], LAYOUT_SIZE[0]
+            )
+        except (KeyError, ValueError):
+            continue
+        _entries[key] = entry
+    _expire_locked()
+    logger.info("Loaded %d learned actions from %s", len(_entries), CACHE_PATH)
+    return _entries
+
+
+def _save_locked() -> None:
+    entries = {key: {**entry, "layout": entry["layout"].tobytes().hex()} for key, entry in _load_locked().items()}
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"version": _FORMAT_VERSION, "entries": entries}), encoding="utf-8")
+        os.replace(tmp, CACHE_PATH)
+    except OSError as e:
+        logger.warning("Could not save action cache: %s", e)
+
+
+def _evict_locked(key: str, reason: str) -> None:
+    entry = _load_locked().pop(key, None)
+    if entry is not None:
+        _stats["evicted"] += 1
+        logger.info("Evicted learned action for %r (%s)", entry["utterance"], reason)
+
+
+def _expire_locked() -> None:
+    entries = _load_locked()
+    cutoff = time.time() - MAX_AGE_S
+    for key in [k for k, e in entries.items() if e["last_used"] < cutoff]:
+        _evict_locked(key, "stale")
+    if len(entries) > MAX_ENTRIES:
+        by_age = sorted(entries, key=lambda k: entries[k]["last_used"])
+        for key in by_age[:len(entries) - MAX_ENTRIES]:
+            _evict_locked(key, "size cap")
+
+
+def lookup_action(utterance: str, fingerprint: dict) -> Optional[dict]:
+    """
+    Learned script for this utterance on this screen, or None.
+    Returns {"key", "script", "reply", "llm_ms"}; report the replay outcome with record_replay().
+    """
+    if not ENABLED:
+        return None
+    key = _key(utterance, fingerprint)
+    with _lock:
+        _stats["lookups"] += 1
+        entry = _load_locked().get(key)
+        if entry is not None and _layout_delta(entry["layout"], fingerprint["layout"]) > LAYOUT_DELTA:
+            entry = None
+        if entry is None:
+            count("action_cache", result="miss")
+            return None
+        _stats["hits"] += 1
+        count("action_cache", result="hit")
+        return {"key": key, "script": entry["script"], "reply": entry["reply"], "llm_ms": entry["llm_ms"]}
+
+
+def record_replay(learned: dict, ok: bool) -> None:
+    """A verified replay refreshes the entry; a failed one evicts it so the model plans afresh next time."""
+    with _lock:
+        entries = _load_locked()
+        entry = entries.get(learned["key"])
+        if ok:
+            _stats["replays_ok"] += 1
+            _stats["saved_ms"] += learned["llm_ms"]
+            if entry is not None:
+                entry["uses"] += 1
+                entry["last_used"] = time.time()
+        else:
+            _stats["replays_failed"] += 1
+            count("action_cache", result="failed")
+            _evict_locked(learned["key"], "replay failed verification")
+        _save_locked()
+
+
+def remember_action(utterance: str, fingerprint: dict, script: str, reply: str, llm_ms: float) -> bool:
+    """Store a model-written script that just verified on the fingerprinted screen. Returns whether it was kept."""
+    if not ENABLED or not script.strip() or not _VERIFIED_CALL_RE.search(script):
+        return False
+    now = time.time()
+    with _lock:
+        entries = _load_locked()
+        entries[_key(utterance, fingerprint)] = {
+            "utterance": normalize_utterance(utterance),
+            "app": fingerprint["app"],
+            "geometry": fingerprint["geometry"],
+            "layout": fingerprint["layout"],
+            "script": script,
+            "reply": reply,
+            "llm_ms": round(float(llm_ms), 1),
+            "uses": 0,
+            "created": now,
+            "last_used": now,
+        }
+        _stats["stored"] += 1
+        _expire_locked()
+        _save_locked()
+    return True
+
+
+def clear_actions() -> int:
+    """Forget every learned action. Returns how many were dropped."""
+    with _lock:
+        entries = _load_locked()
+        dropped = len(entries)
+        entries.clear()
+        _save_locked()
+    return dropped
+
+
+def action_cache_stats() -> dict:
+    with _lock:
+        entries = _load_locked()
+        lookups = _stats["lookups"]
+        replays_ok = _stats["replays_ok"]
+        return {
+            "enabled": ENABLED,
+            "entries": len(entries),
+            "max_entries": MAX_ENTRIES,
+            **_stats,
+            # a lookup only counts as a hit for the user when the replay also verified
+            "hit_rate": replays_ok / lookups if lookups else 0.0,
+            "avg_saved_ms": _stats["saved_ms"] / replays_ok if replays_ok else 0.0,
+        }
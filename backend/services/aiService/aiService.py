@@ -3,10 +3,17 @@
 import base64
 import logging
 import os
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from utils.cancellation import CancelToken, Cancelled
+from utils.tracing import observe, traced
+
+from .promptBuilder import load_main_system_prompt, meta_text, prompt_sizes
+
 load_dotenv(Path(__file__).resolve().parents[3] / ".env")
 logger = logging.getLogger(__name__)
 
@@ -29,51 +36,46 @@ def _get_client() -> OpenAI:
     return _client
 
 
-def load_main_system_prompt() -> str:
-    """Load the main system prompt from MAINSYSTEMPROMPT.md."""
-    prompt_path = Path(__file__).resolve().parent / "MAINSYSTEMPROMPT.md"
-    return prompt_path.read_text(encoding="utf-8")
-
-
 def build_main_input(
     classification: str,
     user_text: str,
-    image_bytes: bytes,
-    meta: dict,
-    memory_messages: list[dict],
+    image_bytes: bytes | None = None,
+    meta: dict | None = None,
+    memory_messages: list[dict] | None = None,
+    image_data_url: str | None = None,
+    image_mime: str = "image/png",
 ) -> list[dict]:
+    """
+    Build the Responses API input. Pass either raw image_bytes (base64-encoded here)
+    or a ready image_data_url from utils.imageEncoder to skip the extra copy.
+    """
     if classification not in ("---CHAT---", "---AGENT---"):
         raise ValueError(f"Invalid classification: {classification}")
-
-    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-    image_data_url = f"data:image/png;base64,{image_b64}"
-
-    width = meta.get("width", 0)
-    height = meta.get("height", 0)
-    grid = meta.get("grid", {})
-    origin_left = int(meta.get("origin_left", 0))
-    origin_top = int(meta.get("origin_top", 0))
-    capture_mode = meta.get("capture_mode", "primary_monitor")
-    scale = meta.get("scale", 1.0)
-
-    if grid:
-        grid_text = f"grid minor={grid.get('minor', 10)}, major={grid.get('major', 100)}, "
-    else:
-        grid_text = "grid=none, "
-
-    meta_text = (
-        f"Screenshot metadata: width={width}, height={height}, "
-        f"{grid_text}origin_left={origin_left}, origin_top={origin_top}, "
-        f"capture_mode={capture_mode}, scale={scale}. "
-        "Coordinates from the screenshot are local image coordinates. "
-        "Convert to real screen coordinates with screen_x=origin_left+x and screen_y=origin_top+y. "
-        "For click actions, prefer click_and_verify(x, y, label=...) so runtime can verify UI changed."
+    meta = meta or {}
+    memory_messages = memory_messages or []
+
+    if image_data_url is None:
+        if image_bytes is None:
+            raise ValueError("build_main_input requires image_bytes or image_data_url")
+        image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+        image_data_url = f"data:{image_mime};base64,{image_b64}"
+
+    grid = meta.get("grid") or None
+    meta_line = meta_text(
+        meta.get("width", 0),
+        meta.get("height", 0),
+        (grid.get("minor", 10), grid.get("major", 100)) if grid else None,
+        int(meta.get("origin_left", 0)),
+        int(meta.get("origin_top", 0)),
+        meta.get("capture_mode", "primary_monitor"),
+        meta.get("scale", 1.0),
+        meta.get("scale_y", meta.get("scale", 1.0)),
     )
 
     user_content = (
         f"Classification: {classification}\n\n"
         f"User prompt: {user_text}\n\n"
-        f"{meta_text}"
+        f"{meta_line}"
     )
 
     input_items: list[dict] = []
@@ -96,10 +98,31 @@ def build_main_input(
     return input_items
 
 
+def _log_prompt_sizes(instructions: str, input_items: list[dict]) -> None:
+    sizes = prompt_sizes(instructions, input_items)
+    logger.info(
+        "Main LLM prompt: instructions=%d chars, history=%d msgs/%d chars, text=%d chars, image=%d bytes, "
+        "~%d text tokens, prefix reused=%s",
+        sizes["instructions_chars"],
+        sizes["history_messages"],
+        sizes["history_chars"],
+        sizes["text_chars"],
+        sizes["image_bytes"],
+        sizes["est_text_tokens"],
+        sizes["prefix_reused"],
+    )
+
+
+@traced("llm")
 def run_main_llm(
     instructions: str,
     input_items: list[dict],
+    cancel: Optional[CancelToken] = None,
 ) -> str:
+    if cancel is not None:
+        # a blocking create() can't be interrupted; the streamed request can be closed mid-response
+        return "".join(run_main_llm_stream(instructions, input_items, cancel=cancel))
+    _log_prompt_sizes(instructions, input_items)
     client = _get_client()
     response = client.responses.create(
         model=MODEL,
@@ -116,6 +139,17 @@ def run_main_llm(
     return raw
 
 
+def _strip_code_fences(script_text: str) -> str:
+    # Strip markdown code fences if model included them despite instructions
+    for fence in ("```python", "```"):
+        if script_text.startswith(fence):
+            script_text = script_text[len(fence) :].lstrip()
+        if script_text.endswith("```"):
+            script_text = script_text[:-3].rstrip()
+    return script_text
+
+
+@traced("parse")
 def parse_main_output(raw_text: str, classification: str) -> tuple[str, str]:
 
    # Parse raw LLM output into (script_text, theo_response_text).
@@ -137,16 +171,118 @@ def parse_main_output(raw_text: str, classification: str) -> tuple[str, str]:
     if len(parts) != 2:
         raise ValueError("Output must contain exactly one delimiter")
 
-    script_text = parts[0].strip()
-    # Strip markdown code fences if model included them despite instructions
-    for fence in ("```python", "```"):
-        if script_text.startswith(fence):
-            script_text = script_text[len(fence) :].lstrip()
-        if script_text.endswith("```"):
-            script_text = script_text[:-3].rstrip()
+    script_text = _strip_code_fences(parts[0].strip())
     theo_response_text = parts[1].strip()
 
     if not theo_response_text:
         raise ValueError("Theo response text (below delimiter) cannot be empty")
 
     return script_text, theo_response_text
+
+
+def run_main_llm_stream(
+    instructions: str,
+    input_items: list[dict],
+    cancel: Optional[CancelToken] = None,
+) -> Iterator[str]:
+    """
+    Same request as run_main_llm, but yields output text deltas as the model produces them.
+    Cancelling the token closes the HTTP response and raises Cancelled in the consumer.
+    """
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    _log_prompt_sizes(instructions, input_items)
+    client = _get_client()
+    started = time.perf_counter()
+    first_delta = True
+    stream = client.responses.create(
+        model=MODEL,
+        instructions=instructions,
+        input=input_items,
+        stream=True,
+    )
+    unregister = cancel.on_cancel(stream.close) if cancel is not None else None
+    try:
+        for event in stream:
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            kind = getattr(event, "type", "")
+            if kind == "response.output_text.delta":
+                if first_delta:
+                    first_delta = False
+                    observe("llm_first_delta", time.perf_counter() - started)
+                yield event.delta
+            elif kind in ("response.failed", "error"):
+                error = getattr(event, "error", None) or getattr(getattr(event, "response", None), "error", None)
+                raise RuntimeError(f"Main LLM stream failed: {getattr(error, 'message', error)}")
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        observe("llm_stream", time.perf_counter() - started)
+    except Exception as e:
+        # closing the response from another thread surfaces as a read error here
+        if cancel is not None and cancel.cancelled and not isinstance(e, Cancelled):
+            raise Cancelled(cancel.reason or "cancelled") from e
+        raise
+    finally:
+        if unregister is not None:
+            unregister()
+        stream.close()
+
+
+class MainOutputParser:
+    """
+    Incremental parse_main_output for streamed deltas.
+    feed() returns events as soon as they are known: {"type": "script", "text"} once the
+    delimiter arrives (AGENT only), then {"type": "reply", "text"} for each piece of the reply.
+    close() flushes and raises ValueError for the same malformed outputs parse_main_output rejects.
+    """
+
+    def __init__(self, classification: str) -> None:
+        self.classification = classification
+        self._in_reply = classification == "---CHAT---"
+        self._buffer = ""
+        self._reply_started = False
+        self._saw_output = False
+
+    def _reply(self, text: str) -> list[dict]:
+        if not self._reply_started:
+            # mirror the .strip() of the batch parser on the leading side
+            text = text.lstrip()
+            if not text:
+                return []
+            self._reply_started = True
+        return [{"type": "reply", "text": text}]
+
+    def feed(self, delta: str) -> list[dict]:
+        if not delta:
+            return []
+        self._saw_output = self._saw_output or bool(delta.strip())
+        if self._in_reply:
+            return self._reply(delta)
+
+        self._buffer += delta
+        index = self._buffer.find(DELIMITER)
+        if index == -1:
+            return []
+        script_text = _strip_code_fences(self._buffer[:index].strip())
+        rest = self._buffer[index + len(DELIMITER):]
+        self._buffer = ""
+        self._in_reply = True
+        return [{"type": "script", "text": script_text}, *self._reply(rest)]
+
+    def close(self) -> list[dict]:
+        if not self._saw_output:
+            raise ValueError("Empty output from model")
+        if not self._in_reply:
+            raise ValueError(f"Output missing required delimiter '{DELIMITER}'")
+        if not self._reply_started:
+            raise ValueError("Theo response text (below delimiter) cannot be empty")
+        return []
+
+
+def stream_main_output(deltas: Iterable[str], classification: str) -> Iterator[dict]:
+    """Run streamed model deltas through MainOutputParser, yielding script/reply events."""
+    parser = MainOutputParser(classification)
+    for delta in deltas:
+        yield from parser.feed(delta)
+    yield from parser.close()
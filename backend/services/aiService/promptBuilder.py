@@ -0,0 +1,147 @@
+# Prompt assembly helpers for the main LLM: cached system prompt, memoized metadata text
+# and per-request size accounting (instructions, history, text and image parts).
+
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT_PATH = Path(__file__).resolve().parent / "MAINSYSTEMPROMPT.md"
+_CHARS_PER_TOKEN = 4
+
+_prompt_lock = threading.Lock()
+_prompt_text: str | None = None
+_prompt_stamp: tuple[int, int] | None = None
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "prefix_reused": 0, "instructions_chars": 0, "history_chars": 0,
+          "text_chars": 0, "image_bytes": 0}
+_last_prefix: tuple[str, int] | None = None  # (digest of instructions + history, history length)
+
+
+def load_main_system_prompt() -> str:
+    """
+    The main system prompt, read from MAINSYSTEMPROMPT.md once and re-read only when the file
+    changes. The same str object is returned between edits so the prompt prefix stays byte-identical.
+    """
+    global _prompt_text, _prompt_stamp
+    stat = SYSTEM_PROMPT_PATH.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _prompt_lock:
+        if _prompt_text is None or stamp != _prompt_stamp:
+            _prompt_text = SYSTEM_PROMPT_PATH.read_text(encoding="utf-8")
+            _prompt_stamp = stamp
+            logger.info("Loaded main system prompt (%d chars)", len(_prompt_text))
+        return _prompt_text
+
+
+@lru_cache(maxsize=32)
+def meta_text(
+    width: int,
+    height: int,
+    grid: tuple[int, int] | None,
+    origin_left: int,
+    origin_top: int,
+    capture_mode: str,
+    scale: float,
+    scale_y: float,
+) -> str:
+    """Screenshot metadata sentence for the current turn; identical screens produce identical text."""
+    if grid:
+        grid_text = f"grid minor={grid[0]}, major={grid[1]}, "
+    else:
+        grid_text = "grid=none, "
+
+    if scale != 1.0:
+        convert_text = (
+            "The screenshot is downscaled; convert to real screen coordinates with to_screen_xy(x, y) "
+            f"(screen_x=origin_left+x/{scale:.4f}, screen_y=origin_top+y/{scale_y:.4f}). "
+        )
+    else:
+        convert_text = (
+            "Convert to real screen coordinates with screen_x=origin_left+x and screen_y=origin_top+y. "
+        )
+
+    return (
+        f"Screenshot metadata: width={width}, height={height}, "
+        f"{grid_text}origin_left={origin_left}, origin_top={origin_top}, "
+        f"capture_mode={capture_mode}, scale={scale}. "
+        "Coordinates from the screenshot are local image coordinates. "
+        f"{convert_text}"
+        "For click actions, prefer click_and_verify(x, y, label=...) so runtime can verify UI changed."
+    )
+
+
+def _content_sizes(content) -> tuple[int, int]:
+    """(text chars, image data-URL bytes) of one message's content."""
+    if isinstance(content, str):
+        return len(content), 0
+    text = image = 0
+    for part in content or ():
+        if part.get("type") == "input_image":
+            image += len(part.get("image_url") or "")
+        else:
+            text += len(part.get("text") or "")
+    return text, image
+
+
+def _prefix_digest(instructions: str, items: list[dict]) -> str:
+    digest = hashlib.sha1(instructions.encode("utf-8"))
+    for item in items:
+        digest.update(f"\x00{item.get('role')}\x00{item.get('content')}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def prompt_sizes(instructions: str, input_items: list[dict]) -> dict:
+    """
+    Size breakdown of one request. history is every input item before the current (last) turn;
+    prefix_reused says whether instructions + history start with everything the previous request
+    sent before its current turn (what provider-side prompt caching can reuse).
+    """
+    global _last_prefix
+    history_items, current = input_items[:-1], input_items[-1:]
+    history_chars = sum(_content_sizes(item.get("content"))[0] for item in history_items)
+    text_chars = image_bytes = 0
+    for item in current:
+        text, image = _content_sizes(item.get("content"))
+        text_chars += text
+        image_bytes += image
+
+    with _stats_lock:
+        # provider-side caching only helps if this request starts with everything the last one sent
+        reused = False
+        if _last_prefix is not None and _last_prefix[1] <= len(history_items):
+            reused = _prefix_digest(instructions, history_items[:_last_prefix[1]]) == _last_prefix[0]
+        _last_prefix = (_prefix_digest(instructions, history_items), len(history_items))
+        _stats["requests"] += 1
+        _stats["prefix_reused"] += int(reused)
+        _stats["instructions_chars"] += len(instructions)
+        _stats["history_chars"] += history_chars
+        _stats["text_chars"] += text_chars
+        _stats["image_bytes"] += image_bytes
+
+    total_text = len(instructions) + history_chars + text_chars
+    return {
+        "instructions_chars": len(instructions),
+        "history_messages": len(history_items),
+        "history_chars": history_chars,
+        "text_chars": text_chars,
+        "image_bytes": image_bytes,
+        "est_text_tokens": total_text // _CHARS_PER_TOKEN,
+        "prefix_reused": reused,
+    }
+
+
+def prompt_stats() -> dict:
+    """Mean per-request prompt part sizes and how often the cached prefix was reused."""
+    with _stats_lock:
+        n = _stats["requests"]
+        return {
+            "requests": n,
+            "prefix_reuse_rate": _stats["prefix_reused"] / n if n else 0.0,
+            **{f"avg_{k}": (_stats[k] / n if n else 0.0)
+               for k in ("instructions_chars", "history_chars", "text_chars", "image_bytes")},
+        }
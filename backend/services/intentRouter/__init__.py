@@ -0,0 +1 @@
+# Package marker for the local intent router.
@@ -0,0 +1,145 @@
+# Built-in local intents: the date/time fast path and shortcut-friendly agent actions.
+# Each entry is plain data for register_intent(); add new local intents here.
+
+from .intentRouter import register_intents
+
+_HOTKEY_SCRIPT = (
+    "result = hotkey_and_verify(\n"
+    "    keys={keys},\n"
+    "    label=\"{label}\",\n"
+    "    retries=1,\n"
+    "    settle_timeout=1.0,\n"
+    "    min_change=1.2\n"
+    ")\n"
+)
+
+_FOCUS_HOTKEY_SCRIPT = (
+    "result = ensure_focus_and_hotkey(\n"
+    "    x={{center_x}},\n"
+    "    y={{center_y}},\n"
+    "    keys={keys},\n"
+    "    label=\"{label}\",\n"
+    "    retries=1,\n"
+    "    settle_timeout=1.0,\n"
+    "    min_change=0.8\n"
+    ")\n"
+)
+
+_CLOSE_TAB_SCRIPT = (
+    "result = hotkey_and_verify(\n"
+    "    keys=(\"ctrl\", \"w\"),\n"
+    "    label=\"close current tab\",\n"
+    "    retries=1,\n"
+    "    settle_timeout=1.0,\n"
+    "    min_change=1.2,\n"
+    "    fallback=lambda: click_candidates([({x1}, {y}), ({x2}, {y}), ({x3}, {y})], label=\"tab close button\")\n"
+    ")\n"
+)
+
+
+# likely tab close-button spots in physical screen pixels: offsets from the right edge, and the tab strip's y
+_TAB_CLOSE_OFFSETS = (40, 90, 140)
+_TAB_STRIP_Y = 18
+
+
+def _tab_close_points(values: dict) -> dict:
+    """The close-button spots converted to image pixels, which is what the script's coordinates are in."""
+    scale_x, scale_y = values["scale_x"], values["scale_y"]
+    screen_width = values["width"] / scale_x
+    points = {
+        f"x{i}": max(0, round((screen_width - offset) * scale_x))
+        for i, offset in enumerate(_TAB_CLOSE_OFFSETS, start=1)
+    }
+    return {**points, "y": round(_TAB_STRIP_Y * scale_y)}
+
+
+def _hotkey(keys: tuple[str, ...], label: str) -> str:
+    return _HOTKEY_SCRIPT.format(keys=repr(keys).replace("'", '"'), label=label)
+
+
+def _focus_hotkey(keys: tuple[str, ...], label: str) -> str:
+    return _FOCUS_HOTKEY_SCRIPT.format(keys=repr(keys).replace("'", '"'), label=label)
+
+
+# Registration order is the tie-break when several intents match one utterance. Phrases match whole
+# words, so plural forms the old substring match caught ("close tabs") are listed explicitly.
+DEFAULT_INTENTS = [
+    {
+        "name": "datetime",
+        "kind": "datetime",
+        "phrases": (
+            "what time",
+            "current time",
+            "time is it",
+            "what date",
+            "current date",
+            "what day",
+            "day is it",
+            "day of the week",
+            "today's date",
+            "todays date",
+        ),
+    },
+    {
+        "name": "close_tab",
+        "phrases": ("close tab", "close tabs", "close this tab", "close current tab"),
+        "script": _CLOSE_TAB_SCRIPT,
+        "context": _tab_close_points,
+        "reply": "I can close the current tab with a shortcut and verify it worked.",
+    },
+    {
+        "name": "reopen_tab",
+        "phrases": (
+            "reopen tab",
+            "reopen tabs",
+            "reopen last tab",
+            "reopen closed tab",
+            "open last closed tab",
+            "restore tab",
+            "restore tabs",
+        ),
+        "script": _hotkey(("ctrl", "shift", "t"), "reopen closed tab"),
+        "reply": "I can reopen your last closed tab using a shortcut and verify the change.",
+    },
+    {
+        "name": "new_tab",
+        "phrases": ("new tab", "new tabs", "open tab", "open tabs", "open a new tab"),
+        "exclude": ("close",),
+        "script": _hotkey(("ctrl", "t"), "open new tab"),
+        "reply": "I can open a new tab with a shortcut and verify it opened.",
+    },
+    {
+        "name": "navigate_back",
+        "phrases": ("go back", "back page", "previous page", "navigate back"),
+        "script": _hotkey(("alt", "left"), "navigate back"),
+        "reply": "I can move back using a navigation shortcut and verify it worked.",
+    },
+    {
+        "name": "navigate_forward",
+        "phrases": ("go forward", "forward page", "next page", "navigate forward"),
+        "script": _hotkey(("alt", "right"), "navigate forward"),
+        "reply": "I can move forward using a navigation shortcut and verify it worked.",
+    },
+    {
+        "name": "bold",
+        "phrases": ("bold",),
+        "script": _focus_hotkey(("ctrl", "b"), "apply bold"),
+        "reply": "I can apply bold formatting with a verified shortcut.",
+    },
+    {
+        "name": "italic",
+        "phrases": ("italic",),
+        "script": _focus_hotkey(("ctrl", "i"), "apply italic"),
+        "reply": "I can apply italic formatting with a verified shortcut.",
+    },
+    {
+        "name": "underline",
+        "phrases": ("underline",),
+        "script": _focus_hotkey(("ctrl", "u"), "apply underline"),
+        "reply": "I can apply underline formatting with a verified shortcut.",
+    },
+]
+
+
+def register_default_intents() -> None:
+    register_intents(DEFAULT_INTENTS)
@@ -0,0 +1,215 @@
+# Local intent router: declarative intents compiled into one token n-gram index.
+# A match costs one hash lookup per n-gram of the utterance plus the regexes of the
+# intents whose keywords actually occur, so it does not grow with the number of intents.
+
+import logging
+import re
+import threading
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# longest phrase (in tokens) the index will hold; longer phrases are rejected at registration
+MAX_PHRASE_TOKENS = 6
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+_registry_lock = threading.Lock()
+# intent name -> compiled intent; replaced wholesale on every registration so matching never locks
+_intents: dict[str, dict] = {}
+_phrase_index: dict[tuple[str, ...], tuple[str, ...]] = {}
+_keyword_index: dict[str, tuple[str, ...]] = {}
+_seq = 0
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; keeps contractions like "today's" as one token."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _phrase_key(phrase: str) -> tuple[str, ...]:
+    key = tuple(tokenize(phrase))
+    if not key:
+        raise ValueError(f"Intent phrase has no words: {phrase!r}")
+    if len(key) > MAX_PHRASE_TOKENS:
+        raise ValueError(f"Intent phrase longer than {MAX_PHRASE_TOKENS} words: {phrase!r}")
+    return key
+
+
+def _rebuild_indexes(intents: dict[str, dict]) -> tuple[dict, dict]:
+    phrases: dict[tuple[str, ...], list[str]] = {}
+    keywords: dict[str, list[str]] = {}
+    for name, intent in intents.items():
+        for key in intent["phrases"]:
+            phrases.setdefault(key, []).append(name)
+        for keyword in intent["keywords"]:
+            keywords.setdefault(keyword, []).append(name)
+    return (
+        {k: tuple(v) for k, v in phrases.items()},
+        {k: tuple(v) for k, v in keywords.items()},
+    )
+
+
+def _compile_intent(
+    name: str,
+    phrases: Iterable[str] = (),
+    patterns: Iterable[str] = (),
+    keywords: Iterable[str] = (),
+    exclude: Iterable[str] = (),
+    kind: str = "agent",
+    script: Optional[str] = None,
+    reply: Optional[str] = None,
+    context: Optional[Callable[[dict], dict]] = None,
+    priority: int = 0,
+) -> dict:
+    phrase_keys = tuple(dict.fromkeys(_phrase_key(p) for p in phrases))
+    compiled = tuple(re.compile(p, re.IGNORECASE) for p in patterns)
+    keyword_set = tuple(dict.fromkeys(k.lower() for k in keywords))
+    if compiled and not keyword_set:
+        raise ValueError(f"Intent {name!r} has regex patterns but no gating keywords")
+    if not phrase_keys and not compiled:
+        raise ValueError(f"Intent {name!r} needs at least one phrase or pattern")
+    return {
+        "name": name,
+        "kind": kind,
+        "phrases": phrase_keys,
+        "patterns": compiled,
+        "keywords": keyword_set,
+        "exclude": frozenset(w for e in exclude for w in tokenize(e)),
+        "script": script,
+        "reply": reply,
+        "context": context,
+        "priority": int(priority),
+    }
+
+
+def register_intents(specs: Iterable[dict]) -> None:
+    """Register many intent specs (register_intent kwargs) with a single index rebuild."""
+    global _intents, _phrase_index, _keyword_index, _seq
+    compiled = [_compile_intent(**spec) for spec in specs]
+    with _registry_lock:
+        intents = dict(_intents)
+        for intent in compiled:
+            _seq += 1
+            intent["seq"] = _seq
+            intents[intent["name"]] = intent
+        phrase_index, keyword_index = _rebuild_indexes(intents)
+        _intents, _phrase_index, _keyword_index = intents, phrase_index, keyword_index
+    logger.debug("Registered %d intents (%d total)", len(compiled), len(intents))
+
+
+def register_intent(name: str, **spec) -> None:
+    """
+    Add or replace an intent.
+    phrases match as whole-word token sequences anywhere in the utterance. patterns are regexes
+    over the space-joined tokens (named groups become slots) that only run when one of keywords
+    appears as a token. exclude vetoes the intent if any of its words appear. script is a
+    str.format template filled from width/height/center_x/center_y (image pixels), scale_x/scale_y
+    (image pixels per screen pixel), whatever context(values) adds, and the slots. Ties go to the higher priority, then the earlier registration.
+    """
+    register_intents([{"name": name, **spec}])
+
+
+def unregister_intent(name: str) -> bool:
+    global _intents, _phrase_index, _keyword_index
+    with _registry_lock:
+        if name not in _intents:
+            return False
+        intents = dict(_intents)
+        del intents[name]
+        phrase_index, keyword_index = _rebuild_indexes(intents)
+        _intents, _phrase_index, _keyword_index = intents, phrase_index, keyword_index
+    return True
+
+
+def registered_intents() -> list[str]:
+    return list(_intents)
+
+
+def intent_phrases(kinds: Optional[Iterable[str]] = None) -> list[str]:
+    """Every fixed phrase of the registered intents (optionally only those of the given kinds)."""
+    allowed = set(kinds) if kinds is not None else None
+    return [
+        " ".join(key)
+        for intent in _intents.values()
+        if allowed is None or intent["kind"] in allowed
+        for key in intent["phrases"]
+    ]
+
+
+def intent_replies() -> list[str]:
+    """Every fixed spoken reply in the table (used to pre-synthesize TTS)."""
+    return [i["reply"] for i in _intents.values() if i["reply"]]
+
+
+def match_intent(text: str, kinds: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    Best intent for an utterance, or None.
+    Returns {"name", "kind", "slots", "reply"}; kinds restricts which intent kinds may match.
+    """
+    # one consistent snapshot; registration swaps these references instead of mutating them
+    intents, phrase_index, keyword_index = _intents, _phrase_index, _keyword_index
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    allowed = set(kinds) if kinds is not None else None
+    token_set = set(tokens)
+
+    hits: dict[str, dict] = {}
+    count = len(tokens)
+    for i in range(count):
+        for n in range(1, min(MAX_PHRASE_TOKENS, count - i) + 1):
+            for name in phrase_index.get(tuple(tokens[i:i + n]), ()):
+                hits.setdefault(name, {})
+
+    lowered = None
+    for token in token_set:
+        for name in keyword_index.get(token, ()):
+            if name in hits:
+                continue
+            if lowered is None:
+                lowered = " ".join(tokens)
+            for pattern in intents[name]["patterns"]:
+                found = pattern.search(lowered)
+                if found:
+                    hits[name] = {k: v for k, v in found.groupdict().items() if v is not None}
+                    break
+
+    best = None
+    for name, slots in hits.items():
+        intent = intents[name]
+        if allowed is not None and intent["kind"] not in allowed:
+            continue
+        if intent["exclude"] & token_set:
+            continue
+        rank = (-intent["priority"], intent["seq"])
+        if best is None or rank < best[0]:
+            best = (rank, intent, slots)
+    if best is None:
+        return None
+    _, intent, slots = best
+    return {"name": intent["name"], "kind": intent["kind"], "slots": slots, "reply": intent["reply"]}
+
+
+def render_intent(match: dict, meta: Optional[dict] = None) -> tuple[str, str]:
+    """Fill the matched intent's script template. Returns (script_text, reply_text)."""
+    intent = _intents.get(match["name"])
+    if intent is None:
+        raise KeyError(f"Intent no longer registered: {match['name']}")
+    meta = meta or {}
+    width = int(meta.get("width", 1920) or 1920)
+    height = int(meta.get("height", 1080) or 1080)
+    scale_x = float(meta.get("scale_x", 1.0) or 1.0)
+    values = {
+        "width": width,
+        "height": height,
+        "scale_x": scale_x,
+        "scale_y": float(meta.get("scale_y", scale_x) or scale_x),
+        "center_x": max(0, width // 2),
+        "center_y": max(0, height // 2),
+    }
+    if intent["context"] is not None:
+        values.update(intent["context"](values))
+    values.update(match.get("slots") or {})
+    script = intent["script"].format(**values) if intent["script"] else ""
+    return script, intent["reply"] or ""
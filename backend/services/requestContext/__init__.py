@@ -0,0 +1 @@
+# Package marker for per-request pipeline state.
@@ -0,0 +1,112 @@
+# Per-request state for the /ai pipeline.
+# Everything one request needs (input, session, capture, screen mapping, timings) lives on its own
+# RequestContext instead of module globals, so concurrent requests cannot corrupt each other.
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Optional
+
+from services.scriptClient.scriptClient import ScreenMapping, make_screen_mapping
+from services.sessionMemory.sessionMemory import SessionMemory, get_session
+from utils.cancellation import CancelToken
+from utils.captureEngine.captureEngine import Frame
+from utils.eventBus import publish
+from utils.tracing import observe
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContext:
+    """One /ai request as it moves through classify -> capture -> LLM -> script -> speech."""
+
+    def __init__(
+        self,
+        user_input: str,
+        session_id: Optional[str] = None,
+        vision: Optional[dict] = None,
+        classification: Optional[str] = None,
+    ) -> None:
+        self.request_id = uuid.uuid4().hex[:12]
+        self.user_input = user_input
+        self.session_id = session_id
+        self.vision = dict(vision or {})
+        self.classification = classification
+        self.capture: Optional[Future] = None
+        self.cancel = CancelToken()
+        self.meta: dict = {}
+        self.image_data_url: Optional[str] = None
+        self.frame: Optional[Frame] = None
+        # learned-action fingerprint of the screen the current script is planned on (AGENT requests only)
+        self.fingerprint: Optional[dict] = None
+        self.screen: ScreenMapping = ScreenMapping()
+        self.memory: SessionMemory = get_session(session_id)
+        # history is snapshotted once so a concurrent request in the same session can't shift it mid-turn
+        self.history: list[dict] = []
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.timings: dict[str, float] = {}
+
+    def use_capture(self, captured: dict) -> None:
+        """Adopt a _capture_screen() result: image, metadata and the coordinate mapping for scripts."""
+        self.meta = captured["meta"]
+        self.image_data_url = captured["image_data_url"]
+        self.frame = captured["result"].get("frame")
+        self.screen = make_screen_mapping(
+            self.meta["origin_left"], self.meta["origin_top"], self.meta["scale_x"], self.meta["scale_y"]
+        )
+
+    def snapshot_history(self) -> list[dict]:
+        self.history = self.memory.history()
+        return self.history
+
+    def mark(self, stage: str) -> float:
+        """Record the time since the previous mark under stage (and publish it); returns it in ms."""
+        now = time.perf_counter()
+        elapsed = (now - self._last_mark) * 1000.0
+        self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+        self._last_mark = now
+        publish("stage", request_id=self.request_id, stage=stage, ms=round(elapsed, 1))
+        return elapsed
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def log_summary(self) -> None:
+        total = self.elapsed_ms()
+        observe("request", total / 1000.0, classification=(self.classification or "").strip("-").lower() or None)
+        stages = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.timings.items())
+        logger.info("Request %s done in %.0f ms (%s)", self.request_id, total, stages or "no stages")
+        publish("request", request_id=self.request_id, state="cancelled" if self.cancel.cancelled else "done",
+                ms=round(total, 1))
+
+
+_active_lock = threading.Lock()
+_active: dict[str, RequestContext] = {}
+
+
+def track_request(ctx: RequestContext) -> RequestContext:
+    """Make ctx cancellable through cancel_requests() until release_request(ctx)."""
+    with _active_lock:
+        _active[ctx.request_id] = ctx
+    return ctx
+
+
+def release_request(ctx: RequestContext) -> None:
+    with _active_lock:
+        _active.pop(ctx.request_id, None)
+
+
+def cancel_requests(request_id: Optional[str] = None, reason: str = "cancelled") -> list[str]:
+    """Cancel one in-flight request, or all of them when request_id is None. Returns the ids cancelled."""
+    with _active_lock:
+        if request_id is None:
+            targets = list(_active.values())
+        else:
+            targets = [_active[request_id]] if request_id in _active else []
+    cancelled = [ctx.request_id for ctx in targets if ctx.cancel.cancel(reason)]
+    if cancelled:
+        logger.info("Cancelled request(s) %s (%s)", ", ".join(cancelled), reason)
+    return cancelled
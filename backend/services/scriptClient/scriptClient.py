@@ -3,47 +3,164 @@
 import ast
 import builtins
 import logging
-from typing import Any
+from contextvars import ContextVar
+from typing import Any, Callable, NamedTuple, Optional
 
 import math
 import pyautogui
 import random
+import sys
 import time
+import types
 
 try:
     import PIL
-    from PIL import ImageChops, ImageStat
 except ImportError:
     PIL = None
-    ImageChops = None
-    ImageStat = None
+
+from utils.cancellation import CancelToken, Cancelled
+from utils.captureEngine.captureEngine import Frame
+from utils.tracing import span, traced
+
+from .visualVerifier import (
+    HOVER_SETTLE_S,
+    ROI_RADIUS,
+    SETTLE_TIMEOUT_S,
+    capture_frame,
+    frame_matches,
+    measure_change,
+    wait_for_settle,
+)
 
 logger = logging.getLogger(__name__)
-_SCREEN_ORIGIN_X = 0
-_SCREEN_ORIGIN_Y = 0
+_SCRIPT_FILENAME = "<script>"
+
+
+class ScreenMapping(NamedTuple):
+    """Where the screenshot sent to the model sits on the virtual desktop, and its scale."""
 
+    origin_x: int = 0
+    origin_y: int = 0
+    # image pixels per screen pixel; below 1.0 when the screenshot sent to the model was downscaled
+    scale_x: float = 1.0
+    scale_y: float = 1.0
 
-def set_screen_origin(x: int, y: int) -> None:
-    """Set the top-left origin of the screenshot within the virtual desktop."""
-    global _SCREEN_ORIGIN_X, _SCREEN_ORIGIN_Y
-    _SCREEN_ORIGIN_X = int(x)
-    _SCREEN_ORIGIN_Y = int(y)
+
+# Per request (context-local), so concurrent requests never see each other's screenshot geometry.
+_screen_mapping: ContextVar[ScreenMapping] = ContextVar("screen_mapping", default=ScreenMapping())
+
+
+def make_screen_mapping(x: int, y: int, scale_x: float = 1.0, scale_y: float | None = None) -> ScreenMapping:
+    return ScreenMapping(
+        int(x),
+        int(y),
+        float(scale_x) or 1.0,
+        float(scale_y if scale_y is not None else scale_x) or 1.0,
+    )
+
+
+def set_screen_origin(x: int, y: int, scale_x: float = 1.0, scale_y: float | None = None) -> ScreenMapping:
+    """Set the top-left origin of the screenshot within the virtual desktop, and its scale, for the current context."""
+    mapping = make_screen_mapping(x, y, scale_x, scale_y)
+    _screen_mapping.set(mapping)
+    return mapping
+
+
+def current_screen_mapping() -> ScreenMapping:
+    return _screen_mapping.get()
 
 
 def _to_screen_xy(x: float, y: float) -> tuple[int, int]:
-    sx = int(round(float(x))) + _SCREEN_ORIGIN_X
-    sy = int(round(float(y))) + _SCREEN_ORIGIN_Y
+    """Map screenshot-local coordinates (possibly downscaled) to physical screen coordinates."""
+    mapping = _screen_mapping.get()
+    sx = int(round(float(x) / mapping.scale_x)) + mapping.origin_x
+    sy = int(round(float(y) / mapping.scale_y)) + mapping.origin_y
     return sx, sy
 
 
-def _snapshot_gray():
-    """Capture a grayscale screenshot for lightweight visual-diff verification."""
-    return pyautogui.screenshot().convert("L")
+def _await_change(
+    before: Frame,
+    point: tuple[int, int] | None,
+    min_change: float,
+    post_delay: float,
+    roi_radius: int,
+    global_check: bool,
+    settle: bool,
+    settle_timeout: float | None,
+) -> tuple[Frame, dict, float]:
+    """
+    Wait for the UI to react. With settle, poll until the change is visible and stable
+    (bounded by settle_timeout, default max(post_delay, SETTLE_TIMEOUT_S)); otherwise sleep post_delay.
+    """
+    if settle:
+        timeout = settle_timeout if settle_timeout is not None else max(float(post_delay), SETTLE_TIMEOUT_S)
+        return wait_for_settle(before, point, min_change, timeout, roi_radius, global_check)
+    time.sleep(post_delay)
+    after = capture_frame(point, roi_radius, global_check)
+    return after, measure_change(before, after, point, roi_radius=roi_radius, global_check=global_check), post_delay
 
 
-def _mean_abs_diff(before, after) -> float:
-    diff = ImageChops.difference(before, after)
-    return float(ImageStat.Stat(diff).mean[0])
+def _click_and_verify(
+    x: float,
+    y: float,
+    label: str,
+    retries: int,
+    post_delay: float,
+    min_change: float,
+    move_duration: float,
+    roi_radius: int,
+    global_check: bool,
+    before: Frame | None,
+    settle: bool = True,
+    settle_timeout: float | None = None,
+) -> tuple[dict[str, Any] | None, Frame | None, float]:
+    """
+    Click/verify loop. Returns (result or None, last captured frame, last change).
+    Each attempt's "after" frame (taken with the cursor already on the target) is reused as the
+    next attempt's "before".
+    """
+    last_change = 0.0
+    sx, sy = _to_screen_xy(x, y)
+    if before is not None and not frame_matches(before, (sx, sy), roi_radius, global_check):
+        # e.g. the previous candidate's ROI; this point needs its own box
+        before = None
+    for attempt in range(int(retries) + 1):
+        with span("click_attempt"):
+            pyautogui.moveTo(sx, sy, duration=move_duration)
+            if before is None:
+                # after the move, so what merely hovering the target changes is not taken for the click's effect
+                time.sleep(HOVER_SETTLE_S)
+                before = capture_frame((sx, sy), roi_radius, global_check)
+            pyautogui.click(sx, sy)
+            after, measured, waited = _await_change(
+                before, (sx, sy), min_change, post_delay, roi_radius, global_check, settle, settle_timeout
+            )
+        last_change = measured["change"]
+        if last_change >= float(min_change):
+            return {
+                "ok": True,
+                "x": sx,
+                "y": sy,
+                "verified": True,
+                "attempt": attempt + 1,
+                "change": last_change,
+                "roi_change": measured["roi_change"],
+                "global_change": measured["global_change"],
+                "region": measured["region"],
+                "waited": waited,
+                "label": label,
+            }, after, last_change
+        logger.warning(
+            "click_and_verify: no visible change for '%s' at (%s, %s), attempt %s/%s (change=%.3f)",
+            label,
+            sx,
+            sy,
+            attempt + 1,
+            int(retries) + 1,
+            last_change,
+        )
+        before = after
+    return None, before, last_change
 
 
 def click_and_verify(
@@ -54,9 +171,18 @@ def click_and_verify(
     post_delay: float = 0.8,
     min_change: float = 1.5,
     move_duration: float = 0.15,
+    roi_radius: int = ROI_RADIUS,
+    global_check: bool = False,
+    settle: bool = True,
+    settle_timeout: float | None = None,
 ) -> dict[str, Any]:
     """
     Click screenshot-local coordinates and verify that the screen changed.
+    Only a box of roi_radius screen pixels around the click is grabbed and diffed; global_check
+    grabs the whole desktop and adds a coarse whole-desktop score. Both are whole-desktop mean luma
+    deltas, which is what min_change is compared against. "region" reports where the change happened.
+    With settle (default) the check returns as soon as the UI has reacted and stopped moving;
+    post_delay is then only the lower bound of the timeout. settle=False restores the fixed sleep.
     Raises RuntimeError after retries if no visible UI change is detected.
     """
     if PIL is None:
@@ -66,39 +192,15 @@ def click_and_verify(
         time.sleep(post_delay)
         return {"ok": True, "x": sx, "y": sy, "verified": False}
 
-    last_diff = 0.0
-    for attempt in range(int(retries) + 1):
-        before = _snapshot_gray()
-        sx, sy = _to_screen_xy(x, y)
-        pyautogui.moveTo(sx, sy, duration=move_duration)
-        pyautogui.click(sx, sy)
-        time.sleep(post_delay)
-        after = _snapshot_gray()
-        change = _mean_abs_diff(before, after)
-        last_diff = change
-        if change >= float(min_change):
-            return {
-                "ok": True,
-                "x": sx,
-                "y": sy,
-                "verified": True,
-                "attempt": attempt + 1,
-                "change": change,
-                "label": label,
-            }
-        logger.warning(
-            "click_and_verify: no visible change for '%s' at (%s, %s), attempt %s/%s (change=%.3f)",
-            label,
-            sx,
-            sy,
-            attempt + 1,
-            int(retries) + 1,
-            change,
-        )
-
+    result, _frame, last_change = _click_and_verify(
+        x, y, label, retries, post_delay, min_change, move_duration, roi_radius, global_check, None,
+        settle, settle_timeout,
+    )
+    if result is not None:
+        return result
     raise RuntimeError(
         f"click_and_verify failed for '{label}' after {int(retries) + 1} attempts "
-        f"(last_change={last_diff:.3f}, required={float(min_change):.3f})"
+        f"(last_change={last_change:.3f}, required={float(min_change):.3f})"
     )
 
 
@@ -108,33 +210,177 @@ def click_candidates(
     retries_per_point: int = 1,
     post_delay: float = 0.8,
     min_change: float = 1.5,
+    roi_radius: int = ROI_RADIUS,
+    global_check: bool = False,
+    settle: bool = True,
+    settle_timeout: float | None = None,
 ) -> dict[str, Any]:
     """
     Try multiple candidate screenshot-local points until one click verifies.
+    The last frame of a failed candidate is the "before" frame of the next one.
     """
     if not points:
         raise ValueError("click_candidates requires at least one point")
 
+    if PIL is None:
+        x, y = points[0]
+        return click_and_verify(x, y, label=label, post_delay=post_delay)
+
     errors: list[str] = []
+    frame: Frame | None = None
     for idx, point in enumerate(points, start=1):
         x, y = point
+        candidate_label = f"{label} candidate {idx}"
         try:
-            result = click_and_verify(
-                x=x,
-                y=y,
-                label=f"{label} candidate {idx}",
-                retries=retries_per_point,
-                post_delay=post_delay,
-                min_change=min_change,
+            result, frame, last_change = _click_and_verify(
+                x,
+                y,
+                candidate_label,
+                retries_per_point,
+                post_delay,
+                min_change,
+                0.15,
+                roi_radius,
+                global_check,
+                frame,
+                settle,
+                settle_timeout,
             )
-            result["candidate_index"] = idx
-            return result
         except Exception as e:
             errors.append(str(e))
+            frame = None
+            continue
+        if result is not None:
+            result["candidate_index"] = idx
+            return result
+        errors.append(
+            f"click_and_verify failed for '{candidate_label}' after {int(retries_per_point) + 1} attempts "
+            f"(last_change={last_change:.3f}, required={float(min_change):.3f})"
+        )
 
     raise RuntimeError(f"click_candidates failed for '{label}': {' | '.join(errors)}")
 
 
+def _normalize_keys(keys: Any) -> tuple[str, ...]:
+    if isinstance(keys, str):
+        keys = keys.split("+")
+    normalized = tuple(str(k).strip().lower() for k in keys if str(k).strip())
+    if not normalized:
+        raise ValueError("hotkey requires at least one key")
+    return normalized
+
+
+def _hotkey_and_verify(
+    keys: tuple[str, ...],
+    label: str,
+    retries: int,
+    post_delay: float,
+    min_change: float,
+    fallback: Callable[[], Any] | None,
+    settle: bool,
+    settle_timeout: float | None,
+    point: tuple[int, int] | None,
+) -> dict[str, Any]:
+    if PIL is None:
+        pyautogui.hotkey(*keys)
+        time.sleep(post_delay)
+        return {"ok": True, "keys": list(keys), "verified": False, "label": label}
+
+    last_change = 0.0
+    # a shortcut's effect can be anywhere, so hotkeys always check the whole (downsampled) desktop
+    before = capture_frame(point, ROI_RADIUS, True)
+    for attempt in range(int(retries) + 1):
+        with span("hotkey_attempt"):
+            pyautogui.hotkey(*keys)
+            after, measured, waited = _await_change(
+                before, point, min_change, post_delay, ROI_RADIUS, True, settle, settle_timeout
+            )
+        last_change = measured["change"]
+        if last_change >= float(min_change):
+            return {
+                "ok": True,
+                "keys": list(keys),
+                "verified": True,
+                "attempt": attempt + 1,
+                "change": last_change,
+                "region": measured["region"],
+                "waited": waited,
+                "label": label,
+            }
+        logger.warning(
+            "hotkey_and_verify: no visible change for '%s' (%s), attempt %s/%s (change=%.3f)",
+            label,
+            "+".join(keys),
+            attempt + 1,
+            int(retries) + 1,
+            last_change,
+        )
+        before = after
+
+    if fallback is not None:
+        logger.info("hotkey_and_verify: shortcut for '%s' did not verify, running fallback", label)
+        fallback_result = fallback()
+        return {
+            "ok": True,
+            "keys": list(keys),
+            "verified": bool(isinstance(fallback_result, dict) and fallback_result.get("verified")),
+            "fallback": True,
+            "fallback_result": fallback_result,
+            "label": label,
+        }
+
+    raise RuntimeError(
+        f"hotkey_and_verify failed for '{label}' ({'+'.join(keys)}) after {int(retries) + 1} attempts "
+        f"(last_change={last_change:.3f}, required={float(min_change):.3f})"
+    )
+
+
+def hotkey_and_verify(
+    keys: tuple[str, ...] | list[str] | str,
+    label: str = "shortcut",
+    retries: int = 1,
+    post_delay: float = 0.35,
+    min_change: float = 1.2,
+    fallback: Callable[[], Any] | None = None,
+    settle: bool = True,
+    settle_timeout: float | None = None,
+) -> dict[str, Any]:
+    """
+    Press a keyboard shortcut (e.g. ("ctrl", "w") or "ctrl+w") and verify the screen changed.
+    If it never verifies, fallback() is called (e.g. a click_candidates lambda) and its result returned;
+    without a fallback a RuntimeError is raised after retries.
+    """
+    return _hotkey_and_verify(
+        _normalize_keys(keys), label, retries, post_delay, min_change, fallback, settle, settle_timeout, None
+    )
+
+
+def ensure_focus_and_hotkey(
+    x: float,
+    y: float,
+    keys: tuple[str, ...] | list[str] | str,
+    label: str = "shortcut",
+    retries: int = 1,
+    post_delay: float = 0.35,
+    min_change: float = 0.8,
+    fallback: Callable[[], Any] | None = None,
+    settle: bool = True,
+    settle_timeout: float | None = None,
+    focus_delay: float = 0.05,
+) -> dict[str, Any]:
+    """
+    Click screenshot-local (x, y) to focus the target, then hotkey_and_verify.
+    Verification looks at the region around the focus point as well as the whole screen.
+    """
+    keys = _normalize_keys(keys)
+    sx, sy = _to_screen_xy(x, y)
+    pyautogui.click(sx, sy)
+    time.sleep(focus_delay)
+    return _hotkey_and_verify(
+        keys, label, retries, post_delay, min_change, fallback, settle, settle_timeout, (sx, sy)
+    )
+
+
 def _validate_script(script_text: str) -> None:
     """Validate Python syntax only. No import restrictions (dev mode)."""
     try:
@@ -143,13 +389,53 @@ def _validate_script(script_text: str) -> None:
         raise ValueError(f"Invalid Python syntax: {e}") from e
 
 
-def run_script(script_text: str) -> dict[str, Any]:
+def _cancellable_time(cancel: CancelToken) -> types.ModuleType:
+    """A stand-in for the time module whose sleep() wakes up (and raises) on cancel."""
+    module = types.ModuleType("time")
+    module.__dict__.update(time.__dict__)
+
+    def sleep(seconds: float) -> None:
+        if cancel.wait(max(0.0, float(seconds))):
+            raise Cancelled(cancel.reason or "cancelled")
+
+    module.sleep = sleep
+    return module
+
+
+def _cancel_tracer(cancel: CancelToken):
+    """
+    sys.settrace hook that raises Cancelled on the next line the script executes once cancel is set.
+    Only script frames are traced, so helpers (click_and_verify, pyautogui) run at full speed.
+    """
+    def trace_line(frame, event, arg):
+        if cancel.cancelled:
+            raise Cancelled(cancel.reason or "cancelled")
+        return trace_line
+
+    def trace_call(frame, event, arg):
+        if frame.f_code.co_filename != _SCRIPT_FILENAME:
+            return None
+        return trace_line(frame, event, arg)
+
+    return trace_call
+
+
+@traced("script")
+def run_script(
+    script_text: str,
+    mapping: Optional[ScreenMapping] = None,
+    cancel: Optional[CancelToken] = None,
+) -> dict[str, Any]:
     """
     Validate and execute the script text in-process.
     All imports allowed (dev mode); use standard __builtins__.
+    mapping is the screenshot geometry the script's coordinates refer to; it is bound for the
+    duration of the script (so it is safe on worker threads), defaulting to the current context's.
+    cancel stops the script at its next line (or mid time.sleep) once cancelled.
 
     Returns:
-        {"ok": True} on success, {"ok": False, "error": "..."} on validation or runtime error.
+        {"ok": True} on success, {"ok": False, "error": "..."} on validation or runtime error,
+        {"ok": False, "error": "Cancelled", "cancelled": True} if cancelled.
     """
     script_text = (script_text or "").strip()
     if not script_text:
@@ -162,24 +448,46 @@ def run_script(script_text: str) -> dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
+    if cancel is not None and cancel.cancelled:
+        return {"ok": False, "error": "Cancelled", "cancelled": True}
+
+    mapping = mapping or _screen_mapping.get()
     script_globals: dict[str, Any] = {
         "pyautogui": pyautogui,
-        "time": time,
+        "time": _cancellable_time(cancel) if cancel is not None else time,
         "random": random,
         "math": math,
-        "SCREEN_ORIGIN_X": _SCREEN_ORIGIN_X,
-        "SCREEN_ORIGIN_Y": _SCREEN_ORIGIN_Y,
+        "SCREEN_ORIGIN_X": mapping.origin_x,
+        "SCREEN_ORIGIN_Y": mapping.origin_y,
+        "SCREEN_SCALE_X": mapping.scale_x,
+        "SCREEN_SCALE_Y": mapping.scale_y,
         "to_screen_xy": _to_screen_xy,
         "click_and_verify": click_and_verify,
         "click_candidates": click_candidates,
+        "hotkey_and_verify": hotkey_and_verify,
+        "ensure_focus_and_hotkey": ensure_focus_and_hotkey,
         "__builtins__": builtins.__dict__,
     }
     if PIL is not None:
         script_globals["PIL"] = PIL
 
+    token = _screen_mapping.set(mapping)
+    previous_trace = sys.gettrace()
+    if cancel is not None:
+        sys.settrace(_cancel_tracer(cancel))
     try:
-        exec(compile(script_text, "<script>", "exec"), script_globals)
+        exec(compile(script_text, _SCRIPT_FILENAME, "exec"), script_globals)
+        if cancel is not None and cancel.cancelled:
+            # the script swallowed Cancelled in its own except clause
+            return {"ok": False, "error": "Cancelled", "cancelled": True}
         return {"ok": True}
+    except Cancelled:
+        logger.info("Script cancelled")
+        return {"ok": False, "error": "Cancelled", "cancelled": True}
     except Exception as e:
         logger.exception("Script execution failed")
         return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        if cancel is not None:
+            sys.settrace(previous_trace)
+        _screen_mapping.reset(token)
@@ -0,0 +1,337 @@
+# Pool of pre-warmed script worker processes (see scriptWorker) with a wall-clock limit per script.
+# A worker that times out, is cancelled or dies is killed and replaced in the background, so a hung
+# script never blocks the server and the next command still finds a warm worker. Workers that fail to
+# start are retried with backoff; while none is up, scripts run in-process rather than waiting, under
+# the same limit enforced cooperatively (the script stops at its next line or sleep).
+
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from utils.cancellation import CancelToken
+from utils.tracing import count, merge_metrics, span
+
+from .scriptClient import ScreenMapping, current_screen_mapping, run_script
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# 0 runs scripts in the server process (no isolation, no time limit)
+POOL_SIZE = int(os.getenv("THEO_SCRIPT_WORKERS", "2"))
+SCRIPT_TIMEOUT_S = float(os.getenv("THEO_SCRIPT_TIMEOUT_S", "30"))
+READY_TIMEOUT_S = 20.0  # worker start-up (interpreter + pyautogui/PIL imports)
+POLL_S = 0.05  # how often a waiting run checks its deadline and cancel token
+SPAWN_BACKOFF_S = 0.5  # first retry delay after a failed worker start, doubled up to SPAWN_BACKOFF_MAX_S
+SPAWN_BACKOFF_MAX_S = 30.0
+
+
+class ScriptWorker:
+    """One worker process and a reader thread that turns its protocol lines into messages."""
+
+    def __init__(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "services.scriptClient.scriptWorker"],
+            cwd=BACKEND_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+        )
+        # parsed messages; None once the worker's stdout closes
+        self.messages: "queue.Queue[Optional[dict]]" = queue.Queue()
+        threading.Thread(target=self._read, name=f"script-worker-{self.proc.pid}", daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.proc.stdout:
+            try:
+                self.messages.put(json.loads(line))
+            except ValueError:
+                logger.warning("Script worker %s sent a malformed line: %r", self.proc.pid, line[:200])
+        self.messages.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            message = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        return bool(message and message.get("ready"))
+
+    def send(self, job: dict) -> None:
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=2.0)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning("Could not kill script worker %s: %s", self.proc.pid, e)
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class ScriptPool:
+    def __init__(self, size: int, timeout: float) -> None:
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.Queue[ScriptWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._workers: set[ScriptWorker] = set()  # ready workers, idle or busy
+        self._starting = 0
+        self._spawn_failures = 0  # consecutive; reset by the next worker that comes up
+        self._stats = {"runs": 0, "timeouts": 0, "cancelled": 0, "crashes": 0, "spawned": 0, "spawn_failures": 0,
+                       "in_process": 0, "spawn_ms": 0.0}
+
+    def start(self) -> None:
+        """Spawn the workers in the background; safe to call repeatedly."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._spawn_async()
+
+    def _spawn_async(self) -> None:
+        threading.Thread(target=self._spawn, name="script-worker-spawn", daemon=True).start()
+
+    def _spawn(self) -> None:
+        """Start one worker, retrying with backoff until it comes up or the pool shuts down."""
+        delay = SPAWN_BACKOFF_S
+        while not self._closed:
+            started = time.perf_counter()
+            with self._lock:
+                self._starting += 1
+            worker = None
+            try:
+                worker = ScriptWorker()
+                ready = worker.wait_ready(READY_TIMEOUT_S)
+            except OSError as e:
+                logger.error("Could not start script worker: %s", e)
+                ready = False
+            if ready and not self._closed:
+                spawn_ms = (time.perf_counter() - started) * 1000.0
+                with self._lock:
+                    self._starting -= 1
+                    self._spawn_failures = 0
+                    self._workers.add(worker)
+                    self._stats["spawned"] += 1
+                    self._stats["spawn_ms"] += spawn_ms
+                logger.info("Script worker %s ready in %.0f ms", worker.proc.pid, spawn_ms)
+                self._idle.put(worker)
+                return
+            if worker is not None:
+                worker.kill()
+            with self._lock:
+                self._starting -= 1
+                self._spawn_failures += 1
+                self._stats["spawn_failures"] += 1
+            if self._closed:
+                return
+            logger.error("Script worker failed to start; retrying in %.1fs", delay)
+            time.sleep(delay)
+            delay = min(delay * 2, SPAWN_BACKOFF_MAX_S)
+
+    def _replace(self, worker: ScriptWorker, reason: str) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            self._stats[reason] += 1
+        count("script_workers_replaced", reason=reason)
+        if not self._closed:
+            self._spawn_async()
+
+    def _worth_waiting(self) -> bool:
+        # a busy worker will come back; a first start that hasn't failed yet is probably just slow
+        with self._lock:
+            return bool(self._workers) or (self._starting > 0 and self._spawn_failures == 0)
+
+    def _acquire(self, cancel: Optional[CancelToken]) -> Optional[ScriptWorker]:
+        """An idle live worker; None when none is up (or none frees up within READY_TIMEOUT_S) or on cancel."""
+        deadline = time.monotonic() + READY_TIMEOUT_S
+        while True:
+            if cancel is not None and cancel.cancelled:
+                return None
+            try:
+                worker = self._idle.get(timeout=POLL_S)
+            except queue.Empty:
+                if not self._worth_waiting() or time.monotonic() >= deadline:
+                    return None
+                continue
+            if worker.alive:
+                return worker
+            self._replace(worker, "crashes")
+
+    def run(
+        self,
+        script_text: str,
+        mapping: ScreenMapping,
+        cancel: Optional[CancelToken] = None,
+        timeout: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """
+        Run one script on an idle worker; same result shape as run_script. Falls back to running it
+        in-process when no worker is up (e.g. they keep failing to start).
+        """
+        self.start()
+        limit = self.timeout if timeout is None else float(timeout)
+        worker = self._acquire(cancel)
+        if cancel is not None and cancel.cancelled:
+            if worker is not None:
+                self._idle.put(worker)
+            return {"ok": False, "error": "Cancelled", "cancelled": True}
+        if worker is None:
+            logger.warning("No script worker ready; running the script in-process")
+            with self._lock:
+                self._stats["in_process"] += 1
+            return self._run_in_process(script_text, mapping, cancel, limit)
+
+        with self._lock:
+            self._stats["runs"] += 1
+        try:
+            worker.send({"script": script_text, "mapping": list(mapping)})
+        except OSError as e:
+            self._replace(worker, "crashes")
+            return {"ok": False, "error": f"Script worker unavailable: {e}"}
+
+        deadline = time.monotonic() + limit
+        while True:
+            try:
+                result = worker.messages.get(timeout=POLL_S)
+            except queue.Empty:
+                if cancel is not None and cancel.cancelled:
+                    # killing the process is what frees the mouse and keyboard immediately
+                    self._replace(worker, "cancelled")
+                    return {"ok": False, "error": "Cancelled", "cancelled": True}
+                if time.monotonic() >= deadline:
+                    logger.warning("Script exceeded %.1fs; killing worker %s", limit, worker.proc.pid)
+                    self._replace(worker, "timeouts")
+                    return {"ok": False, "error": f"TimeoutError: script exceeded the {limit:g}s limit",
+                            "timed_out": True}
+                continue
+            if result is None:
+                code = worker.proc.wait()
+                self._replace(worker, "crashes")
+                return {"ok": False, "error": f"Script worker exited unexpectedly (code {code})"}
+            self._idle.put(worker)
+            merge_metrics(result.pop("metrics", None))
+            return result
+
+    def _run_in_process(
+        self,
+        script_text: str,
+        mapping: ScreenMapping,
+        cancel: Optional[CancelToken],
+        limit: float,
+    ) -> dict[str, Any]:
+        """
+        run_script under the pool's time limit. Nothing can be killed here, so the limit cancels the
+        script instead: it stops at its next line or sleep, though not inside a blocking helper call.
+        """
+        token = CancelToken()
+        unlink = cancel.on_cancel(lambda: token.cancel(cancel.reason or "cancelled")) if cancel else None
+        timer = threading.Timer(limit, token.cancel, args=("timeout",))
+        timer.daemon = True
+        timer.start()
+        try:
+            result = run_script(script_text, mapping, token)
+        finally:
+            timer.cancel()
+            if unlink is not None:
+                unlink()
+        if result.get("cancelled") and token.reason == "timeout":
+            logger.warning("In-process script exceeded %.1fs; stopped it", limit)
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return {"ok": False, "error": f"TimeoutError: script exceeded the {limit:g}s limit", "timed_out": True}
+        return result
+
+    def shutdown(self) -> None:
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+    def stats(self) -> dict:
+        with self._lock:
+            spawned = self._stats["spawned"]
+            return {
+                "size": self.size,
+                "ready": len(self._workers),
+                "starting": self._starting,
+                "idle": self._idle.qsize(),
+                "timeout_s": self.timeout,
+                **{k: v for k, v in self._stats.items() if k != "spawn_ms"},
+                "avg_spawn_ms": self._stats["spawn_ms"] / spawned if spawned else 0.0,
+            }
+
+
+_pool: Optional[ScriptPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_script_pool() -> Optional[ScriptPool]:
+    """The shared pool, or None when THEO_SCRIPT_WORKERS=0."""
+    global _pool
+    if POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ScriptPool(POOL_SIZE, SCRIPT_TIMEOUT_S)
+        return _pool
+
+
+def start_script_workers() -> None:
+    """Pre-warm the workers (call at server start so no command pays for process start-up)."""
+    pool = get_script_pool()
+    if pool is not None:
+        pool.start()
+
+
+def shutdown_script_workers() -> None:
+    """Kill the workers (idle ones would also exit on their own once the server's pipes close)."""
+    if _pool is not None:
+        _pool.shutdown()
+
+
+def execute_script(
+    script_text: str,
+    mapping: Optional[ScreenMapping] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None,
+) -> dict[str, Any]:
+    """
+    run_script in an isolated worker process with a wall-clock limit (THEO_SCRIPT_TIMEOUT_S).
+    Falls back to in-process run_script when the pool is disabled.
+    """
+    mapping = mapping or current_screen_mapping()
+    pool = get_script_pool()
+    if pool is None:
+        return run_script(script_text, mapping, cancel)
+    # the worker reports its own "script" span; this one adds waiting for a worker and the round trip
+    with span("script_pool"):
+        return pool.run(script_text, mapping, cancel, timeout)
+
+
+def script_pool_stats() -> dict:
+    pool = get_script_pool()
+    return pool.stats() if pool is not None else {"size": 0}
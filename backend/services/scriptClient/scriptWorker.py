@@ -0,0 +1,71 @@
+# Script worker process: run model-generated scripts outside the server process.
+# Started by scriptPool as `python -m services.scriptClient.scriptWorker` from backend/. Imports pyautogui,
+# PIL, the verification helpers and the capture engine up front, then reads one JSON job per stdin line
+# ({"script", "mapping"}) and answers with one JSON result line (the run_script dict plus the "metrics"
+# recorded while it ran) on the original stdout.
+
+import importlib
+import json
+import logging
+import os
+import sys
+from typing import TextIO
+
+logger = logging.getLogger("scriptWorker")
+
+
+def _claim_stdio() -> tuple[TextIO, TextIO]:
+    """Keep stdin/stdout for the protocol; a script's own print()/input() goes to stderr/devnull."""
+    jobs = os.fdopen(os.dup(sys.stdin.fileno()), "r", encoding="utf-8")
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    sys.stdin = open(os.devnull, "r")
+    return jobs, protocol
+
+
+def _run_initializer() -> None:
+    # "module:function" to call before anything else is imported (e.g. install stand-in devices)
+    spec = os.getenv("THEO_SCRIPT_WORKER_INIT")
+    if spec:
+        module_name, _, attr = spec.partition(":")
+        getattr(importlib.import_module(module_name), attr or "install")()
+
+
+def main() -> None:
+    jobs, protocol = _claim_stdio()
+
+    def send(message: dict) -> None:
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    logging.basicConfig(
+        level=os.getenv("THEO_SCRIPT_WORKER_LOG_LEVEL", "INFO"),
+        format=f"[script-worker {os.getpid()}] %(levelname)s %(name)s: %(message)s",
+    )
+    _run_initializer()
+
+    from services.scriptClient.scriptClient import ScreenMapping, run_script
+    from utils.captureEngine.captureEngine import get_capture_engine
+    from utils.tracing import collect_metrics
+
+    get_capture_engine()  # open the grabber now so the first click verification doesn't pay for it
+    send({"ready": True, "pid": os.getpid()})
+
+    for line in jobs:
+        if not line.strip():
+            continue
+        # span timings (script, click/hotkey attempts) go home with the result for the server's /metrics
+        with collect_metrics() as metrics:
+            try:
+                job = json.loads(line)
+                mapping = ScreenMapping(*job["mapping"]) if job.get("mapping") else None
+                result = run_script(job.get("script", ""), mapping)
+            except Exception as e:
+                logger.exception("Script job failed")
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        send({**result, "metrics": metrics})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Region-of-interest visual verification for scripted clicks.
+# When the action point is known only the box around it is grabbed and diffed, so a check costs
+# ROI-sized captures; the whole desktop is grabbed (and compared downsampled) only for actions
+# without a point or when a global check is asked for. Either way change is in whole-desktop units
+# (see roi_change), so min_change thresholds mean the same with and without a global check.
+
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+
+from utils.captureEngine.captureEngine import Frame, get_capture_engine
+
+logger = logging.getLogger(__name__)
+
+ROI_RADIUS = 160  # screen pixels around the action point
+ROI_STEP = 2  # sample every 2nd pixel inside the ROI
+GLOBAL_STEP = 8  # coarse whole-desktop check samples every 8th pixel
+# per-sample luma delta that counts as "changed" when locating the change region
+LOCATE_THRESHOLD = 24
+
+# Settle detection: poll until the change is visible and consecutive polls agree, or time out.
+SETTLE_POLL_S = 0.03
+SETTLE_TIMEOUT_S = 1.5
+SETTLE_STABLE_DELTA = 0.5  # poll-to-poll change below this counts as stable
+SETTLE_STABLE_POLLS = 2
+# pause between moving onto a target and grabbing the "before" frame, so hover highlights the move
+# itself causes are already in it rather than counted as the click's effect
+HOVER_SETTLE_S = 0.1
+
+
+def capture_region(
+    point: Optional[tuple[int, int]] = None, radius: int = ROI_RADIUS, global_check: bool = False
+) -> Optional[dict]:
+    """Desktop box a verification grab needs: the ROI around point, or None (whole desktop)."""
+    if point is None or global_check:
+        return None
+    desktop = get_capture_engine().monitors()[0]
+    x0 = max(desktop["left"], int(point[0]) - radius)
+    y0 = max(desktop["top"], int(point[1]) - radius)
+    x1 = min(desktop["left"] + desktop["width"], int(point[0]) + radius + 1)
+    y1 = min(desktop["top"] + desktop["height"], int(point[1]) + radius + 1)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return {"left": x0, "top": y0, "width": x1 - x0, "height": y1 - y0}
+
+
+def capture_frame(
+    point: Optional[tuple[int, int]] = None, radius: int = ROI_RADIUS, global_check: bool = False
+) -> Frame:
+    """Grab what verifying an action at point needs from the shared capture engine (see capture_region)."""
+    return get_capture_engine().grab(capture_region(point, radius, global_check))
+
+
+def frame_matches(
+    frame: Frame, point: Optional[tuple[int, int]] = None, radius: int = ROI_RADIUS, global_check: bool = False
+) -> bool:
+    """Whether frame covers exactly what capture_frame(point, radius, global_check) would grab now."""
+    region = capture_region(point, radius, global_check) or get_capture_engine().monitors()[0]
+    return (frame.left, frame.top, frame.width, frame.height) == (
+        region["left"], region["top"], region["width"], region["height"]
+    )
+
+
+def _roi_box(frame: Frame, sx: int, sy: int, radius: int) -> tuple[int, int, int, int]:
+    cx = int(sx) - frame.left
+    cy = int(sy) - frame.top
+    x0 = max(0, cx - radius)
+    y0 = max(0, cy - radius)
+    x1 = min(frame.width, cx + radius + 1)
+    y1 = min(frame.height, cy + radius + 1)
+    return x0, y0, max(x0, x1), max(y0, y1)
+
+
+def _same_geometry(before: Frame, after: Frame) -> bool:
+    return (before.width, before.height, before.left, before.top) == (after.width, after.height, after.left, after.top)
+
+
+def _mean_abs_diff(a: np.ndarray, b: np.ndarray) -> float:
+    if a.size == 0:
+        return 0.0
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+def roi_change(before: Frame, after: Frame, sx: int, sy: int, radius: int = ROI_RADIUS, step: int = ROI_STEP) -> float:
+    """
+    Luma change inside the box around screen point (sx, sy), in whole-desktop units: the box's mean
+    absolute difference scaled by its share of the desktop, i.e. what a full-screen mean would read.
+    A raw box mean would let a hover highlight that fills a fraction of the box pass min_change.
+    """
+    x0, y0, x1, y1 = _roi_box(before, sx, sy, radius)
+    mean = _mean_abs_diff(before.gray_region(x0, y0, x1, y1, step), after.gray_region(x0, y0, x1, y1, step))
+    desktop = get_capture_engine().monitors()[0]
+    return mean * (x1 - x0) * (y1 - y0) / max(1, desktop["width"] * desktop["height"])
+
+
+def global_change(before: Frame, after: Frame, step: int = GLOBAL_STEP) -> float:
+    """Coarse whole-desktop mean absolute luma difference; uses each frame's cached downsampled gray."""
+    return _mean_abs_diff(before.gray(step), after.gray(step))
+
+
+def locate_change(before: Frame, after: Frame, step: int = GLOBAL_STEP) -> Optional[dict]:
+    """Bounding box (screen coordinates) of the samples that changed noticeably, or None."""
+    diff = np.abs(before.gray(step).astype(np.int16) - after.gray(step).astype(np.int16)) > LOCATE_THRESHOLD
+    rows = np.flatnonzero(diff.any(axis=1))
+    cols = np.flatnonzero(diff.any(axis=0))
+    if rows.size == 0:
+        return None
+    return {
+        "left": int(cols[0]) * step + before.left,
+        "top": int(rows[0]) * step + before.top,
+        "right": min(before.width, (int(cols[-1]) + 1) * step) + before.left,
+        "bottom": min(before.height, (int(rows[-1]) + 1) * step) + before.top,
+    }
+
+
+def measure_change(
+    before: Frame,
+    after: Frame,
+    point: Optional[tuple[int, int]] = None,
+    roi_radius: int = ROI_RADIUS,
+    global_check: bool = False,
+    locate: bool = True,
+) -> dict:
+    """
+    Compare two frames. change is the larger of the ROI score (if a point is given)
+    and the coarse global score (if global_check or no point); region says where pixels changed.
+    """
+    if not _same_geometry(before, after):
+        # monitor layout changed between the captures; that is a visible change by definition
+        return {"change": 255.0, "roi_change": None, "global_change": None, "region": None}
+
+    roi = roi_change(before, after, point[0], point[1], roi_radius) if point is not None else None
+    coarse = global_change(before, after) if (global_check or point is None) else None
+    change = max(v for v in (roi, coarse) if v is not None)
+    region = None
+    if locate and change > 0:
+        region = locate_change(before, after, _locate_step(point, global_check))
+    return {"change": change, "roi_change": roi, "global_change": coarse, "region": region}
+
+
+def _locate_step(point: Optional[tuple[int, int]], global_check: bool) -> int:
+    # ROI-only frames are small, so the change region can be located at ROI resolution
+    return GLOBAL_STEP if (global_check or point is None) else ROI_STEP
+
+
+def wait_for_settle(
+    before: Frame,
+    point: Optional[tuple[int, int]] = None,
+    min_change: float = 1.5,
+    timeout: float = SETTLE_TIMEOUT_S,
+    roi_radius: int = ROI_RADIUS,
+    global_check: bool = False,
+) -> tuple[Frame, dict, float]:
+    """
+    Poll frames after an action until the change vs `before` reaches min_change and the screen
+    has stopped moving, or until timeout. Returns (last frame, measurement vs before, seconds waited).
+    """
+    started = time.monotonic()
+    deadline = started + max(0.0, float(timeout))
+    previous: Optional[Frame] = None
+    stable_polls = 0
+    while True:
+        time.sleep(SETTLE_POLL_S)
+        frame = capture_frame(point, roi_radius, global_check)
+        measured = measure_change(before, frame, point, roi_radius, global_check, locate=False)
+        if measured["change"] >= float(min_change):
+            if previous is not None:
+                moving = measure_change(previous, frame, point, roi_radius, global_check, locate=False)
+                stable_polls = stable_polls + 1 if moving["change"] < SETTLE_STABLE_DELTA else 0
+            if stable_polls >= SETTLE_STABLE_POLLS:
+                break
+        else:
+            stable_polls = 0
+        previous = frame
+        if time.monotonic() >= deadline:
+            break
+    measured["region"] = (
+        locate_change(before, frame, _locate_step(point, global_check)) if measured["change"] > 0 else None
+    )
+    return frame, measured, time.monotonic() - started
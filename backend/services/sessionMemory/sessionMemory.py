@@ -0,0 +1,140 @@
+# Conversation memory for the main LLM, one history per session.
+# Trimmed by an estimated token budget rather than a message count; turns that fall out of the
+# budget are folded into a short running summary so the model keeps the gist of older context.
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+# history tokens sent with each request (excluding the summary)
+TOKEN_BUDGET = int(os.getenv("THEO_MEMORY_TOKEN_BUDGET", "1500"))
+# a single stored message is clipped to this many tokens
+MAX_MESSAGE_TOKENS = int(os.getenv("THEO_MEMORY_MAX_MESSAGE_TOKENS", "400"))
+MAX_TURNS = 6  # hard cap on remembered user/assistant pairs, whatever their size
+SUMMARIZE = os.getenv("THEO_MEMORY_SUMMARY", "1") != "0"
+SUMMARY_MAX_TOKENS = 200
+SUMMARY_SNIPPET_CHARS = 90
+MAX_SESSIONS = 32  # least recently used sessions are dropped beyond this
+
+_CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return (len(text or "") + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    text = (text or "").strip()
+    limit = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + " ..."
+
+
+def _snippet(text: str) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+class SessionMemory:
+    """One session's turns plus a running summary of the turns that were compacted away."""
+
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self._lock = threading.Lock()
+        self._turns: list[tuple[dict, dict, int]] = []  # (user msg, assistant msg, tokens)
+        self._summary_lines: list[str] = []
+        self._tokens = 0
+
+    def history(self) -> list[dict]:
+        """Snapshot of the messages to send before the current turn (summary first, if any)."""
+        with self._lock:
+            messages: list[dict] = []
+            if self._summary_lines:
+                messages.append({
+                    "role": "user",
+                    "content": "Summary of our earlier conversation:\n" + "\n".join(self._summary_lines),
+                })
+            for user_msg, assistant_msg, _ in self._turns:
+                messages.append(dict(user_msg))
+                messages.append(dict(assistant_msg))
+            return messages
+
+    def add_turn(self, user_text: str, assistant_text: str) -> None:
+        """Record a completed exchange; called once the reply is final, so failed requests leave no trace."""
+        user_msg = {"role": "user", "content": _clip(user_text, MAX_MESSAGE_TOKENS)}
+        assistant_msg = {"role": "assistant", "content": _clip(assistant_text, MAX_MESSAGE_TOKENS)}
+        tokens = estimate_tokens(user_msg["content"]) + estimate_tokens(assistant_msg["content"])
+        with self._lock:
+            self._turns.append((user_msg, assistant_msg, tokens))
+            self._tokens += tokens
+            self._compact()
+
+    def _compact(self) -> None:
+        # always keep the latest turn, even if it alone exceeds the budget
+        while len(self._turns) > 1 and (self._tokens > TOKEN_BUDGET or len(self._turns) > MAX_TURNS):
+            user_msg, assistant_msg, tokens = self._turns.pop(0)
+            self._tokens -= tokens
+            if SUMMARIZE:
+                self._summary_lines.append(
+                    f"- User: {_snippet(user_msg['content'])} / Theo: {_snippet(assistant_msg['content'])}"
+                )
+        while self._summary_lines and estimate_tokens("\n".join(self._summary_lines)) > SUMMARY_MAX_TOKENS:
+            self._summary_lines.pop(0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._turns.clear()
+            self._summary_lines.clear()
+            self._tokens = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": len(self._turns),
+                "history_tokens": self._tokens,
+                "summary_lines": len(self._summary_lines),
+                "summary_tokens": estimate_tokens("\n".join(self._summary_lines)) if self._summary_lines else 0,
+            }
+
+
+_sessions_lock = threading.Lock()
+_sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+
+
+def get_session(session_id: Optional[str] = None) -> SessionMemory:
+    """Memory for a session key (created on first use); None or empty means the default session."""
+    session_id = (session_id or "").strip() or DEFAULT_SESSION
+    with _sessions_lock:
+        memory = _sessions.get(session_id)
+        if memory is None:
+            memory = SessionMemory(session_id)
+            _sessions[session_id] = memory
+            while len(_sessions) > MAX_SESSIONS:
+                dropped, _ = _sessions.popitem(last=False)
+                logger.info("Dropping memory of idle session %s", dropped)
+        _sessions.move_to_end(session_id)
+        return memory
+
+
+def reset_session(session_id: Optional[str] = None) -> None:
+    get_session(session_id).clear()
+
+
+def memory_stats() -> dict:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    return {
+        "token_budget": TOKEN_BUDGET,
+        "sessions": {memory.session_id: memory.stats() for memory in sessions},
+    }
@@ -0,0 +1,19 @@
+# Tests run from backend/ against the stand-in devices of benchmarks.fake_devices: a synthetic screen
+# behind a fake mss and a no-op pyautogui whose input events repaint that screen.
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks import fake_devices  # noqa: E402
+
+# before anything imports pyautogui / mss
+SCREEN = fake_devices.install()
+
+
+@pytest.fixture
+def screen():
+    return SCREEN
@@ -0,0 +1,54 @@
+# click_and_verify against the fake screen: only what the click itself changes may verify it, not what
+# hovering the target does, and min_change keeps its whole-desktop meaning for ROI-only checks.
+
+import pytest
+
+from services.scriptClient import scriptClient
+
+FAST = {"post_delay": 0.05, "settle_timeout": 0.2, "move_duration": 0.0}
+# each test works on its own patch of the (shared) fake desktop, away from its flat "windows"
+CLICK_POINT = (1000, 980)
+HOVER_POINT = (1600, 1000)
+HIGHLIGHT_POINT = (400, 980)
+DARK = 20  # far from the fake desktop's luma around those points
+
+
+@pytest.fixture
+def dead_click(monkeypatch):
+    """A click that changes nothing on screen; returns the list of clicked points."""
+    clicks = []
+    monkeypatch.setattr(scriptClient.pyautogui, "click", lambda x=None, y=None, **_kw: clicks.append((x, y)))
+    return clicks
+
+
+def test_click_that_repaints_verifies(screen):
+    result = scriptClient.click_and_verify(*CLICK_POINT, label="button", retries=0, **FAST)
+    assert result["verified"] is True
+    assert result["attempt"] == 1
+    assert result["change"] >= 1.5
+    assert result["global_change"] is None  # ROI-only by default
+
+
+def test_hover_tooltip_does_not_verify_dead_click(monkeypatch, screen, dead_click):
+    # a tooltip big enough to pass min_change on its own, shown as soon as the cursor arrives
+    move = scriptClient.pyautogui.moveTo
+
+    def hover(x=None, y=None, **kwargs):
+        move(x, y, **kwargs)
+        screen.paint(x - 130, y + 10, 260, 100, DARK)
+
+    monkeypatch.setattr(scriptClient.pyautogui, "moveTo", hover)
+    with pytest.raises(RuntimeError, match="click_and_verify failed for 'dead button'"):
+        scriptClient.click_and_verify(*HOVER_POINT, label="dead button", retries=1, **FAST)
+    assert len(dead_click) == 2
+
+
+def test_small_change_in_roi_does_not_pass_default_threshold(monkeypatch, screen, dead_click):
+    # a highlight-sized change fills a good part of the ROI box but little of the desktop
+    def highlight(x=None, y=None, **_kw):
+        dead_click.append((x, y))
+        screen.paint(x - 60, y - 16, 120, 32, DARK)
+
+    monkeypatch.setattr(scriptClient.pyautogui, "click", highlight)
+    with pytest.raises(RuntimeError, match="required=1.500"):
+        scriptClient.click_and_verify(*HIGHLIGHT_POINT, label="highlight", retries=0, **FAST)
@@ -0,0 +1,83 @@
+# hotkey_and_verify / ensure_focus_and_hotkey against the fake screen: a "working" shortcut is one
+# whose pyautogui.hotkey call repaints the screen, a dead one leaves it untouched.
+
+import pytest
+
+from services.scriptClient import scriptClient
+
+FAST = {"post_delay": 0.05, "settle_timeout": 0.2}
+
+
+@pytest.fixture
+def hotkey(monkeypatch, screen):
+    """Replace pyautogui.hotkey; calls listed in `effective` (1-based) repaint the screen."""
+    calls = []
+    effective = set()
+
+    def fake_hotkey(*keys):
+        calls.append(keys)
+        if len(calls) in effective:
+            screen.input_event()
+
+    monkeypatch.setattr(scriptClient.pyautogui, "hotkey", fake_hotkey)
+    return calls, effective
+
+
+def test_hotkey_verifies_first_attempt(hotkey):
+    calls, effective = hotkey
+    effective.add(1)
+    result = scriptClient.hotkey_and_verify("ctrl+t", label="new tab", **FAST)
+    assert result["verified"] is True
+    assert result["attempt"] == 1
+    assert result["keys"] == ["ctrl", "t"]
+    assert calls == [("ctrl", "t")]
+
+
+def test_hotkey_retries_then_verifies(hotkey):
+    calls, effective = hotkey
+    effective.add(2)
+    result = scriptClient.hotkey_and_verify(("ctrl", "w"), label="close tab", retries=2, **FAST)
+    assert result["verified"] is True
+    assert result["attempt"] == 2
+    assert len(calls) == 2
+
+
+def test_hotkey_runs_fallback_click(hotkey, screen):
+    calls, _effective = hotkey
+    events_before = screen.events
+    result = scriptClient.hotkey_and_verify(
+        "ctrl+shift+n",
+        label="new folder",
+        retries=1,
+        fallback=lambda: scriptClient.click_and_verify(300, 200, label="new folder button", retries=0, **FAST),
+        **FAST,
+    )
+    assert len(calls) == 2
+    assert result["fallback"] is True
+    assert result["verified"] is True
+    assert result["fallback_result"]["x"] == 300 and result["fallback_result"]["y"] == 200
+    assert screen.events > events_before
+
+
+def test_hotkey_raises_when_retries_run_out(hotkey):
+    calls, _effective = hotkey
+    with pytest.raises(RuntimeError, match="hotkey_and_verify failed for 'mute'"):
+        scriptClient.hotkey_and_verify("ctrl+m", label="mute", retries=2, **FAST)
+    assert len(calls) == 3
+
+
+def test_ensure_focus_clicks_then_verifies(hotkey, screen):
+    calls, effective = hotkey
+    effective.add(1)
+    result = scriptClient.ensure_focus_and_hotkey(500, 400, "ctrl+a", label="select all", **FAST)
+    assert screen.cursor == (500, 400)
+    assert result["verified"] is True
+    assert calls == [("ctrl", "a")]
+
+
+def test_ensure_focus_click_alone_does_not_verify(hotkey):
+    # the focus click repaints the screen too, but before the "before" frame is taken
+    calls, _effective = hotkey
+    with pytest.raises(RuntimeError):
+        scriptClient.ensure_focus_and_hotkey(500, 400, "ctrl+a", label="select all", retries=0, **FAST)
+    assert len(calls) == 1
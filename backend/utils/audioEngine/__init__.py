@@ -0,0 +1,8 @@
+from .audioEngine import (
+    PRIORITY_FEEDBACK,
+    PRIORITY_SPEECH,
+    PlaybackHandle,
+    get_engine,
+)
+
+__all__ = ["PRIORITY_FEEDBACK", "PRIORITY_SPEECH", "PlaybackHandle", "get_engine"]
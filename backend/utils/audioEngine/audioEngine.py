@@ -0,0 +1,231 @@
+# Long-lived audio output engine shared by TTS and feedback sounds.
+# One output stream stays open; buffers are queued, chained gaplessly and preempted by priority.
+
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_SPEECH = 0
+PRIORITY_FEEDBACK = 10
+
+BLOCK_SIZE = 512
+OUTPUT_CHANNELS = 2
+FALLBACK_SAMPLE_RATE = 48000
+
+
+class PlaybackHandle:
+    """A queued buffer. Callbacks run on the engine's notifier thread, never the audio thread."""
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        priority: int,
+        tag: str,
+        seq: int,
+        on_start: Optional[Callable[["PlaybackHandle"], None]] = None,
+        on_done: Optional[Callable[["PlaybackHandle"], None]] = None,
+    ) -> None:
+        self.data = data
+        self.priority = priority
+        self.tag = tag
+        self.seq = seq
+        self.pos = 0
+        self.cancelled = False
+        self.on_start = on_start
+        self.on_done = on_done
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / float(get_engine().sample_rate)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+
+class AudioEngine:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: list[PlaybackHandle] = []  # highest priority first, FIFO within a priority
+        self._current: Optional[PlaybackHandle] = None
+        self._bank: dict[str, np.ndarray] = {}
+        self._seq = 0
+        self._stream = None
+        self.sample_rate = FALLBACK_SAMPLE_RATE
+        self._events: "queue.Queue[tuple[Callable, PlaybackHandle]]" = queue.Queue()
+        self._notifier = threading.Thread(target=self._notify_loop, name="audio-notify", daemon=True)
+        self._notifier.start()
+
+    # --- stream lifecycle ---
+
+    def _ensure_stream(self) -> None:
+        if self._stream is not None:
+            return
+        import sounddevice as sd
+        try:
+            device_rate = sd.query_devices(kind="output")["default_samplerate"]
+            sample_rate = int(device_rate) if device_rate else FALLBACK_SAMPLE_RATE
+        except Exception:
+            sample_rate = FALLBACK_SAMPLE_RATE
+        self.sample_rate = sample_rate
+        stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=OUTPUT_CHANNELS,
+            dtype="float32",
+            blocksize=BLOCK_SIZE,
+            callback=self._callback,
+        )
+        stream.start()
+        self._stream = stream
+        logger.info("Audio engine started at %d Hz", self.sample_rate)
+
+    def start(self) -> None:
+        with self._lock:
+            self._ensure_stream()
+
+    # --- buffers ---
+
+    def prepare(self, data: np.ndarray, sample_rate: int) -> np.ndarray:
+        """Convert decoded audio to contiguous float32 (n, OUTPUT_CHANNELS) at the engine rate."""
+        # the device rate is only known once the stream is open
+        self.start()
+        if data.dtype.kind == "i":
+            data = data.astype("float32") / (2 ** (data.dtype.itemsize * 8 - 1))
+        elif data.dtype != np.float32:
+            data = data.astype("float32")
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        if int(sample_rate) != self.sample_rate and len(data) > 1:
+            n_out = int(round(len(data) * self.sample_rate / float(sample_rate)))
+            src_t = np.arange(len(data), dtype=np.float64)
+            dst_t = np.linspace(0, len(data) - 1, n_out)
+            data = np.stack([np.interp(dst_t, src_t, data[:, c]) for c in range(data.shape[1])], axis=1)
+            data = data.astype("float32")
+        if data.shape[1] == 1:
+            data = np.repeat(data, OUTPUT_CHANNELS, axis=1)
+        elif data.shape[1] > OUTPUT_CHANNELS:
+            data = data[:, :OUTPUT_CHANNELS]
+        return np.ascontiguousarray(data, dtype=np.float32)
+
+    def decode(self, path: Path) -> np.ndarray:
+        import soundfile as sf
+        data, sample_rate = sf.read(Path(path), always_2d=True)
+        return self.prepare(data, sample_rate)
+
+    def preload(self, name: str, path: Path) -> None:
+        """Decode a bundled sound once and keep it in the sound bank."""
+        self._bank[name] = self.decode(path)
+
+    def has_sound(self, name: str) -> bool:
+        return name in self._bank
+
+    # --- playback ---
+
+    def play(
+        self,
+        sound: Union[str, np.ndarray],
+        priority: int = PRIORITY_SPEECH,
+        tag: str = "default",
+        on_start: Optional[Callable[[PlaybackHandle], None]] = None,
+        on_done: Optional[Callable[[PlaybackHandle], None]] = None,
+    ) -> PlaybackHandle:
+        """
+        Queue a preloaded sound (by name) or a prepared buffer.
+        A higher priority than the current buffer preempts it; the preempted buffer resumes afterwards.
+        """
+        data = self._bank[sound] if isinstance(sound, str) else sound
+        with self._lock:
+            self._ensure_stream()
+            self._seq += 1
+            handle = PlaybackHandle(data, priority, tag, self._seq, on_start, on_done)
+            current = self._current
+            if current is not None and priority > current.priority:
+                self._current = None
+                self._insert_locked(current)
+            self._insert_locked(handle)
+        return handle
+
+    def _insert_locked(self, handle: PlaybackHandle) -> None:
+        idx = len(self._queue)
+        for i, queued in enumerate(self._queue):
+            if (handle.priority, -handle.seq) > (queued.priority, -queued.seq):
+                idx = i
+                break
+        self._queue.insert(idx, handle)
+
+    def stop(self, tag: Optional[str] = None) -> None:
+        """Cancel the current and queued buffers (only those with the given tag, if set)."""
+        with self._lock:
+            dropped = [h for h in self._queue if tag is None or h.tag == tag]
+            self._queue = [h for h in self._queue if h not in dropped]
+            if self._current is not None and (tag is None or self._current.tag == tag):
+                dropped.append(self._current)
+                self._current = None
+        for handle in dropped:
+            handle.cancelled = True
+            self._finish(handle)
+
+    def is_playing(self, tag: Optional[str] = None) -> bool:
+        with self._lock:
+            handles = ([self._current] if self._current else []) + self._queue
+            return any(tag is None or h.tag == tag for h in handles)
+
+    def _finish(self, handle: PlaybackHandle) -> None:
+        if handle.done.is_set():
+            return
+        handle.done.set()
+        if handle.on_done is not None:
+            self._events.put_nowait((handle.on_done, handle))
+
+    def _callback(self, outdata, frames, _time_info, status) -> None:
+        if status:
+            logger.debug("Audio engine status: %s", status)
+        filled = 0
+        with self._lock:
+            while filled < frames:
+                if self._current is None:
+                    if not self._queue:
+                        break
+                    self._current = self._queue.pop(0)
+                    if not self._current.started.is_set():
+                        self._current.started.set()
+                        if self._current.on_start is not None:
+                            self._events.put_nowait((self._current.on_start, self._current))
+                current = self._current
+                take = min(frames - filled, len(current.data) - current.pos)
+                outdata[filled:filled + take] = current.data[current.pos:current.pos + take]
+                current.pos += take
+                filled += take
+                if current.pos >= len(current.data):
+                    # chain straight into the next buffer within this same block
+                    self._current = None
+                    self._finish(current)
+        if filled < frames:
+            outdata[filled:] = 0
+
+    def _notify_loop(self) -> None:
+        while True:
+            fn, handle = self._events.get()
+            try:
+                fn(handle)
+            except Exception:
+                logger.exception("Audio engine callback failed")
+
+
+_engine: Optional[AudioEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AudioEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioEngine()
+        return _engine
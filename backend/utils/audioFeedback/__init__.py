@@ -1,6 +1,7 @@
 from .audioFeedback import (
     play_image_error_sound,
     play_warning_sound,
+    preload_sounds,
 )
 
-__all__ = ["play_image_error_sound", "play_warning_sound"]
+__all__ = ["play_image_error_sound", "play_warning_sound", "preload_sounds"]
@@ -1,41 +1,50 @@
 #Backend-based fallback sounds.
+# Sounds are decoded once into the audio engine's sound bank and played on its shared stream.
 
 import logging
-import threading
 from pathlib import Path
 
+from utils.audioEngine.audioEngine import PRIORITY_FEEDBACK, get_engine
+
 logger = logging.getLogger(__name__)
 
 _ASSETS_DIR = Path(__file__).resolve().parent
+FEEDBACK_TAG = "feedback"
+BUNDLED_SOUNDS = ("outerror.wav", "warning.wav")
+
+
+def preload_sounds() -> None:
+    """Decode the bundled feedback sounds up front so the first play is instant."""
+    engine = get_engine()
+    for filename in BUNDLED_SOUNDS:
+        path = (_ASSETS_DIR / filename).resolve()
+        if not path.is_file():
+            logger.warning("%s not found at %s", filename, path)
+            continue
+        try:
+            engine.preload(filename, path)
+        except Exception as e:
+            logger.warning("Could not preload %s: %s", filename, e)
 
 
 def _play_wav(filename: str, blocking: bool = False) -> None:
-    def _play():
-        try:
+    try:
+        engine = get_engine()
+        if not engine.has_sound(filename):
             path = (_ASSETS_DIR / filename).resolve()
             if not path.is_file():
                 logger.warning("%s not found at %s", filename, path)
                 return
-            import sounddevice as sd
-            import soundfile as sf
-            data, sample_rate = sf.read(path)
-            # Normalize to float32 for sounddevice (handles int16/int32 WAVs from any encoder)
-            if data.dtype.kind == "i":
-                data = data.astype("float32") / (2 ** (data.dtype.itemsize * 8 - 1))
-            elif data.dtype != "float32":
-                data = data.astype("float32")
-            if data.ndim == 1:
-                data = data.reshape(-1, 1)
-            logger.info("Playing %s from %s", filename, path)
-            sd.play(data, sample_rate)
-            sd.wait()
-        except Exception as e:
-            logger.warning("Could not play %s: %s", filename, e)
+            engine.preload(filename, path)
+        logger.info("Playing %s", filename)
+        # feedback outranks speech, so a warning interrupts Theo mid-sentence
+        handle = engine.play(filename, priority=PRIORITY_FEEDBACK, tag=FEEDBACK_TAG)
+    except Exception as e:
+        logger.warning("Could not play %s: %s", filename, e)
+        return
 
     if blocking:
-        _play()
-        return
-    threading.Thread(target=_play, daemon=True).start()
+        handle.wait(timeout=handle.duration + 1.0)
 
 
 def play_image_error_sound(blocking: bool = False) -> None:
@@ -0,0 +1,3 @@
+from .cancelToken import CancelToken, Cancelled
+
+__all__ = ["CancelToken", "Cancelled"]
@@ -0,0 +1,3 @@
+from .captureEngine import Frame, capture_stats, get_capture_engine
+
+__all__ = ["Frame", "capture_stats", "get_capture_engine"]
@@ -0,0 +1,180 @@
+# Long-lived screen capture engine shared by the LLM screenshot path and click verification.
+# One mss grabber stays open on a dedicated thread (mss handles are per-thread on Windows);
+# frames are NumPy views over the raw BGRA buffer and only converted when a consumer asks.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# mss caches the monitor list; re-enumerate this often so layout changes are picked up.
+MONITOR_REFRESH_S = 2.0
+GRAB_TIMEOUT_S = 5.0
+
+
+class Frame:
+    """One capture. bgra is a zero-copy (height, width, 4) view; conversions are lazy and cached."""
+
+    def __init__(self, raw, width: int, height: int, left: int, top: int, grab_ms: float) -> None:
+        self.raw = raw
+        self.width = width
+        self.height = height
+        self.left = left
+        self.top = top
+        self.grab_ms = grab_ms
+        self.captured_at = time.monotonic()
+        self.bgra = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+        self._rgb: Optional[Image.Image] = None
+        self._gray: dict[int, np.ndarray] = {}
+        self._gray_box: dict[int, np.ndarray] = {}
+
+    def to_pil_rgb(self) -> Image.Image:
+        """Decode BGRX straight to an RGB PIL image in one pass (no RGBA intermediate)."""
+        if self._rgb is None:
+            started = time.perf_counter()
+            self._rgb = Image.frombuffer("RGB", (self.width, self.height), self.raw, "raw", "BGRX", 0, 1)
+            _record("convert_ms", (time.perf_counter() - started) * 1000.0)
+        return self._rgb
+
+    def gray(self, step: int = 1) -> np.ndarray:
+        """Luma as uint8, sampled every `step` pixels; only the sampled pixels are touched."""
+        step = max(1, int(step))
+        cached = self._gray.get(step)
+        if cached is None:
+            started = time.perf_counter()
+            cached = _luma(self.bgra[::step, ::step])
+            self._gray[step] = cached
+            _record("convert_ms", (time.perf_counter() - started) * 1000.0)
+        return cached
+
+    def gray_box(self, factor: int) -> np.ndarray:
+        """Luma averaged over factor x factor blocks: every pixel counts, unlike gray(step)."""
+        factor = max(1, int(factor))
+        cached = self._gray_box.get(factor)
+        if cached is None:
+            started = time.perf_counter()
+            cached = np.asarray(self.to_pil_rgb().reduce(factor).convert("L"))
+            self._gray_box[factor] = cached
+            _record("convert_ms", (time.perf_counter() - started) * 1000.0)
+        return cached
+
+    def gray_region(self, x0: int, y0: int, x1: int, y1: int, step: int = 1) -> np.ndarray:
+        """Luma of a frame-local box [x0, x1) x [y0, y1), sampled every `step` pixels (not cached)."""
+        step = max(1, int(step))
+        return _luma(self.bgra[y0:y1:step, x0:x1:step])
+
+
+def _luma(bgra_view: np.ndarray) -> np.ndarray:
+    view = bgra_view.astype(np.uint16)
+    return ((view[..., 2] * 77 + view[..., 1] * 150 + view[..., 0] * 29) >> 8).astype(np.uint8)
+
+
+class CaptureEngine:
+    def __init__(self) -> None:
+        self._requests: "queue.Queue[tuple[object, Future]]" = queue.Queue()
+        self._monitors: list[dict] = []
+        self._monitors_at = 0.0
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name="capture-engine", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            import mss
+            sct = mss.mss()
+            self._refresh_monitors(sct)
+        except Exception as e:
+            logger.exception("Capture engine failed to start")
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        with sct:
+            while True:
+                region, future = self._requests.get()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._grab(sct, region))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def _refresh_monitors(self, sct) -> None:
+        # mss only enumerates once per instance; clearing its cache forces a fresh enumeration
+        sct._monitors = []
+        self._monitors = [dict(m) for m in sct.monitors]
+        self._monitors_at = time.monotonic()
+
+    def _grab(self, sct, region) -> Frame:
+        if time.monotonic() - self._monitors_at > MONITOR_REFRESH_S:
+            self._refresh_monitors(sct)
+        if region is None:
+            region = self._monitors[0]
+        started = time.perf_counter()
+        shot = sct.grab(region)
+        if shot is None:
+            raise RuntimeError("Failed to capture screenshot")
+        grab_ms = (time.perf_counter() - started) * 1000.0
+        _record("grab_ms", grab_ms)
+        _record("bytes", float(len(shot.raw)))
+        return Frame(shot.raw, shot.width, shot.height, int(region["left"]), int(region["top"]), grab_ms)
+
+    def grab(self, region: Optional[dict] = None, timeout: float = GRAB_TIMEOUT_S) -> Frame:
+        """Capture a region dict (left/top/width/height); None grabs the full virtual desktop."""
+        self._ready.wait(timeout)
+        if self._error is not None:
+            raise RuntimeError(f"Screen capture unavailable: {self._error}")
+        future: Future = Future()
+        self._requests.put((region, future))
+        return future.result(timeout=timeout)
+
+    def monitors(self) -> list[dict]:
+        """mss monitor list: [0] is the virtual desktop, [1:] the physical displays."""
+        self._ready.wait(GRAB_TIMEOUT_S)
+        return list(self._monitors)
+
+    def layout_signature(self) -> tuple:
+        return tuple((m["left"], m["top"], m["width"], m["height"]) for m in self.monitors())
+
+
+_stats_lock = threading.Lock()
+_stats: dict[str, list[float]] = {"grab_ms": [0, 0.0], "convert_ms": [0, 0.0], "bytes": [0, 0.0]}
+
+
+def _record(name: str, value: float) -> None:
+    with _stats_lock:
+        entry = _stats[name]
+        entry[0] += 1
+        entry[1] += value
+
+
+def capture_stats() -> dict:
+    """Capture counts and mean grab/convert latency and bytes allocated per capture."""
+    with _stats_lock:
+        return {
+            "captures": _stats["grab_ms"][0],
+            "avg_grab_ms": _stats["grab_ms"][1] / _stats["grab_ms"][0] if _stats["grab_ms"][0] else 0.0,
+            "conversions": _stats["convert_ms"][0],
+            "avg_convert_ms": _stats["convert_ms"][1] / _stats["convert_ms"][0] if _stats["convert_ms"][0] else 0.0,
+            "avg_bytes_per_capture": _stats["bytes"][1] / _stats["bytes"][0] if _stats["bytes"][0] else 0.0,
+        }
+
+
+_engine: Optional[CaptureEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_capture_engine() -> CaptureEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CaptureEngine()
+        return _engine
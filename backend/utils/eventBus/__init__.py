@@ -0,0 +1,3 @@
+from .eventBus import Subscription, event_stats, publish, subscribe
+
+__all__ = ["Subscription", "event_stats", "publish", "subscribe"]
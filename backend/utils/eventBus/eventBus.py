@@ -0,0 +1,83 @@
+# In-process publish/subscribe for status events (TTS playback, pipeline stages).
+# Publishers never block: each subscriber has a bounded queue and a slow one loses its oldest events.
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+_lock = threading.Lock()
+_subscribers: set["Subscription"] = set()
+_seq = itertools.count(1)
+_stats = {"published": 0, "dropped": 0}
+
+
+class Subscription:
+    """One consumer's view of the bus; get() returns events in publish order."""
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None if nothing arrived within timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _put(self, event: dict) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
+        return False
+
+    def close(self) -> None:
+        with _lock:
+            _subscribers.discard(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def subscribe(max_queue: int = SUBSCRIBER_QUEUE_SIZE) -> Subscription:
+    subscription = Subscription(max_queue)
+    with _lock:
+        _subscribers.add(subscription)
+    return subscription
+
+
+def publish(event_type: str, **fields) -> dict:
+    """Send {"seq", "type", "ts", **fields} to every current subscriber."""
+    with _lock:
+        # delivered under the lock (puts never block) so every subscriber sees seq order
+        event = {"seq": next(_seq), "type": event_type, "ts": time.time(), **fields}
+        dropped = sum(not subscription._put(event) for subscription in _subscribers)
+        _stats["published"] += 1
+        _stats["dropped"] += dropped
+    if dropped:
+        logger.debug("Event %s overflowed %d subscriber queue(s)", event_type, dropped)
+    return event
+
+
+def event_stats() -> dict:
+    with _lock:
+        return {"subscribers": len(_subscribers), **_stats}
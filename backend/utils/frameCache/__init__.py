@@ -0,0 +1,3 @@
+from .frameCache import fingerprint, frame_cache_stats, lookup, store
+
+__all__ = ["fingerprint", "frame_cache_stats", "lookup", "store"]
@@ -0,0 +1,106 @@
+# Reuse of encoded screenshots for unchanged screens.
+# A frame's signature is its luma averaged over BOX x BOX blocks, so every pixel still counts (a 1 px
+# text stroke or a checkbox tick moves its block by half its contrast) at a quarter of the data.
+# The exact match is a digest of the signature; otherwise it is compared tile by tile against the
+# cached frames of the same geometry. Signatures and comparisons run outside the lock, which only
+# guards the dict, so concurrent captures don't queue behind each other.
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+from utils.captureEngine.captureEngine import Frame
+
+logger = logging.getLogger(__name__)
+
+BOX = 2  # signature block size in screen pixels
+TILE = 32  # side, in screen pixels, of the tiles the near match compares
+# a tile where no block's luma moved more than this is unchanged (absorbs dithering / compression
+# noise; real UI changes such as text or icons move their blocks much further)
+NEAR_MATCH_DELTA = 12
+CACHE_SIZE = 4
+
+_lock = threading.Lock()
+# key -> {"signature", "payload", "cost_ms"}; most recently used last
+_entries: "OrderedDict[tuple, dict]" = OrderedDict()
+_stats = {"hits": 0, "near_hits": 0, "misses": 0, "saved_ms": 0.0}
+
+
+def signature(frame: Frame) -> np.ndarray:
+    """Block-averaged luma the cache compares frames on (cached on the frame)."""
+    return frame.gray_box(BOX)
+
+
+def fingerprint(frame: Frame, params: tuple = ()) -> tuple:
+    """Exact-match key: frame geometry, caller params (output size, grid, ...) and a digest of the signature."""
+    digest = hashlib.sha1(signature(frame), usedforsecurity=False).digest()
+    return (frame.width, frame.height, frame.left, frame.top, params, digest)
+
+
+def changed_tiles(a: np.ndarray, b: np.ndarray) -> int:
+    """How many tiles of two equally sized signatures have a block that moved more than NEAR_MATCH_DELTA."""
+    diff = np.maximum(a, b) - np.minimum(a, b)  # |a - b| without widening to int16
+    if not (diff > NEAR_MATCH_DELTA).any():
+        return 0
+    step = max(1, TILE // BOX)
+    rows = np.maximum.reduceat(diff, np.arange(0, diff.shape[0], step), axis=0)
+    tiles = np.maximum.reduceat(rows, np.arange(0, diff.shape[1], step), axis=1)
+    return int(np.count_nonzero(tiles > NEAR_MATCH_DELTA))
+
+
+def lookup(frame: Frame, params: tuple = ()) -> tuple[Optional[Any], tuple, float]:
+    """
+    Find a cached payload for this frame. Returns (payload or None, key for store(), ms saved).
+    Exact fingerprints hit by dict lookup; otherwise the few cached frames with the same
+    geometry and params are compared tile by tile.
+    """
+    key = fingerprint(frame, params)
+    with _lock:
+        entry = _entries.get(key)
+        candidates = [] if entry is not None else [
+            (cached_key, cached) for cached_key, cached in reversed(_entries.items()) if cached_key[:5] == key[:5]
+        ]
+    near = False
+    for cached_key, cached in candidates:
+        changed = changed_tiles(cached["signature"], signature(frame))
+        if changed == 0:
+            entry, key, near = cached, cached_key, True
+            break
+        logger.debug("Frame differs from a cached one in %d tiles", changed)
+    with _lock:
+        if entry is None:
+            _stats["misses"] += 1
+            return None, key, 0.0
+        if key in _entries:  # another capture may have evicted it meanwhile; the payload is still good
+            _entries.move_to_end(key)
+        _stats["near_hits" if near else "hits"] += 1
+        _stats["saved_ms"] += entry["cost_ms"]
+        return entry["payload"], key, entry["cost_ms"]
+
+
+def store(frame: Frame, key: tuple, payload: Any, cost_ms: float) -> None:
+    """Remember payload for the frame lookup() just missed; cost_ms is what a later hit saves."""
+    entry = {"signature": signature(frame), "payload": payload, "cost_ms": float(cost_ms)}
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def frame_cache_stats() -> dict:
+    with _lock:
+        hits = _stats["hits"] + _stats["near_hits"]
+        total = hits + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "near_hits": _stats["near_hits"],
+            "misses": _stats["misses"],
+            "hit_rate": hits / total if total else 0.0,
+            "saved_ms": _stats["saved_ms"],
+            "entries": len(_entries),
+        }
@@ -0,0 +1,3 @@
+from .imageEncoder import encode_image, to_data_url
+
+__all__ = ["encode_image", "to_data_url"]
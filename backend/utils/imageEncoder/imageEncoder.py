@@ -0,0 +1,152 @@
+# Screenshot encoding for the LLM payload.
+# PNG (fast compress levels, optionally split across threads), JPEG or WebP, with optional palette quantization.
+
+import base64
+import io
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image
+
+from utils.tracing import traced
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden per deployment with env vars (THEO_IMAGE_FORMAT=jpeg, ...).
+DEFAULT_FORMAT = os.getenv("THEO_IMAGE_FORMAT", "png").lower()
+PNG_COMPRESS_LEVEL = int(os.getenv("THEO_PNG_COMPRESS_LEVEL", "1"))
+JPEG_QUALITY = int(os.getenv("THEO_JPEG_QUALITY", "85"))
+WEBP_QUALITY = int(os.getenv("THEO_WEBP_QUALITY", "80"))
+WEBP_METHOD = 2  # 0 = fastest, 6 = smallest
+QUANTIZE_COLORS = 256
+
+# Frames above this many pixels are PNG-compressed in horizontal strips on a thread pool.
+PARALLEL_MIN_PIXELS = 3_000_000
+ENCODE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+_PNG_COLOR_TYPES = {"L": 0, "RGB": 2, "RGBA": 6}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="img-encode")
+    return _pool
+
+
+def _png_chunk(out: io.BytesIO, tag: bytes, payload) -> None:
+    out.write(struct.pack(">I", len(payload)))
+    out.write(tag)
+    out.write(payload)
+    out.write(struct.pack(">I", zlib.crc32(payload, zlib.crc32(tag)) & 0xFFFFFFFF))
+
+
+def _deflate_strip(strip, level: int, last: bool) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(strip)
+    # sync flush keeps each strip byte-aligned so raw deflate streams can be concatenated
+    return data + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _encode_png_parallel(img: Image.Image, out: io.BytesIO, level: int, workers: int) -> None:
+    """
+    Write a PNG whose IDAT is deflated in independent strips on the thread pool (pigz-style).
+    Every scanline uses the Up filter, computed once for the whole frame with NumPy.
+    """
+    width, height = img.size
+    channels = len(img.getbands())
+    rows = np.asarray(img, dtype=np.uint8).reshape(height, width * channels)
+    filtered = np.empty((height, width * channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 2  # PNG filter type "Up"
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+    del rows
+
+    bounds = [height * i // workers for i in range(workers + 1)]
+    strips = [memoryview(filtered[bounds[i]:bounds[i + 1]]).cast("B") for i in range(workers)]
+    futures = [
+        _get_pool().submit(_deflate_strip, strip, level, i == workers - 1)
+        for i, strip in enumerate(strips)
+    ]
+    adler = 1
+    for strip in strips:
+        adler = zlib.adler32(strip, adler)
+    idat = b"".join([b"\x78\x01", *(f.result() for f in futures), struct.pack(">I", adler & 0xFFFFFFFF)])
+
+    out.write(_PNG_SIGNATURE)
+    _png_chunk(out, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, _PNG_COLOR_TYPES[img.mode], 0, 0, 0))
+    _png_chunk(out, b"IDAT", idat)
+    _png_chunk(out, b"IEND", b"")
+
+
+@traced("encode")
+def encode_image(
+    img: Image.Image,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+    compress_level: Optional[int] = None,
+    quantize: bool = False,
+    parallel: Optional[bool] = None,
+) -> dict:
+    """
+    Encode a PIL image for upload.
+    Returns {"buffer", "mime", "format", "bytes", "encode_ms"}; buffer holds the encoded bytes.
+    """
+    fmt = (fmt or DEFAULT_FORMAT).lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Unsupported image format: {fmt}")
+
+    started = time.perf_counter()
+    out = io.BytesIO()
+    if fmt == "png":
+        level = PNG_COMPRESS_LEVEL if compress_level is None else int(compress_level)
+        if quantize:
+            img = img.quantize(colors=QUANTIZE_COLORS, method=Image.Quantize.FASTOCTREE)
+        if parallel is None:
+            parallel = img.width * img.height >= PARALLEL_MIN_PIXELS
+        if parallel and np is not None and ENCODE_WORKERS > 1 and img.mode in _PNG_COLOR_TYPES:
+            _encode_png_parallel(img, out, level, ENCODE_WORKERS)
+        else:
+            img.save(out, format="PNG", compress_level=level)
+    elif fmt == "jpeg":
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(out, format="JPEG", quality=JPEG_QUALITY if quality is None else int(quality))
+    else:
+        if quantize:
+            img = img.quantize(colors=QUANTIZE_COLORS, method=Image.Quantize.FASTOCTREE).convert("RGB")
+        img.save(out, format="WEBP", quality=WEBP_QUALITY if quality is None else int(quality), method=WEBP_METHOD)
+
+    encode_ms = (time.perf_counter() - started) * 1000.0
+    size = out.getbuffer().nbytes
+    logger.debug("Encoded %dx%d frame as %s: %d bytes in %.1f ms", img.width, img.height, fmt, size, encode_ms)
+    return {
+        "buffer": out,
+        "mime": MIME_TYPES[fmt],
+        "format": fmt,
+        "bytes": size,
+        "encode_ms": encode_ms,
+    }
+
+
+def to_data_url(encoded: dict) -> str:
+    """Base64 the encoded buffer in place (no getvalue() copy) and wrap it as a data URL."""
+    with encoded["buffer"].getbuffer() as view:
+        b64 = base64.b64encode(view)
+    return f"data:{encoded['mime']};base64,{b64.decode('ascii')}"
@@ -1,3 +1,3 @@
-from .imageProcessor import image_processor
+from .imageProcessor import image_processor, resolve_capture_mode, resolve_vision_preset
 
-__all__ = ["image_processor"]
+__all__ = ["image_processor", "resolve_capture_mode", "resolve_vision_preset"]
@@ -1,23 +1,47 @@
 # Screenshot capture for LLM-driven automation.
-# Can capture the full virtual desktop (all monitors) or the primary display.
+# Can capture the full virtual desktop (all monitors), the primary display, the display under the
+# cursor, the foreground window, or an explicit rectangle.
 
+import math
+import os
 import sys
-from ctypes import POINTER, Structure, WINFUNCTYPE, byref, c_long, c_uint, c_void_p, windll
-from ctypes.wintypes import RECT
+import threading
+from collections import OrderedDict
+from ctypes import POINTER, Structure, byref, c_long, c_uint, c_void_p, sizeof
+from ctypes.wintypes import POINT, RECT
 
-import mss
+if sys.platform == "win32":
+    from ctypes import WINFUNCTYPE, windll
+else:  # the *_windows helpers below are only called on Windows
+    WINFUNCTYPE = windll = None
+
+import numpy as np
 from PIL import Image, ImageDraw
 from PIL import ImageFont
 
+from utils.captureEngine.captureEngine import get_capture_engine
+from utils.tracing import traced
+
 # these are configs for the graph that is overlayed on every screenshot.
 
 MINOR_SPACING = 10
 MAJOR_SPACING = 100
-# Keep 1:1 coordinate mapping with the screen.
-# Compression is handled at serialization time (e.g., PNG optimize=True),
-# not by resizing, so PyAutoGUI coordinates stay exact.
+# Scale used when no downscaling is requested (1:1 with the screen).
+# Downscaled captures report their real scale so scriptClient can map model coordinates back.
 SCALE_FACTOR = 1.0
 
+# Per-request vision presets: trade coordinate precision for upload size and model latency.
+VISION_PRESETS = {
+    "full": {},
+    "balanced": {"max_long_edge": 2560, "pixel_budget": 2560 * 1440},
+    "fast": {"max_long_edge": 1600, "pixel_budget": 1600 * 900},
+}
+DEFAULT_VISION_PRESET = os.getenv("THEO_VISION_PRESET", "full")
+
+# What part of the desktop to send: pixels captured, encoded and uploaded scale with the choice.
+CAPTURE_MODES = ("all_monitors", "primary_monitor", "cursor_monitor", "foreground_window", "region")
+DEFAULT_CAPTURE_MODE = os.getenv("THEO_CAPTURE_MODE", "all_monitors")
+
 
 MINOR_COLOR = (200, 200, 200) 
 MAJOR_COLOR = (120, 120, 120) 
@@ -28,7 +52,14 @@ LABEL_BG_COLOR = (30, 30, 30)
 LABEL_PADDING_X = 3
 LABEL_PADDING_Y = 1
 
+# Rendered grid overlays, keyed by (width, height, minor, major); dropped when the monitor layout changes.
+GRID_LAYER_CACHE_SIZE = 4
+_grid_layers: "OrderedDict[tuple, dict]" = OrderedDict()
+_grid_layers_layout: tuple | None = None
+_grid_layers_lock = threading.Lock()
+
 MONITORINFOF_PRIMARY = 0x1
+DWMWA_EXTENDED_FRAME_BOUNDS = 9
 
 
 class MONITORINFO(Structure):
@@ -42,8 +73,6 @@ class MONITORINFO(Structure):
 
 def _get_primary_monitor_bounds_windows():
     """Use Win32 API to get the Windows primary monitor rect (left, top, width, height)."""
-    from ctypes import sizeof
-
     user32 = windll.user32
     primary_rect = [None]
 
@@ -60,20 +89,118 @@ def _get_primary_monitor_bounds_windows():
     return primary_rect[0]
 
 
-def _select_primary_monitor(sct):
+def _get_cursor_pos_windows() -> tuple[int, int] | None:
+    point = POINT()
+    if not windll.user32.GetCursorPos(byref(point)):
+        return None
+    return point.x, point.y
+
+
+def _get_foreground_window_bounds_windows() -> tuple[int, int, int, int] | None:
+    """Visible bounds (left, top, width, height) of the foreground window, or None if there is none/minimized."""
+    user32 = windll.user32
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd or user32.IsIconic(hwnd):
+        return None
+    rect = RECT()
+    # DWM frame bounds exclude the invisible resize border that GetWindowRect includes
+    try:
+        ok = windll.dwmapi.DwmGetWindowAttribute(
+            c_void_p(hwnd), DWMWA_EXTENDED_FRAME_BOUNDS, byref(rect), sizeof(rect)
+        ) == 0
+    except (AttributeError, OSError):
+        ok = False
+    if not ok and not user32.GetWindowRect(hwnd, byref(rect)):
+        return None
+    width = rect.right - rect.left
+    height = rect.bottom - rect.top
+    if width <= 0 or height <= 0:
+        return None
+    return rect.left, rect.top, width, height
+
+
+def _monitor_at(monitors: list[dict], x: int, y: int) -> dict | None:
+    for mon in monitors[1:]:
+        if mon["left"] <= x < mon["left"] + mon["width"] and mon["top"] <= y < mon["top"] + mon["height"]:
+            return mon
+    return None
+
+
+def _clip_to_desktop(monitors: list[dict], left: int, top: int, width: int, height: int) -> dict | None:
+    desktop = monitors[0]
+    x0 = max(int(left), desktop["left"])
+    y0 = max(int(top), desktop["top"])
+    x1 = min(int(left) + int(width), desktop["left"] + desktop["width"])
+    y1 = min(int(top) + int(height), desktop["top"] + desktop["height"])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return {"left": x0, "top": y0, "width": x1 - x0, "height": y1 - y0}
+
+
+def parse_region(value) -> dict:
+    """Accept a left/top/width/height dict or a "left,top,width,height" string."""
+    if isinstance(value, dict):
+        parts = [value.get(k) for k in ("left", "top", "width", "height")]
+    else:
+        parts = str(value or "").replace(" ", "").split(",")
+    try:
+        left, top, width, height = (int(float(v)) for v in parts)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid capture region: {value!r} (expected left,top,width,height)")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Capture region must have a positive size: {value!r}")
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+def resolve_capture_mode(name: str | None, region=None) -> dict:
+    """Map a capture mode name (and region for mode "region") to image_processor kwargs."""
+    name = (name or ("region" if region else DEFAULT_CAPTURE_MODE)).strip().lower()
+    if name not in CAPTURE_MODES:
+        raise ValueError(f"Unknown capture mode: {name}")
+    if name == "region":
+        if region is None:
+            raise ValueError("Capture mode 'region' needs a region")
+        return {"capture_mode": name, "region": parse_region(region)}
+    return {"capture_mode": name}
+
+
+def _select_capture_area(monitors: list[dict], capture_mode: str, region: dict | None) -> tuple[dict, str]:
+    """Resolve a capture mode to an mss region; falls back to a wider mode when the target is unavailable."""
+    if capture_mode == "region":
+        area = _clip_to_desktop(monitors, **parse_region(region))
+        if area is None:
+            raise ValueError(f"Capture region is outside the desktop: {region!r}")
+        return area, capture_mode
+    if capture_mode == "foreground_window" and sys.platform == "win32":
+        bounds = _get_foreground_window_bounds_windows()
+        area = _clip_to_desktop(monitors, *bounds) if bounds else None
+        if area is not None:
+            return area, capture_mode
+        capture_mode = "cursor_monitor"
+    if capture_mode in ("cursor_monitor", "foreground_window") and sys.platform == "win32":
+        pos = _get_cursor_pos_windows()
+        mon = _monitor_at(monitors, *pos) if pos else None
+        if mon is not None:
+            return mon, "cursor_monitor"
+    if capture_mode == "all_monitors":
+        return monitors[0], capture_mode
+    return _select_primary_monitor(monitors), "primary_monitor"
+
+
+def _select_primary_monitor(monitors: list[dict]):
     """Return the mss monitor dict for the Windows primary display, or monitors[1] on other platforms."""
     if sys.platform != "win32":
-        return sct.monitors[1]
+        return monitors[1]
     bounds = _get_primary_monitor_bounds_windows()
     if not bounds:
-        return sct.monitors[1]
+        return monitors[1]
     left, top, width, height = bounds
-    for i, mon in enumerate(sct.monitors):
+    for i, mon in enumerate(monitors):
         if i == 0:
             continue
         if mon["left"] == left and mon["top"] == top and mon["width"] == width and mon["height"] == height:
             return mon
-    return sct.monitors[1]
+    return monitors[1]
 
 
 def _draw_grid(draw: ImageDraw.ImageDraw, width: int, height: int) -> None:
@@ -132,34 +259,121 @@ def _draw_major_labels(draw: ImageDraw.ImageDraw, width: int, height: int) -> No
         )
 
 
-def image_processor(with_grid: bool = False, capture_all_monitors: bool = True):
-    with mss.mss() as sct:
-        monitor = sct.monitors[0] if capture_all_monitors else _select_primary_monitor(sct)
-        screenshot = sct.grab(monitor)
+def _render_grid_overlay(width: int, height: int) -> dict:
+    """
+    Draw grid lines and labels once onto a transparent RGBA layer, and precompute the
+    flat pixel indices + packed BGRA values so the overlay can be stamped onto a raw frame in one NumPy op.
+    """
+    layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    _draw_grid(draw, width, height)
+    _draw_major_labels(draw, width, height)
+
+    rgba = np.asarray(layer)
+    index = np.flatnonzero(rgba[..., 3] > 0)
+    colors = rgba.reshape(-1, 4)[index]
+    bgra = np.empty((len(index), 4), dtype=np.uint8)
+    bgra[:, 0] = colors[:, 2]
+    bgra[:, 1] = colors[:, 1]
+    bgra[:, 2] = colors[:, 0]
+    bgra[:, 3] = 255
+    return {"layer": layer, "index": index, "bgra": bgra.view(np.uint32).reshape(-1)}
+
+
+def _get_grid_overlay(width: int, height: int, layout: tuple) -> dict:
+    global _grid_layers_layout
+    key = (width, height, MINOR_SPACING, MAJOR_SPACING)
+    with _grid_layers_lock:
+        if layout != _grid_layers_layout:
+            _grid_layers.clear()
+            _grid_layers_layout = layout
+        overlay = _grid_layers.get(key)
+        if overlay is not None:
+            _grid_layers.move_to_end(key)
+            return overlay
+    overlay = _render_grid_overlay(width, height)
+    with _grid_layers_lock:
+        _grid_layers[key] = overlay
+        while len(_grid_layers) > GRID_LAYER_CACHE_SIZE:
+            _grid_layers.popitem(last=False)
+    return overlay
+
+
+def resolve_vision_preset(name: str | None) -> dict:
+    """Map a preset name ("full", "balanced", "fast") or a long-edge pixel count to scaling kwargs."""
+    name = (name or DEFAULT_VISION_PRESET).strip().lower()
+    if name.isdigit():
+        return {"max_long_edge": int(name)}
+    if name not in VISION_PRESETS:
+        raise ValueError(f"Unknown vision preset: {name}")
+    return dict(VISION_PRESETS[name])
+
+
+def _target_size(width: int, height: int, max_long_edge: int | None, pixel_budget: int | None) -> tuple[int, int]:
+    scale = 1.0
+    if max_long_edge:
+        scale = min(scale, float(max_long_edge) / max(width, height))
+    if pixel_budget:
+        scale = min(scale, math.sqrt(float(pixel_budget) / (width * height)))
+    if scale >= 1.0:
+        return width, height
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
 
-        if screenshot is None:
-            raise RuntimeError("Failed to capture screenshot")
+@traced("capture")
+def image_processor(
+    with_grid: bool = False,
+    capture_all_monitors: bool = True,
+    max_long_edge: int | None = None,
+    pixel_budget: int | None = None,
+    capture_mode: str | None = None,
+    region: dict | str | None = None,
+):
+    """
+    Capture the screen. capture_mode is one of CAPTURE_MODES (default follows capture_all_monitors);
+    "region" grabs the given left/top/width/height. origin_left/origin_top report where the image
+    sits on the virtual desktop. With max_long_edge/pixel_budget the image is downscaled and
+    scale_x/scale_y report image pixels per screen pixel.
+    """
+    if capture_mode is None:
+        capture_mode = "all_monitors" if capture_all_monitors else "primary_monitor"
+    engine = get_capture_engine()
+    monitors = engine.monitors()
+    monitor, capture_mode = _select_capture_area(monitors, capture_mode, region)
+    frame = engine.grab(monitor)
 
-        width = screenshot.width
-        height = screenshot.height
-        img = Image.frombytes("RGBA", (width, height), screenshot.bgra)
-        img = img.convert("RGB")
+    screen_width = frame.width
+    screen_height = frame.height
+    width, height = _target_size(screen_width, screen_height, max_long_edge, pixel_budget)
+    resized = (width, height) != (screen_width, screen_height)
 
-        if with_grid:
-            # Debug/testing only. Keep disabled in automation path to avoid UI occlusion.
-            draw = ImageDraw.Draw(img)
-            _draw_grid(draw, width, height)
-            _draw_major_labels(draw, width, height)
+    # Grid is debug/testing only. Keep disabled in automation path to avoid UI occlusion.
+    # The overlay is rendered once per size and layout, then stamped in image coordinates.
+    overlay = _get_grid_overlay(width, height, engine.layout_signature()) if with_grid else None
+    if overlay is not None and not resized:
+        # straight onto the raw BGRA buffer, before the RGB conversion
+        frame.bgra.view(np.uint32).reshape(-1)[overlay["index"]] = overlay["bgra"]
 
-        # No resize here: preserve exact screen coordinate mapping.
+    img = frame.to_pil_rgb()
+    if resized:
+        img = img.resize((width, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        if overlay is not None:
+            img.paste(overlay["layer"], (0, 0), overlay["layer"])
 
+    scale_x = width / float(screen_width)
+    scale_y = height / float(screen_height)
     return {
         "image": img,
+        "frame": frame,
         "width": width,
         "height": height,
+        "screen_width": screen_width,
+        "screen_height": screen_height,
         "origin_left": int(monitor["left"]),
         "origin_top": int(monitor["top"]),
-        "capture_mode": "all_monitors" if capture_all_monitors else "primary_monitor",
+        "capture_mode": capture_mode,
         "grid": {"minor": MINOR_SPACING, "major": MAJOR_SPACING} if with_grid else None,
-        "scale": SCALE_FACTOR,
+        "scale": scale_x if width != screen_width else SCALE_FACTOR,
+        "scale_x": scale_x,
+        "scale_y": scale_y,
     }
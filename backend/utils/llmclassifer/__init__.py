@@ -1,3 +1,3 @@
-from .llmClassifier import llmclassifier
+from .llmClassifier import classifier_stats, llmclassifier, local_classify, register_local_commands
 
-__all__ = ["llmclassifier"]
+__all__ = ["classifier_stats", "llmclassifier", "local_classify", "register_local_commands"]
@@ -1,31 +1,202 @@
+import logging
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
+from typing import Iterable
 from dotenv import load_dotenv
 from groq import Groq
 
+from utils.tracing import count, traced
+
 
 load_dotenv(Path(__file__).resolve().parent.parent.parent.parent / ".env")
 
+logger = logging.getLogger(__name__)
+
 # system prompt
 system_prompt_path = Path(__file__).parent / "CLASSIFERSYSTEMPROMPT.md"
 SYSTEM_PROMPT = system_prompt_path.read_text()
 
-#this is the functoin that contains the groq client
+MODEL = "llama-3.1-8b-instant"  # cheap model for one shot call, no history, extremely low token usage
+
+
+def _local_threshold() -> float:
+    raw = os.getenv("THEO_CLASSIFIER_LOCAL_THRESHOLD", "0.95")
+    try:
+        return float(raw)
+    except ValueError:
+        logger.warning("Ignoring THEO_CLASSIFIER_LOCAL_THRESHOLD=%r (not a number); using 0.95", raw)
+        return 0.95
+
+
+# Local answers at or above this confidence skip the Groq call; set above 1 to always ask Groq.
+LOCAL_CONFIDENCE_THRESHOLD = _local_threshold()
+CACHE_SIZE = int(os.getenv("THEO_CLASSIFIER_CACHE_SIZE", "512"))
+
+LABELS = ("---UNSAFE---", "---AGENT---", "---CHAT---")
+
+# --- local lexicon stage -------------------------------------------------------
+# Only utterances that are a fixed greeting or, whole, one of the registered local commands are
+# answered here. Open-ended questions and commands can be UNSAFE in ways no word list can tell
+# ("how do I make ...", "delete everything ..."), so those always go to Groq for the safety call.
+
+_POLITE_PREFIX_RE = re.compile(
+    r"^(?:(?:hey|hi|ok|okay) theo\s+|theo\s+)?"
+    r"(?:please\s+|can you\s+|could you\s+|would you\s+|will you\s+|i want you to\s+|i need you to\s+)*"
+)
+_GREETINGS = frozenset((
+    "hi", "hello", "hey", "yo", "sup", "thanks", "thank you", "thank you so much", "good morning",
+    "good afternoon", "good evening", "good night", "how are you", "how's it going", "what's up",
+    "whats up", "bye", "goodbye", "see you", "nice", "cool", "ok", "okay", "awesome", "great",
+))
+# anything that could be a safety call is left to the model; these only make the local stage abstain
+_SENSITIVE_TERMS = frozenset((
+    "kill", "bomb", "weapon", "gun", "explosive", "poison", "drug", "drugs", "hack", "hacking", "steal",
+    "body", "suicide", "hurt", "attack", "illegal", "password", "passwords", "malware", "virus",
+    "ransomware", "phishing", "murder", "meth", "overdose", "self-harm",
+))
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+# whole-utterance AGENT commands; replaced (never mutated) by register_local_commands
+_local_commands: frozenset[str] = frozenset()
+_commands_lock = threading.Lock()
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation; the cache key for an utterance."""
+    return " ".join((text or "").lower().split()).rstrip(" .!?")
+
+
+def register_local_commands(phrases: Iterable[str]) -> None:
+    """
+    Commands (e.g. the intent router's shortcut phrases) that classify as AGENT locally when they
+    are the whole utterance, give or take a polite prefix.
+    """
+    global _local_commands
+    added = frozenset(" ".join(_WORD_RE.findall(normalize_utterance(p))) for p in phrases)
+    with _commands_lock:
+        _local_commands = _local_commands | (added - {""})
+
+
+def local_classify(text: str) -> tuple[str | None, float]:
+    """
+    Lexicon pass for the fixed cases. Returns (label, confidence); label is None when the
+    utterance should go to the model (including anything touching safety-sensitive terms).
+    """
+    normalized = normalize_utterance(text)
+    words = _WORD_RE.findall(normalized)
+    if not words or _SENSITIVE_TERMS.intersection(words):
+        return None, 0.0
+
+    if normalized in _GREETINGS or " ".join(words) in _GREETINGS:
+        return "---CHAT---", 0.97
+
+    # "close tab" / "please close tab" / "hey theo, can you close tab"
+    stripped = _POLITE_PREFIX_RE.sub("", " ".join(words))
+    if stripped in _local_commands:
+        return "---AGENT---", 0.96
+    return None, 0.0
+
+
+# --- cache and remote stage ----------------------------------------------------
+
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_stats = {"local": 0, "cache": 0, "remote": 0, "remote_ms": 0.0}
+
+_client: Groq | None = None
+_client_api_key: str | None = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> Groq:
+    """One Groq client (and its HTTP connection pool) per API key, reused across calls."""
+    global _client, _client_api_key
+    api_key = os.getenv("GROQ_API_KEY")
+    with _client_lock:
+        if _client is None or _client_api_key != api_key:
+            _client = Groq(api_key=api_key)
+            _client_api_key = api_key
+        return _client
+
+
+def _cache_get(key: str) -> str | None:
+    with _cache_lock:
+        label = _cache.get(key)
+        if label is not None:
+            _cache.move_to_end(key)
+        return label
+
+
+def _cache_put(key: str, label: str) -> None:
+    with _cache_lock:
+        _cache[key] = label
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _count(name: str, ms: float = 0.0) -> None:
+    count("classifier_results", source=name)
+    with _cache_lock:
+        _stats[name] += 1
+        if ms:
+            _stats["remote_ms"] += ms
+
+
+def _remote_classify(user_input: str) -> str:
+    started = time.perf_counter()
+    completion = _get_client().chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_input}
+        ],
+    )
+    output_text = completion.choices[0].message.content.strip()
+    _count("remote", (time.perf_counter() - started) * 1000.0)
+    return output_text
+
+
+@traced("classify")
 def llmclassifier(user_input: str) -> str:
+    """Classify an utterance: local lexicon, then the LRU cache, then Groq."""
+    label, confidence = local_classify(user_input)
+    if label is not None and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        _count("local")
+        logger.info("Classified locally as %s (%.2f)", label, confidence)
+        return label
 
-  client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    
-    # Simple one-shot call
-  completion = client.chat.completions.create(
-    model="llama-3.1-8b-instant", #cheap model for one shot call, no history, extremely low token usage
-    messages=[
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_input}
-    ],
-  )
+    key = normalize_utterance(user_input)
+    cached = _cache_get(key)
+    if cached is not None:
+        _count("cache")
+        logger.info("Classification cache hit: %s", cached)
+        return cached
 
-  output_text = completion.choices[0].message.content.strip()
-  print(output_text)
-  return output_text
+    output_text = _remote_classify(user_input)
+    logger.info("Classified remotely as %s", output_text)
+    # only cache answers that actually contain a label
+    if any(l in output_text.upper() for l in LABELS):
+        _cache_put(key, output_text)
+    return output_text
 
 
+def classifier_stats() -> dict:
+    """Per-tier counts and hit rates plus the mean Groq round trip."""
+    with _cache_lock:
+        local, cached, remote = _stats["local"], _stats["cache"], _stats["remote"]
+        total = local + cached + remote
+        return {
+            "requests": total,
+            "local_hits": local,
+            "cache_hits": cached,
+            "remote_calls": remote,
+            "local_hit_rate": local / total if total else 0.0,
+            "cache_hit_rate": cached / total if total else 0.0,
+            "avg_remote_ms": _stats["remote_ms"] / remote if remote else 0.0,
+            "cache_entries": len(_cache),
+            "local_threshold": LOCAL_CONFIDENCE_THRESHOLD,
+        }
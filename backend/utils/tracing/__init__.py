@@ -0,0 +1,25 @@
+from .tracing import (
+    ENABLED,
+    collect_metrics,
+    count,
+    current_trace_id,
+    merge_metrics,
+    observe,
+    render_prometheus,
+    span,
+    trace,
+    traced,
+)
+
+__all__ = [
+    "ENABLED",
+    "collect_metrics",
+    "count",
+    "current_trace_id",
+    "merge_metrics",
+    "observe",
+    "render_prometheus",
+    "span",
+    "trace",
+    "traced",
+]
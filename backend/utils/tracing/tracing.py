@@ -0,0 +1,177 @@
+# Lightweight latency tracing: named spans, per-request trace ids, and in-process
+# histograms/counters rendered in the Prometheus text format for /metrics.
+# THEO_TRACING=0 turns everything into no-ops (traced() then returns the function unchanged).
+# Metrics recorded in another process (script workers) are shipped home with collect_metrics/merge_metrics.
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("THEO_TRACING", "1") != "0"
+METRIC_PREFIX = "theo"
+# seconds; covers sub-millisecond local work up to slow model calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+# set by collect_metrics(); every observe()/count() in the context is also appended here
+_collected: ContextVar[Optional[list]] = ContextVar("collected_metrics", default=None)
+_NOOP = nullcontext()
+
+_lock = threading.Lock()
+# (span, labels) -> [bucket counts..., +Inf count], sum
+_histograms: dict[tuple, list] = {}
+_counters: dict[tuple, float] = {}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: str) -> Iterator[str]:
+    """Tag everything in this context (logs of spans, work submitted with copy_context) with trace_id."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record one duration for span name into its histogram."""
+    if not ENABLED:
+        return
+    collected = _collected.get()
+    if collected is not None:
+        collected.append(["observe", name, seconds, labels])
+    key = (name, _label_key(labels))
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        counts = entry[0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        entry[1] += seconds
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    if not ENABLED:
+        return
+    collected = _collected.get()
+    if collected is not None:
+        collected.append(["count", name, value, labels])
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextmanager
+def collect_metrics() -> Iterator[list]:
+    """Also copy every observation and count made in this context into the yielded (JSON-safe) list."""
+    records: list = []
+    token = _collected.set(records)
+    try:
+        yield records
+    finally:
+        _collected.reset(token)
+
+
+def merge_metrics(records) -> None:
+    """Record observations and counts gathered by collect_metrics(), e.g. in a worker process."""
+    for kind, name, value, labels in records or ():
+        (observe if kind == "observe" else count)(name, value, **labels)
+
+
+@contextmanager
+def _span(name: str, labels: dict) -> Iterator[None]:
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        observe(name, elapsed, **labels)
+        if error:
+            count("span_errors", span=name)
+        logger.debug("span %s %.1f ms trace=%s%s", name, elapsed * 1000.0, _trace_id.get(),
+                     " (error)" if error else "")
+
+
+def span(name: str, **labels):
+    """Time a block: with span("encode"): ...  Labels become histogram labels, so keep them low-cardinality."""
+    if not ENABLED:
+        return _NOOP
+    return _span(name, labels)
+
+
+def traced(name: str, **labels) -> Callable:
+    """Decorator form of span(); a no-op when tracing is disabled."""
+    def decorate(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _span(name, labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    """All histograms and counters in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        histograms = {key: (list(entry[0]), entry[1]) for key, entry in _histograms.items()}
+        counters = dict(_counters)
+
+    lines: list[str] = []
+    metric = f"{METRIC_PREFIX}_span_duration_seconds"
+    lines.append(f"# HELP {metric} Duration of traced pipeline stages.")
+    lines.append(f"# TYPE {metric} histogram")
+    for (name, labels), (counts, total) in sorted(histograms.items()):
+        base = (("span", name),) + labels
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            lines.append(f"{metric}_bucket{_format_labels(base, (('le', repr(bound)),))} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{metric}_bucket{_format_labels(base, (('le', '+Inf'),))} {cumulative}")
+        lines.append(f"{metric}_sum{_format_labels(base)} {total:.6f}")
+        lines.append(f"{metric}_count{_format_labels(base)} {cumulative}")
+
+    for name in sorted({name for name, _ in counters}):
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
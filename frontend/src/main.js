@@ -411,11 +411,20 @@ ipcMain.handle("set-output-playing", (_event, payload) => {
   return { ok: true };
 });
 
+// Cancel the in-flight AI request (LLM call, running script, speech) and stop TTS.
+const cancelAiRequest = () => {
+  fetch("http://127.0.0.1:5000/ai/cancel", { method: "POST" }).catch(() => {});
+};
+
 const handleCtrlWinPress = () => {
   const now = Date.now();
-  if (clickThroughEnabled) return;
-  if (isInputLocked()) return;
   if (now - lastTriggerAt < TRIGGER_LOCKOUT_MS) return;
+  // Ctrl+Win while a command is still running interrupts it instead of starting a new one
+  if (clickThroughEnabled || isInputLocked()) {
+    lastTriggerAt = now;
+    cancelAiRequest();
+    return;
+  }
   // Bypass cooldown when TTS is playing (user can interrupt to ask new prompt)
   const canInterrupt = outputPlaying;
   if (!canInterrupt && lastReleaseAt > 0 && now - lastReleaseAt < COOLDOWN_AFTER_RELEASE_MS)
@@ -425,8 +434,8 @@ const handleCtrlWinPress = () => {
   ctrlWinPressed = true;
   bothKeysReleased = false;
   lastTriggerAt = now;
-  // Always stop TTS when Ctrl+Win pressed - no matter what
-  fetch("http://127.0.0.1:5000/stop-tts", { method: "POST" }).catch(() => {});
+  // Always stop TTS (and anything still running) when Ctrl+Win pressed - no matter what
+  cancelAiRequest();
   if (outputPlaying) outputPlaying = false;
   console.log("[STT] Ctrl+Win pressed - sending ctrl-win-key-down to renderer");
 
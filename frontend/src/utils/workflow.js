@@ -1,6 +1,6 @@
-const AI_URL = "http://127.0.0.1:5000/ai";
-const CLASSIFY_URL = "http://127.0.0.1:5000/ai/classify";
+const AI_STREAM_URL = "http://127.0.0.1:5000/ai/stream";
 const TTS_STATUS_URL = "http://127.0.0.1:5000/tts/status";
+const EVENTS_URL = "http://127.0.0.1:5000/events";
 
 async function setInputLock(lock) {
   if (!window.electron?.ipcRenderer?.invoke) return;
@@ -35,10 +35,43 @@ function sleep(ms) {
   return new Promise((resolve) => setTimeout(resolve, ms));
 }
 
-async function waitForTtsStart({
-  timeoutMs = 3500,
-  pollMs = 120,
-} = {}) {
+// Playback state pushed by the backend over SSE; null until the stream has connected.
+let ttsPlaying = null;
+const ttsListeners = new Set();
+let events = null;
+
+function connectEvents() {
+  if (events || typeof EventSource === "undefined") return;
+  events = new EventSource(EVENTS_URL);
+  events.addEventListener("tts", (message) => {
+    let data;
+    try {
+      data = JSON.parse(message.data);
+    } catch {
+      return;
+    }
+    const wasPlaying = ttsPlaying;
+    ttsPlaying = Boolean(data.playing);
+    ttsListeners.forEach((listener) => listener(ttsPlaying));
+    // speech ended on its own (or was stopped): let the UI drop its "speaking" state right away
+    if (wasPlaying && !ttsPlaying) setOutputPlaying(false);
+  });
+  events.addEventListener("stage", (message) => {
+    try {
+      window.dispatchEvent(new CustomEvent("ai-stage", { detail: JSON.parse(message.data) }));
+    } catch {
+      // ignore malformed events
+    }
+  });
+  events.addEventListener("error", () => {
+    // EventSource reconnects by itself; until it does, fall back to polling
+    ttsPlaying = null;
+  });
+}
+
+connectEvents();
+
+async function pollForTtsStart(timeoutMs, pollMs) {
   const startedAt = Date.now();
   while (Date.now() - startedAt < timeoutMs) {
     try {
@@ -55,38 +88,85 @@ async function waitForTtsStart({
   return false;
 }
 
+async function waitForTtsStart({
+  timeoutMs = 3500,
+  pollMs = 120,
+} = {}) {
+  if (ttsPlaying === null) return pollForTtsStart(timeoutMs, pollMs);
+  if (ttsPlaying) return true;
+  return new Promise((resolve) => {
+    const done = (started) => {
+      clearTimeout(timer);
+      ttsListeners.delete(listener);
+      resolve(started);
+    };
+    const listener = (playing) => {
+      if (playing) done(true);
+    };
+    const timer = setTimeout(() => done(false), timeoutMs);
+    ttsListeners.add(listener);
+  });
+}
+
+// Read an NDJSON response line by line, calling onEvent for each parsed object.
+async function readEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let newline;
+    while ((newline = buffered.indexOf("\n")) !== -1) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      if (line) await onEvent(JSON.parse(line));
+    }
+    if (done) break;
+  }
+  if (buffered.trim()) await onEvent(JSON.parse(buffered));
+}
+
 export async function aiGO(text) {
   if (!text) return;
   await setOutputPlaying(false);
   await setInputLock(true);
-  let classification = "---CHAT---";
   try {
-    const classifyRes = await fetch(
-      `${CLASSIFY_URL}?user_input=${encodeURIComponent(text)}`,
+    // one round trip: the backend captures the screen while it classifies and
+    // streams the classification first, then the final result
+    const response = await fetch(
+      `${AI_STREAM_URL}?user_input=${encodeURIComponent(text)}`,
     );
-    if (classifyRes.ok) {
-      const data = await classifyRes.json();
-      classification = data.classification || "---CHAT---";
-    }
-
-    if (classification === "---AGENT---") {
-      window.dispatchEvent(new CustomEvent("ai-go"));
-      await setClickThrough(true);
+    if (!response.ok) {
+      const body = await response.text();
+      console.error("[AI] Request failed:", response.status, body);
+      return;
     }
-
-    const url = `${AI_URL}?user_input=${encodeURIComponent(text)}&classification=${encodeURIComponent(classification)}`;
-    queueMicrotask(() => window.dispatchEvent(new CustomEvent("ai-loading-start")));
-    const response = await fetch(url);
-    if (response.ok) {
+    let result = null;
+    await readEvents(response, async (event) => {
+      if (event.event === "classification") {
+        if (event.classification === "---AGENT---") {
+          window.dispatchEvent(new CustomEvent("ai-go"));
+          await setClickThrough(true);
+        }
+        if (event.classification !== "---UNSAFE---") {
+          queueMicrotask(() => window.dispatchEvent(new CustomEvent("ai-loading-start")));
+        }
+      } else if (event.event === "result") {
+        result = event;
+      }
+    });
+    if (result?.ok) {
       const ttsStarted = await waitForTtsStart();
       if (ttsStarted) {
         await setOutputPlaying(true);
       } else {
         console.warn("[AI] TTS did not report active playback before timeout");
       }
+    } else if (result?.cancelled) {
+      console.log("[AI] Request cancelled");
     } else {
-      const body = await response.text();
-      console.error("[AI] Request failed:", response.status, body);
+      console.error("[AI] Request failed:", result?.status, result);
     }
   } catch (err) {
     console.error("[AI] Request error:", err);